@@ -1,3 +1,8 @@
+import numpy as np
+
+from ..instrumentation import instrumented
+
+
 def calculate_engagement(views, likes=None, comments=None, subscribers=None):
     """
     Robust Engagement Formula:
@@ -31,3 +36,60 @@ def calculate_engagement(views, likes=None, comments=None, subscribers=None):
     ratio = round(ratio, 2)
 
     return {"ratio": ratio, "text": f"{ratio}% Engagement"}
+
+
+def _column(values):
+    """Counters as a float array, None/NaN counted as 0 (like `value or 0`)."""
+    if values is None:
+        return 0.0
+    array = np.asarray(values)
+    if array.dtype == object:  # lists with missing values
+        array = np.array([v or 0 for v in values], dtype=float)
+    return np.nan_to_num(array.astype(float))
+
+
+@instrumented("engagement")
+def calculate_engagement_array(views, likes=None, comments=None, subscribers=None):
+    """
+    calculate_engagement over whole columns at once: same formula,
+    fallback and rounding, returning only the ratios as a float array.
+    Format them for display with engagement_text().
+    """
+    views = _column(views)
+    likes = _column(likes)
+    comments = _column(comments)
+    subscribers = _column(subscribers)
+
+    interactions = likes + comments
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(
+            interactions > 0,
+            (interactions / views) * 100,
+            np.where(subscribers > 0, (views / subscribers) * 100, 0.0),
+        )
+    ratio = np.where(views == 0, 0.0, ratio)
+    return np.round(ratio, 2)
+
+
+def engagement_text(ratio, views=None):
+    """Display text for a ratio, as calculate_engagement formats it."""
+    if views == 0:
+        return "0% Engagement"
+    return f"{ratio}% Engagement"
+
+
+def engagement_level_mask(ratios, level):
+    """Boolean array: which ratios fall in the 'high'/'medium'/'low' filter ('' = all)."""
+    ratios = np.asarray(ratios, dtype=float)
+    if level == "high":
+        return ratios > 5
+    if level == "medium":
+        return (ratios >= 2) & (ratios <= 5)
+    if level == "low":
+        return ratios < 2
+    return np.ones(len(ratios), dtype=bool)
+
+
+def rank_by_engagement(ratios):
+    """Indices from highest to lowest ratio; ties keep their original order."""
+    return np.argsort(-np.asarray(ratios, dtype=float), kind="stable")
@@ -1,86 +1,102 @@
-import re
+import math
 from collections import Counter
+from collections.abc import Mapping
 
-def extract_hashtags(video_list, top_n=10):
+from ..instrumentation import instrumented
+from .tokenizer import tokenize_videos
+
+# Extended stopwords list
+STOPWORDS = {
+    "the", "and", "you", "your", "with", "for", "from", "this", "that", 
+    "what", "when", "where", "how", "are", "was", "will", "has", "have",
+    "but", "not", "they", "been", "more", "can", "all", "just", "now",
+    "get", "like", "about", "out", "new", "who", "its", "some", "than",
+    "here", "there", "why", "my", "me", "we", "our", "us", "am", "is", "be",
+    "do", "did", "does", "made", "make", "makes", "day", "time", "year",
+    "way", "one", "two", "best", "top", "most", "see", "look", "watch"
+}
+
+# Category hashtags count this many times per video
+CATEGORY_WEIGHT = 3
+
+
+def engagement_weight(score):
+    """Default word weight: one count per 2 points of engagement, at least 1."""
+    return max(1, int(score / 2))
+
+
+def log_engagement_weight(score):
+    """Float alternative that grows slowly for very high engagement."""
+    return 1 + math.log1p(max(0, score))
+
+
+def hashtag_counts(tokens):
+    """Counter of the #tags actually used in the videos' titles and descriptions."""
+    return Counter(tag for t in tokens for tag in t.hashtags)
+
+
+@instrumented("hashtags")
+def extract_hashtags(video_list, top_n=10, tokens=None, weight=engagement_weight):
     """
     Extract trending hashtags based on video content, categories, and viral patterns.
     Analyzes video titles, descriptions, categories, and engagement to find what's actually trending.
+    Pass `tokens` (tokenizer.tokenize_videos output, aligned with video_list)
+    to skip re-scanning the text. `weight` maps a video's engagement score
+    to the (int or float) weight of its words.
     Returns list of tuples: [(hashtag, count), ...]
     """
-    # Extended stopwords list
-    stopwords = {
-        "the", "and", "you", "your", "with", "for", "from", "this", "that", 
-        "what", "when", "where", "how", "are", "was", "will", "has", "have",
-        "but", "not", "they", "been", "more", "can", "all", "just", "now",
-        "get", "like", "about", "out", "new", "who", "its", "some", "than",
-        "here", "there", "why", "my", "me", "we", "our", "us", "am", "is", "be",
-        "do", "did", "does", "made", "make", "makes", "day", "time", "year",
-        "way", "one", "two", "best", "top", "most", "see", "look", "watch"
-    }
+    stopwords = STOPWORDS
     
     # If video_list is actually a list of strings (titles), convert format
     if video_list and isinstance(video_list[0], str):
         video_list = [{"title": title, "description": ""} for title in video_list]
     
-    trending_terms = []
-    category_tags = []
+    if tokens is None:
+        tokens = tokenize_videos(video_list, sentiment=False)
+
+    # Weights are added straight into counters instead of repeating words in lists
+    term_counts = Counter()
+    category_counts = Counter()
     
     # Extract from actual hashtags first
-    actual_hashtags = []
-    for video in video_list:
-        if isinstance(video, dict):
-            title = video.get("title", "")
-            description = video.get("description", "")
-            text = f"{title} {description}"
-        else:
-            text = str(video)
-        
-        # Extract actual hashtags
-        tags = re.findall(r"#(\w+)", text)
-        actual_hashtags.extend([tag.lower() for tag in tags])
+    actual_hashtags = hashtag_counts(tokens)
     
     if actual_hashtags:
-        return Counter(actual_hashtags).most_common(top_n)
+        return actual_hashtags.most_common(top_n)
     
     # Analyze video data for trending topics
-    for video in video_list:
-        if not isinstance(video, dict):
+    for video, video_tokens in zip(video_list, tokens):
+        if not isinstance(video, Mapping):
             continue
             
-        title = video.get("title", "").lower()
-        description = video.get("description", "").lower()
         category = video.get("categoryName", "")
         engagement = video.get("engagement_score", 0)
         
-        # Extract meaningful phrases and words
-        combined_text = f"{title} {description}"
-        
         # Look for capitalized words/phrases (often important topics)
-        important_words = re.findall(r'\b[A-Z][a-z]+\b', video.get("title", ""))
-        trending_terms.extend([word.lower() for word in important_words])
-        
-        # Extract all meaningful words (3+ chars)
-        words = re.findall(r'\b[a-zA-Z]{3,}\b', combined_text)
+        term_counts.update(video_tokens.capitalized)
         
         # Weight words by engagement score (high engagement = more important)
-        engagement_weight = max(1, int(engagement / 2))  # Weight based on engagement
-        for word in words:
-            if word not in stopwords and len(word) > 3:
-                trending_terms.extend([word] * engagement_weight)
+        word_weight = weight(engagement)
+        if word_weight > 0:
+            for word in video_tokens.words:
+                if word not in stopwords and len(word) > 3:
+                    term_counts[word] += word_weight
         
         # Add category as potential hashtag
         if category and category not in ["Miscellaneous", "Unknown"]:
             category_clean = category.lower().replace(" & ", "").replace(" ", "")
-            category_tags.append(category_clean)
+            category_counts[category_clean] += CATEGORY_WEIGHT
     
-    # Combine category tags with trending terms
-    all_tags = trending_terms + category_tags * 3  # Weight categories higher
+    # Combine category tags with trending terms (categories weighted higher).
+    # Merging at the end keeps first-seen order, so ties break as before.
+    term_counts.update(category_counts)
     
-    if all_tags:
+    if term_counts:
         # Get most common, filter out very short or stopwords
-        common_tags = Counter(all_tags).most_common(top_n * 2)
+        common_tags = term_counts.most_common(top_n * 2)
         filtered_tags = [
-            (tag, count) for tag, count in common_tags 
+            (tag, round(count, 2) if isinstance(count, float) else count)
+            for tag, count in common_tags 
             if len(tag) > 3 and tag not in stopwords
         ]
         return filtered_tags[:top_n]
@@ -0,0 +1,135 @@
+"""
+Space-Saving heavy-hitter summary (Metwally et al.) for approximate
+top-K term counts in bounded memory.
+
+For a summary with `capacity` counters over a stream of total weight N:
+- every term whose true count exceeds N / capacity is tracked;
+- a reported count is never below the true count and overestimates it
+  by at most that term's `error`, which is at most N / capacity.
+
+Summaries built on different regions or workers can be merged; the
+merged summary keeps the same guarantees over the combined stream.
+"""
+import heapq
+
+# Rough memory per tracked term: dict slot, term string, count/error pair, heap entries
+BYTES_PER_COUNTER = 200
+
+
+class SpaceSaving:
+    """Bounded replacement for a Counter when only the top terms matter."""
+
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}  # term -> [count, error]
+        self._heap = []  # (count, term), including stale entries skipped on pop
+
+    @classmethod
+    def for_memory(cls, budget_bytes):
+        """A summary sized to roughly `budget_bytes` of memory."""
+        return cls(max(1, int(budget_bytes // BYTES_PER_COUNTER)))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, term):
+        return term in self.counts
+
+    def _push(self, term):
+        heapq.heappush(self._heap, (self.counts[term][0], term))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(count, term) for term, (count, _) in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        while self._heap:
+            count, term = self._heap[0]
+            entry = self.counts.get(term)
+            if entry is not None and entry[0] == count:
+                return
+            heapq.heappop(self._heap)
+
+    def floor(self):
+        """Smallest tracked count once full (an upper bound for any untracked term), else 0."""
+        if len(self.counts) < self.capacity:
+            return 0
+        self._drop_stale()
+        return self._heap[0][0]
+
+    def add(self, term, weight=1):
+        """Count `term` with an int or float weight."""
+        if weight <= 0:
+            return
+        self.total += weight
+        entry = self.counts.get(term)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[term] = [weight, 0]
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            self._drop_stale()
+            floor, victim = heapq.heappop(self._heap)
+            del self.counts[victim]
+            self.counts[term] = [floor + weight, floor]
+        self._push(term)
+
+    def update(self, counts):
+        """Add a mapping of term -> weight (e.g. a Counter)."""
+        for term, weight in counts.items():
+            self.add(term, weight)
+
+    def merge(self, other):
+        """
+        Fold another summary into this one, keeping this one's capacity.
+        A term missing from a full summary is credited with that summary's
+        floor, so merged counts stay upper bounds.
+        """
+        own_floor, other_floor = self.floor(), other.floor()
+        merged = {}
+        for term, (count, error) in self.counts.items():
+            other_count, other_error = other.counts.get(term, (other_floor, other_floor))
+            merged[term] = [count + other_count, error + other_error]
+        for term, (count, error) in other.counts.items():
+            if term not in merged:
+                merged[term] = [count + own_floor, error + own_floor]
+
+        kept = heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1][0])
+        self.counts = dict(kept)
+        self.total += other.total
+        self._rebuild_heap()
+        return self
+
+    def error(self, term):
+        """How much the reported count of `term` may exceed its true count."""
+        entry = self.counts.get(term)
+        return entry[1] if entry is not None else self.floor()
+
+    @property
+    def max_error(self):
+        """Largest overestimate among the reported counts (never above N / capacity)."""
+        return max((error for _, error in self.counts.values()), default=0)
+
+    def most_common(self, n=None):
+        """[(term, estimated count), ...] like Counter.most_common."""
+        items = [(term, count) for term, (count, _) in self.counts.items()]
+        if n is None:
+            return sorted(items, key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(n, items, key=lambda item: item[1])
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "total": self.total, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["capacity"])
+        sketch.total = data.get("total", 0)
+        sketch.counts = {term: list(entry) for term, entry in data.get("counts", {}).items()}
+        sketch._rebuild_heap()
+        return sketch
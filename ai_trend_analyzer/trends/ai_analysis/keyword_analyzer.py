@@ -1,12 +1,27 @@
-import re
 from collections import Counter
+from itertools import chain
 
-def extract_keywords(video_titles, top_n=10):
+from ..instrumentation import instrumented
+from .tokenizer import WORD_RE
+
+STOPWORDS = {"the", "and", "you", "your", "with", "for", "from", "this", "that", "what", "when", "where", "how", "are", "was", "will", "has"}
+
+
+def keyword_counts(video_titles, tokens=None):
+    """Counter of title keywords; extract_keywords is its top N."""
+    if tokens is not None:
+        words = chain.from_iterable(t.title_words for t in tokens)
+    else:
+        text = " ".join(video_titles).lower()
+        words = WORD_RE.findall(text)  # only words with 3+ letters
+    return Counter(w for w in words if w not in STOPWORDS)
+
+
+@instrumented("keywords")
+def extract_keywords(video_titles, top_n=10, tokens=None):
     """
     Analyze and return most common keywords in trending video titles.
+    Pass `tokens` (tokenizer.tokenize_videos output for the same videos)
+    to reuse words that were already extracted.
     """
-    text = " ".join(video_titles).lower()
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text)  # only words with 3+ letters
-    stopwords = {"the", "and", "you", "your", "with", "for", "from", "this", "that", "what", "when", "where", "how", "are", "was", "will", "has"}
-    words = [w for w in words if w not in stopwords]
-    return Counter(words).most_common(top_n)
+    return keyword_counts(video_titles, tokens).most_common(top_n)
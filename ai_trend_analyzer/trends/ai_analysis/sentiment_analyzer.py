@@ -1,31 +1,149 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
+from . import text_prep
+from ..instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
 # Initialize once per process
 analyzer = SentimentIntensityAnalyzer()
 
-def analyze_sentiment(text, country=None):
-    """Analyze sentiment for a text, optionally adjusting for country."""
+# Optional: small country-specific adjustment
+country_multiplier = {
+    "US": 1.0,
+    "IN": 1.05,
+    "PK": 1.03,
+    "GB": 0.98,
+    "CA": 1.0,
+    "AU": 0.97,
+    "DE": 0.95,
+    "FR": 0.95,
+    "JP": 0.92,
+    "KR": 0.90,
+}
+
+
+class SentimentCache:
+    """
+    Bounded LRU of VADER polarity scores keyed by a hash of the normalized
+    text, optionally backed by a shared cache (anything with get/set, e.g.
+    a Django cache) so other processes can reuse the scores.
+    """
+
+    def __init__(self, maxsize=4096, shared=None, shared_timeout=24 * 3600):
+        self.maxsize = maxsize
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(text):
+        # VADER tokenizes on whitespace, so collapsing it doesn't change scores
+        normalized = " ".join(text.split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            scores = self._entries.get(key)
+            if scores is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return scores
+
+        if self.shared is not None:
+            scores = self.shared.get(f"sentiment:{key}")
+            if scores is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._put_local(key, scores)
+                return scores
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, scores):
+        self._put_local(key, scores)
+        if self.shared is not None:
+            self.shared.set(f"sentiment:{key}", scores, self.shared_timeout)
+
+    def _put_local(self, key, scores):
+        with self._lock:
+            self._entries[key] = scores
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+sentiment_cache = SentimentCache()
+
+
+def configure_sentiment_cache(maxsize=None, shared=None):
+    """Resize the in-process LRU and/or attach a shared cache tier."""
+    global sentiment_cache
+    sentiment_cache = SentimentCache(maxsize=maxsize or sentiment_cache.maxsize, shared=shared)
+    return sentiment_cache
+
+
+def sentiment_cache_info():
+    """Hit/miss/eviction counters of the sentiment cache."""
+    return sentiment_cache.info()
+
+
+def polarity_scores(text):
+    """VADER scores for `text`, memoized by content hash."""
+    key = sentiment_cache.key_for(text)
+    scores = sentiment_cache.get(key)
+    if scores is None:
+        scores = analyzer.polarity_scores(text)
+        sentiment_cache.put(key, scores)
+    return scores
+
+
+def _to_text(text):
     if text is None:
-        text = ""
-    elif not isinstance(text, str):
-        text = str(text)
+        return ""
+    if not isinstance(text, str):
+        return str(text)
+    return text
+
 
-    scores = analyzer.polarity_scores(text)
+def _finish(scores, country):
+    """Apply the country multiplier and label to (cached) VADER scores."""
+    scores = dict(scores)
     compound = scores.get('compound', 0.0)
 
-    # Optional: small country-specific adjustment
-    country_multiplier = {
-        "US": 1.0,
-        "IN": 1.05,
-        "PK": 1.03,
-        "GB": 0.98,
-        "CA": 1.0,
-        "AU": 0.97,
-        "DE": 0.95,
-        "FR": 0.95,
-        "JP": 0.92,
-        "KR": 0.90,
-    }
     if country:
         compound *= country_multiplier.get(country, 1.0)
 
@@ -42,3 +160,165 @@ def analyze_sentiment(text, country=None):
         "score": compound,
         "raw": scores,
     }
+
+
+def analyze_sentiment(text, country=None):
+    """Analyze sentiment for a text, optionally adjusting for country."""
+    # Cached scores are region-independent; the multiplier is applied after
+    return _finish(polarity_scores(_to_text(text)), country)
+
+
+# ---------------------- Batch scoring ----------------------
+
+# Below this many uncached texts, a process pool costs more than it saves
+BATCH_MIN_PARALLEL = 64
+
+# Worker processes for large batches (settings.SENTIMENT_WORKERS, applied in TrendsConfig.ready)
+SENTIMENT_WORKERS = os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker_analyzer = None
+
+
+def _init_worker():
+    """Build the analyzer once per worker process."""
+    global _worker_analyzer
+    _worker_analyzer = SentimentIntensityAnalyzer()
+
+
+def _score_chunk(texts):
+    return [_worker_analyzer.polarity_scores(text) for text in texts]
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a threaded web worker is not safe
+                _pool = ProcessPoolExecutor(
+                    max_workers=SENTIMENT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+    return _pool
+
+
+def _drop_pool(pool):
+    """Forget a pool whose worker died, so the next large batch starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def configure_sentiment_workers(workers=None):
+    """Set the worker process count; a running pool of another size is replaced on next use."""
+    global SENTIMENT_WORKERS
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers != SENTIMENT_WORKERS:
+        SENTIMENT_WORKERS = workers
+        if _pool is not None:
+            _drop_pool(_pool)
+    return SENTIMENT_WORKERS
+
+
+def _score_on_pool(texts):
+    pool = _get_pool()
+    chunk_size = max(16, -(-len(texts) // (SENTIMENT_WORKERS * 4)))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    try:
+        return [scores for chunk in pool.map(_score_chunk, chunks) for scores in chunk]
+    except BrokenProcessPool:
+        logger.warning("sentiment worker pool broken, scoring in-process texts=%d", len(texts))
+        _drop_pool(pool)
+        return [analyzer.polarity_scores(t) for t in texts]
+
+
+def polarity_scores_batch(texts, min_parallel=BATCH_MIN_PARALLEL):
+    """
+    VADER scores for many texts. Duplicate and cached texts are scored
+    once; the rest run in chunks on a process pool (in-process when fewer
+    than `min_parallel`).
+    """
+    # Deduplicate by cache key and look each unique text up once
+    keys = [sentiment_cache.key_for(t) for t in texts]
+    scores_by_key = {}
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key in scores_by_key or key in pending:
+            continue
+        scores = sentiment_cache.get(key)
+        if scores is None:
+            pending[key] = text
+        else:
+            scores_by_key[key] = scores
+
+    if pending:
+        pending_keys = list(pending)
+        pending_texts = list(pending.values())
+        if len(pending_texts) < min_parallel:
+            results = [analyzer.polarity_scores(t) for t in pending_texts]
+        else:
+            results = _score_on_pool(pending_texts)
+        for key, scores in zip(pending_keys, results):
+            sentiment_cache.put(key, scores)
+            scores_by_key[key] = scores
+
+    return [scores_by_key[key] for key in keys]
+
+
+def _country_list(countries, n):
+    if countries is None or isinstance(countries, str):
+        return [countries] * n
+    return countries
+
+
+def analyze_sentiment_batch(texts, countries=None, min_parallel=BATCH_MIN_PARALLEL):
+    """
+    Score many texts at once; same results as calling analyze_sentiment on
+    each. `countries` is one country code for all texts or a list matching
+    `texts`.
+    """
+    texts = [_to_text(t) for t in texts]
+    scores = polarity_scores_batch(texts, min_parallel=min_parallel)
+    return [_finish(s, c) for s, c in zip(scores, _country_list(countries, len(texts)))]
+
+
+def _blend(title_scores, description_scores, title_weight):
+    return {
+        k: title_weight * title_scores.get(k, 0.0) + (1 - title_weight) * description_scores.get(k, 0.0)
+        for k in ("neg", "neu", "pos", "compound")
+    }
+
+
+@instrumented("sentiment")
+def analyze_video_sentiment_batch(titles, descriptions, countries=None, tokens=None):
+    """
+    Sentiment per video from its title and description, prepared by the
+    text_prep stage (noise stripped, description token-limited). Pass
+    `tokens` (tokenizer.tokenize_videos output) to reuse the already
+    prepared descriptions. With a title_weight configured, title and
+    description are scored separately and their scores blended.
+    """
+    config = text_prep.text_prep
+    titles = [_to_text(t) for t in titles]
+    countries = _country_list(countries, len(titles))
+    if tokens is not None:
+        prepared = [t.sentiment_description for t in tokens]
+    elif config.enabled:
+        prepared = [text_prep.prepare_description(_to_text(d), config) for d in descriptions]
+    else:
+        prepared = [_to_text(d) for d in descriptions]
+
+    if not config.enabled or config.title_weight is None:
+        return analyze_sentiment_batch([f"{t} {d}" for t, d in zip(titles, prepared)], countries)
+
+    title_scores = polarity_scores_batch(titles)
+    description_scores = polarity_scores_batch(prepared)
+    return [
+        _finish(_blend(ts, ds, config.title_weight) if d else ts, c)
+        for ts, ds, d, c in zip(title_scores, description_scores, prepared, countries)
+    ]
@@ -1,3 +1,7 @@
+from ..instrumentation import instrumented
+
+
+@instrumented("summary")
 def generate_trend_summary(videos, keywords, hashtags):
     """
     Creates a short summary of what is trending this week.
@@ -0,0 +1,75 @@
+import re
+from dataclasses import dataclass
+
+# Precompiled noise patterns typical of YouTube descriptions
+URL_RE = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+TIMESTAMP_RE = re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b")
+HASHTAG_RUN_RE = re.compile(r"#\w+(?:\s+#\w+)+")  # two or more hashtags in a row
+SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*")
+
+
+@dataclass
+class TextPrepConfig:
+    enabled: bool = True
+    max_tokens: int = 128  # whitespace tokens of description kept for VADER
+    mode: str = "sample"  # "head" keeps the first sentences, "sample" spreads them out
+    title_weight: float = None  # None = score title + description as one text
+
+
+text_prep = TextPrepConfig()
+
+
+def configure_text_prep(**options):
+    """Replace the text preparation settings, e.g. from Django settings."""
+    global text_prep
+    text_prep = TextPrepConfig(**options)
+    return text_prep
+
+
+def clean_text(text):
+    """Drop URLs, timestamps and hashtag runs, and collapse whitespace."""
+    text = URL_RE.sub(" ", text)
+    text = TIMESTAMP_RE.sub(" ", text)
+    text = HASHTAG_RUN_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def limit_tokens(text, max_tokens, mode="sample"):
+    """
+    Keep at most `max_tokens` whitespace tokens. "head" keeps the first
+    sentences; "sample" picks evenly spaced sentences across the text so
+    the end of a long description still counts.
+    """
+    tokens = text.split()
+    if len(tokens) <= max_tokens:
+        return text
+    if mode == "head":
+        return " ".join(tokens[:max_tokens])
+
+    sentences = [s.strip() for s in SENTENCE_RE.findall(text) if s.strip()]
+    average = max(1, len(tokens) // max(1, len(sentences)))
+    wanted = max(1, max_tokens // average)
+    step = max(1.0, len(sentences) / wanted)
+
+    kept = []
+    budget = max_tokens
+    position = 0.0
+    while int(position) < len(sentences) and budget > 0:
+        words = sentences[int(position)].split()[:budget]
+        kept.extend(words)
+        budget -= len(words)
+        position += step
+    return " ".join(kept)
+
+
+def prepare_description(description, config=None):
+    config = config or text_prep
+    return limit_tokens(clean_text(description or ""), config.max_tokens, config.mode)
+
+
+def prepare_sentiment_text(title, description, config=None):
+    """Title plus the cleaned, token-limited description."""
+    config = config or text_prep
+    if not config.enabled:
+        return f"{title} {description}"
+    return f"{title} {prepare_description(description, config)}"
@@ -0,0 +1,61 @@
+import re
+from collections.abc import Mapping
+
+from . import text_prep
+from ..instrumentation import instrumented
+
+# Precompiled once; shared by keywords, hashtags and sentiment
+WORD_RE = re.compile(r"\b[a-zA-Z]{3,}\b")  # words with 3+ letters
+CAPITALIZED_RE = re.compile(r"\b[A-Z][a-z]+\b")
+HASHTAG_RE = re.compile(r"#(\w+)")
+
+
+class VideoTokens:
+    """
+    Everything the analyzers need from one video's text, produced in a
+    single pass: lowercased title/description words, capitalized title
+    terms, #tags and the prepared description used for sentiment.
+    """
+
+    __slots__ = ("title_words", "description_words", "capitalized", "hashtags", "sentiment_description")
+
+    def __init__(self, title_words, description_words, capitalized, hashtags, sentiment_description):
+        self.title_words = title_words
+        self.description_words = description_words
+        self.capitalized = capitalized
+        self.hashtags = hashtags
+        self.sentiment_description = sentiment_description
+
+    @property
+    def words(self):
+        """Title words followed by description words."""
+        return self.title_words + self.description_words
+
+
+def tokenize(title, description="", sentiment=True):
+    """Tokenize one title/description; sentiment=False skips sentiment text prep."""
+    title = title or ""
+    description = description or ""
+    return VideoTokens(
+        title_words=tuple(WORD_RE.findall(title.lower())),
+        description_words=tuple(WORD_RE.findall(description.lower())),
+        capitalized=tuple(word.lower() for word in CAPITALIZED_RE.findall(title)),
+        hashtags=tuple(tag.lower() for tag in HASHTAG_RE.findall(f"{title} {description}")),
+        sentiment_description=(
+            None if not sentiment
+            else text_prep.prepare_description(description) if text_prep.text_prep.enabled
+            else description
+        ),
+    )
+
+
+def tokenize_video(video, sentiment=True):
+    if isinstance(video, Mapping):  # dicts and video_records.VideoRecord
+        return tokenize(video.get("title", ""), video.get("description", ""), sentiment)
+    return tokenize(str(video), sentiment=sentiment)
+
+
+@instrumented("tokenize")
+def tokenize_videos(videos, sentiment=True):
+    """One VideoTokens per video, in order."""
+    return [tokenize_video(video, sentiment) for video in videos]
@@ -0,0 +1,85 @@
+"""
+Rising-term detection over a series of snapshots.
+
+Inputs are (rows × snapshots) matrices: term counts, or a video's views,
+one column per snapshot in fetch order, plus each snapshot's time in
+hours. Everything is computed column-wise with NumPy, so a few thousand
+snapshots × terms is a handful of array operations rather than Python
+loops.
+"""
+import warnings
+
+import numpy as np
+
+from ..instrumentation import instrumented
+
+# Snapshots taken closer together than this (hours) are treated as this far apart
+MIN_INTERVAL_HOURS = 1 / 60
+
+
+@instrumented("velocity")
+def trend_velocity(values, hours, min_std=1.0):
+    """
+    Latest-snapshot trend metrics for every row of `values`:
+
+    - value: the latest observation
+    - velocity: change per hour over the last interval
+    - acceleration: change in velocity per hour over the last two intervals
+    - zscore: latest value against the mean/std of the earlier ones (std
+      floored at `min_std`, so a term appearing from nowhere still scores)
+
+    NaN marks a missing observation (e.g. a video not in that snapshot);
+    metrics that need it are NaN too. Needs at least two snapshots.
+    """
+    values = np.asarray(values, dtype=float)
+    hours = np.asarray(hours, dtype=float)
+    if values.ndim != 2 or values.shape[1] < 2:
+        raise ValueError("need a (rows, snapshots) matrix with at least two snapshots")
+
+    # Only the last two intervals matter for velocity and acceleration
+    intervals = np.maximum(np.diff(hours[-3:]), MIN_INTERVAL_HOURS)
+    velocity = np.diff(values[:, -3:], axis=1) / intervals
+
+    if velocity.shape[1] >= 2:
+        span = (intervals[-1] + intervals[-2]) / 2
+        acceleration = (velocity[:, -1] - velocity[:, -2]) / span
+    else:
+        acceleration = np.zeros(len(values))
+
+    history = values[:, :-1]
+    if np.isnan(history).any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN history rows
+            mean = np.nanmean(history, axis=1)
+            std = np.nanstd(history, axis=1)
+    else:
+        mean = history.mean(axis=1)
+        std = history.std(axis=1)
+    zscore = (values[:, -1] - mean) / np.maximum(np.nan_to_num(std), min_std)
+
+    return {
+        "value": values[:, -1],
+        "velocity": velocity[:, -1],
+        "acceleration": acceleration,
+        "zscore": zscore,
+    }
+
+
+def top_rising(labels, metrics, top_n=10, key="zscore"):
+    """
+    The `top_n` rows with positive velocity, highest `key` first, as
+    dicts of label + rounded metrics.
+    """
+    score = np.where(metrics["velocity"] > 0, np.nan_to_num(metrics[key], nan=-np.inf), -np.inf)
+    candidates = np.flatnonzero(np.isfinite(score))
+    if len(candidates) > top_n:
+        candidates = candidates[np.argpartition(-score[candidates], top_n - 1)[:top_n]]
+    order = candidates[np.argsort(-score[candidates], kind="stable")]
+
+    return [
+        {
+            "label": labels[i],
+            **{name: round(float(np.nan_to_num(metrics[name][i])), 2) for name in metrics},
+        }
+        for i in order
+    ]
@@ -0,0 +1,335 @@
+"""
+Read-only JSON API for dashboards (djangorestframework).
+
+    api/trending/  ?country=US&category=10&engagement=high
+    api/compare/   ?countries=US,IN,GB
+    api/keywords/  ?country=US&kind=hashtags
+
+Every endpoint serves from the trend cache or the latest stored snapshot
+and its materialized analysis (trend_cache.get_stored_chart); none of
+them calls the YouTube API, so an empty result means the chart hasn't
+been fetched yet (home page visit or `manage.py fetch_trends`).
+
+- `?fields=id,title,views` picks the serialized fields (serializers.py).
+- Lists are cursor-paginated (`next`/`previous` links, `?page_size=`).
+  A cursor pins the snapshot it started on, so paging stays consistent
+  while the chart is refreshed underneath.
+- Responses carry a weak ETag derived from the snapshot (or chart
+  contents) and the query; a matching If-None-Match gets a 304 before
+  any analysis is loaded or serialized.
+- Bodies are brotli- or gzip-compressed per Accept-Encoding (brotli only
+  when the optional `brotli` package is installed).
+"""
+import gzip
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import instrumentation
+from .chart_analysis import ANALYZER_VERSION, ENGAGEMENT_LEVELS, analyze_chart, load_chart_analysis
+from .constants import CATEGORIES, COUNTRIES
+from .models import TrendSnapshot
+from .serializers import CountrySerializer, TermSerializer, VideoSerializer, term_rows
+from .trend_cache import get_stored_chart
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+# Same threshold as Django's GZipMiddleware: smaller bodies don't shrink
+MIN_COMPRESS_LENGTH = 200
+# On-the-fly compression levels: most of the saving for a fraction of the CPU of the maximum
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Videos per country in a comparison, as on the compare page
+COMPARE_TOP_VIDEOS = 10
+
+
+def _analysis_max_results():
+    return getattr(settings, "TRENDS_ANALYSIS_MAX_RESULTS", 20)
+
+
+def accepted_encoding(accept_encoding):
+    """The Content-Encoding to use for an Accept-Encoding header, or None."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[coding.strip().lower()] = quality
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if offered.get(coding, offered.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def compress_response(request, response):
+    """Post-render callback: compress the body if the client accepts it and it shrinks."""
+    patch_vary_headers(response, ("Accept-Encoding",))
+    content = response.content
+    if len(content) < MIN_COMPRESS_LENGTH or response.has_header("Content-Encoding"):
+        return
+    coding = accepted_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if coding == "br":
+        compressed = brotli.compress(content, quality=BROTLI_QUALITY)
+    elif coding == "gzip":
+        compressed = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return
+    if len(compressed) >= len(content):
+        return
+    response.content = compressed
+    response["Content-Encoding"] = coding
+    response["Content-Length"] = str(len(compressed))
+
+
+def chart_version(snapshot_id, videos):
+    """Identifies a chart's contents: its snapshot, or a digest of an unstored chart."""
+    if snapshot_id:
+        return f"s{snapshot_id}"
+    digest = hashlib.blake2b(digest_size=12)
+    for video in videos or ():
+        digest.update(f"{video['id']}:{video['views']}:{video['likes']}:{video['comments']};".encode())
+    return "c" + digest.hexdigest()
+
+
+def response_etag(request, versions):
+    """Weak ETag over the analyzer version, chart versions and query (compressed bodies differ byte-wise)."""
+    query = sorted((name, value) for name, values in request.query_params.lists() for value in values)
+    key = f"{ANALYZER_VERSION}|{request.path}|{'|'.join(versions)}|{query}"
+    return 'W/"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+
+class ChartCursorPagination(CursorPagination):
+    """
+    DRF cursor pagination over an already-ordered list (one chart's videos
+    or terms) instead of a queryset. The cursor holds the offset and, as
+    its position, the snapshot the first page came from.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def pinned_snapshot(self, request):
+        """Snapshot ID a cursor was issued for, or None (first page, or an unstored chart)."""
+        cursor = self.decode_cursor(request)
+        if cursor is None or not cursor.position:
+            return None
+        try:
+            return int(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_list(self, items, request, snapshot_id=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        offset = cursor.offset if cursor else 0
+        position = str(snapshot_id) if snapshot_id else None
+
+        end = offset + self.page_size
+        self.next_cursor = Cursor(end, False, position) if end < len(items) else None
+        self.previous_cursor = Cursor(max(offset - self.page_size, 0), False, position) if offset else None
+        return items[offset:end]
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_cursor) if self.next_cursor else None
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_cursor) if self.previous_cursor else None
+
+
+class TrendAPIView(APIView):
+    """Public, read-only, JSON-only; responses are compressed after rendering."""
+
+    authentication_classes = []  # no session/user lookups for public data
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+    pagination_class = ChartCursorPagination
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response):
+            response.add_post_render_callback(partial(compress_response, request))
+        return response
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = self.pagination_class()
+        return self._paginator
+
+    def chart_params(self):
+        params = self.request.query_params
+        engagement = params.get("engagement", "")
+        if engagement not in ENGAGEMENT_LEVELS:
+            raise ValidationError({"engagement": f"One of: {', '.join(filter(None, ENGAGEMENT_LEVELS))}"})
+        country = params.get("country", "US").strip().upper()
+        if country not in COUNTRIES:
+            raise ValidationError({"country": f"Unknown country code: {country}"})
+        category = params.get("category", "").strip() or None
+        if category is not None and category not in CATEGORIES:
+            raise ValidationError({"category": f"Unknown category id: {category}"})
+        return country, category, engagement
+
+    def not_modified(self, request, versions):
+        """(304 response or None, etag)."""
+        etag = response_etag(request, versions)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+            patch_vary_headers(response, ("Accept-Encoding",))
+        return response, etag
+
+    def chart(self, country, category, engagement, pinned=None):
+        """
+        (load, snapshot_id, version) of a chart, or of the pinned snapshot a
+        cursor was issued for (404 unless it is a snapshot of this same
+        country and category). load() returns the analysis; it is only
+        called once the ETag check has passed, so a 304 never loads it.
+        """
+        max_results = _analysis_max_results()
+        if pinned is not None:
+            # A cursor only pages the chart it was issued for: a snapshot of
+            # another country or category is as invalid as a corrupt cursor
+            if not TrendSnapshot.objects.filter(pk=pinned, region=country, category=category or "").exists():
+                raise NotFound(ChartCursorPagination.invalid_cursor_message)
+
+            def load():
+                analysis = load_chart_analysis(pinned, engagement, max_results)
+                if analysis is None:
+                    raise NotFound(ChartCursorPagination.invalid_cursor_message)
+                return analysis
+            return load, pinned, chart_version(pinned, None)
+
+        videos, snapshot_id = get_stored_chart(country, category, max_results)
+
+        def load():
+            analysis = load_chart_analysis(snapshot_id, engagement, max_results) if snapshot_id else None
+            if analysis is None:
+                # Stored but not materialized (or never stored): analyse the cached chart here
+                analysis = analyze_chart(videos, country, engagement)
+            return analysis
+        return load, snapshot_id, chart_version(snapshot_id, videos)
+
+
+class TrendingAPIView(TrendAPIView):
+    """The videos of one chart, sorted by engagement."""
+
+    def get(self, request):
+        country, category, engagement = self.chart_params()
+        fields = VideoSerializer.parse_fields(request.query_params.get("fields"))
+        load, snapshot_id, version = self.chart(
+            country, category, engagement, self.paginator.pinned_snapshot(request),
+        )
+        not_modified, etag = self.not_modified(request, [version])
+        if not_modified is not None:
+            return not_modified
+
+        page = self.paginator.paginate_list(load()["videos"], request, snapshot_id)
+        with instrumentation.stage("render"):
+            results = VideoSerializer(page, many=True, fields=fields).data
+        response = Response({
+            "country": country,
+            "category": category,
+            "engagement": engagement,
+            "snapshot": snapshot_id,
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
+            "results": results,
+        })
+        response["ETag"] = etag
+        return response
+
+
+class KeywordsAPIView(TrendAPIView):
+    """Top title keywords (or #tags, `?kind=hashtags`) of one chart."""
+
+    KINDS = ("keywords", "hashtags")
+
+    def get(self, request):
+        country, category, engagement = self.chart_params()
+        kind = request.query_params.get("kind", "keywords")
+        if kind not in self.KINDS:
+            raise ValidationError({"kind": f"One of: {', '.join(self.KINDS)}"})
+        fields = TermSerializer.parse_fields(request.query_params.get("fields"))
+        load, snapshot_id, version = self.chart(
+            country, category, engagement, self.paginator.pinned_snapshot(request),
+        )
+        not_modified, etag = self.not_modified(request, [version])
+        if not_modified is not None:
+            return not_modified
+
+        page = self.paginator.paginate_list(term_rows(load()[kind]), request, snapshot_id)
+        response = Response({
+            "country": country,
+            "category": category,
+            "kind": kind,
+            "snapshot": snapshot_id,
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
+            "results": TermSerializer(page, many=True, fields=fields).data,
+        })
+        response["ETag"] = etag
+        return response
+
+
+class CompareAPIView(TrendAPIView):
+    """
+    Chart-level stats and top videos per country. `fields` narrows the
+    country objects, `video_fields` their videos. Not paginated: the
+    country list is capped at TRENDS_COMPARE_MAX_REGIONS.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        codes = [code.strip().upper() for code in params.get("countries", "US,IN").split(",") if code.strip()]
+        unknown = [code for code in codes if code not in COUNTRIES]
+        if unknown:
+            raise ValidationError({"countries": f"Unknown country code(s): {', '.join(unknown)}"})
+        codes = list(dict.fromkeys(codes))[:settings.TRENDS_COMPARE_MAX_REGIONS]
+        fields = CountrySerializer.parse_fields(params.get("fields"))
+        video_fields = VideoSerializer.parse_fields(params.get("video_fields"), "video_fields")
+
+        charts = [(code, *self.chart(code, None, "")) for code in codes]
+        not_modified, etag = self.not_modified(request, [version for *_, version in charts])
+        if not_modified is not None:
+            return not_modified
+
+        rows = []
+        for code, load, snapshot_id, _ in charts:
+            analysis = load()
+            rows.append({
+                "code": code,
+                "name": COUNTRIES[code],
+                "snapshot": snapshot_id,
+                "total_videos": analysis["total_videos"],
+                "avg_engagement": analysis["avg_engagement"],
+                "sentiment_counts": analysis["sentiment_counts"],
+                "keywords": term_rows(analysis["keywords"]),
+                "hashtags": term_rows(analysis["hashtags"]),
+                "summary": analysis["summary"],
+                "videos": analysis["videos"][:COMPARE_TOP_VIDEOS],
+            })
+        with instrumentation.stage("render"):
+            results = CountrySerializer(rows, many=True, fields=fields, video_fields=video_fields).data
+        response = Response({"results": results})
+        response["ETag"] = etag
+        return response
@@ -1,6 +1,35 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class TrendsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trends'
+
+    def ready(self):
+        from django.core.cache import caches
+
+        from .ai_analysis.sentiment_analyzer import configure_sentiment_cache, configure_sentiment_workers
+        from .ai_analysis.text_prep import configure_text_prep
+        from .instrumentation import configure as configure_instrumentation
+
+        # Size the sentiment LRU and attach the optional shared cache tier
+        shared_alias = getattr(settings, "SENTIMENT_SHARED_CACHE", None)
+        configure_sentiment_cache(
+            maxsize=getattr(settings, "SENTIMENT_CACHE_SIZE", 4096),
+            shared=caches[shared_alias] if shared_alias else None,
+        )
+
+        # Process pool for large sentiment batches
+        configure_sentiment_workers(getattr(settings, "SENTIMENT_WORKERS", None))
+
+        # Bound VADER's work on long descriptions
+        configure_text_prep(
+            enabled=getattr(settings, "SENTIMENT_PREPARE_TEXT", True),
+            max_tokens=getattr(settings, "SENTIMENT_MAX_TOKENS", 128),
+            mode=getattr(settings, "SENTIMENT_TEXT_MODE", "sample"),
+            title_weight=getattr(settings, "SENTIMENT_TITLE_WEIGHT", None),
+        )
+
+        # Stage timings, Server-Timing headers and /metrics
+        configure_instrumentation(getattr(settings, "TRENDS_INSTRUMENTATION", False))
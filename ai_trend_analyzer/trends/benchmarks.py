@@ -0,0 +1,845 @@
+"""
+Offline micro-benchmarks for the analysis pipeline.
+
+Each suite returns a list of row dicts; `manage.py benchmark` prints them
+as a table. Inputs are synthetic and seeded, so runs are reproducible and
+need no network access or API key.
+"""
+import gc
+import logging
+import pickle
+import random
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from .instrumentation import StageTimings
+from .synthetic import synthetic_api_items, synthetic_description, synthetic_videos
+
+
+def timed(fn, *args, **kwargs):
+    """(result, elapsed milliseconds)"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def bench_sentiment_batch(sizes=(50, 200, 800, 3200)):
+    """Scalar analyze_sentiment loop vs analyze_sentiment_batch, cold cache."""
+    from .ai_analysis.sentiment_analyzer import (
+        SENTIMENT_WORKERS, _get_pool, _score_chunk, analyze_sentiment,
+        analyze_sentiment_batch, sentiment_cache,
+    )
+
+    # Start the worker processes up front so spawn time isn't measured
+    _get_pool().submit(_score_chunk, ["warm up"]).result()
+
+    rows = []
+    for size in sizes:
+        videos = synthetic_videos(size, seed=size)
+        texts = [f"{v['title']} {v['description']}" for v in videos]
+
+        sentiment_cache.clear()
+        scalar, scalar_ms = timed(lambda: [analyze_sentiment(t, "US") for t in texts])
+        sentiment_cache.clear()
+        batch, batch_ms = timed(analyze_sentiment_batch, texts, "US")
+
+        rows.append({
+            "texts": size,
+            "workers": SENTIMENT_WORKERS,
+            "scalar_ms": round(scalar_ms, 1),
+            "batch_ms": round(batch_ms, 1),
+            "speedup": round(scalar_ms / batch_ms, 2) if batch_ms else None,
+            "identical": scalar == batch,
+        })
+    return rows
+
+
+def traced(fn, *args, **kwargs):
+    """(result, elapsed milliseconds, peak traced KiB)"""
+    tracemalloc.start()
+    try:
+        result, ms = timed(fn, *args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, ms, peak / 1024
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench_text_prep(sizes=(300,), budgets=(32, 64, 128, 256)):
+    """
+    Accuracy vs speed of sentiment text preparation against the full
+    title + description baseline: per-video latency (p50/p95/max), label
+    agreement and mean absolute compound difference per token budget.
+    """
+    from .ai_analysis.sentiment_analyzer import _finish, analyzer
+    from .ai_analysis.text_prep import TextPrepConfig, prepare_sentiment_text
+
+    rows = []
+    for size in sizes:
+        rng = random.Random(size)
+        videos = synthetic_videos(size, seed=size)
+        # Mix in very long descriptions (link dumps, sponsor blocks, timestamps)
+        for video in videos[::3]:
+            video["description"] = synthetic_description(rng, lines=rng.randint(100, 300))
+
+        def score_all(config):
+            latencies, results = [], []
+            for v in videos:
+                text = prepare_sentiment_text(v["title"], v["description"], config)
+                started = time.perf_counter()
+                scores = analyzer.polarity_scores(text)  # uncached on purpose
+                latencies.append((time.perf_counter() - started) * 1000)
+                results.append(_finish(scores, "US"))
+            return latencies, results
+
+        baseline_ms, baseline = score_all(TextPrepConfig(enabled=False))
+        variants = [("full text", None)] + [(f"sample {b}", TextPrepConfig(max_tokens=b)) for b in budgets]
+        variants += [(f"head {budgets[-1]}", TextPrepConfig(max_tokens=budgets[-1], mode="head"))]
+
+        for name, config in variants:
+            latencies, results = (baseline_ms, baseline) if config is None else score_all(config)
+            agree = sum(a["label"] == b["label"] for a, b in zip(results, baseline))
+            rows.append({
+                "videos": size,
+                "mode": name,
+                "p50_ms": round(_percentile(latencies, 50), 3),
+                "p95_ms": round(_percentile(latencies, 95), 3),
+                "max_ms": round(max(latencies), 3),
+                "label_agreement": f"{agree / len(videos):.1%}",
+                "mean_abs_diff": round(
+                    sum(abs(a["score"] - b["score"]) for a, b in zip(results, baseline)) / len(videos), 4
+                ),
+            })
+    return rows
+
+
+def bench_tokenizer(sizes=(20, 200, 2000), repeat=5):
+    """
+    Text-analysis CPU per request: each analyzer scanning the text itself
+    vs one shared tokenize_videos pass feeding keywords, hashtags (for all
+    four engagement filters, as materialization does) and sentiment prep.
+    """
+    from .ai_analysis.hashtag_extractor import extract_hashtags
+    from .ai_analysis.keyword_analyzer import extract_keywords
+    from .ai_analysis.text_prep import prepare_sentiment_text
+    from .ai_analysis.tokenizer import tokenize_videos
+
+    rows = []
+    for size in sizes:
+        videos = synthetic_videos(size, seed=size)
+        for i, video in enumerate(videos):
+            video["engagement_score"] = (i * 7) % 12
+            if i % 2:  # half the charts have no #tags, exercising the word-weighting path
+                video["description"] = video["description"].replace("#", "")
+        titles = [v["title"] for v in videos]
+        subsets = [videos, videos[: size // 2], videos[size // 2:], videos[::3]]
+
+        def separate():
+            extract_keywords(titles)
+            for subset in subsets:
+                extract_hashtags(subset)
+            return [prepare_sentiment_text(v["title"], v["description"]) for v in videos]
+
+        def shared():
+            tokens = tokenize_videos(videos)
+            by_video = {id(v): t for v, t in zip(videos, tokens)}
+            extract_keywords(titles, tokens=tokens)
+            for subset in subsets:
+                extract_hashtags(subset, tokens=[by_video[id(v)] for v in subset])
+            return [f"{v['title']} {t.sentiment_description}" for v, t in zip(videos, tokens)]
+
+        separate_ms = min(timed(separate)[1] for _ in range(repeat))
+        shared_ms = min(timed(shared)[1] for _ in range(repeat))
+        rows.append({
+            "videos": size,
+            "separate_ms": round(separate_ms, 2),
+            "shared_ms": round(shared_ms, 2),
+            "speedup": round(separate_ms / shared_ms, 2) if shared_ms else None,
+        })
+    return rows
+
+
+def _expanded_hashtag_counts(video_list, tokens):
+    """The previous extract_hashtags counting: repeat each word `weight` times in a list."""
+    from .ai_analysis.hashtag_extractor import STOPWORDS
+
+    trending_terms = []
+    category_tags = []
+    for video, video_tokens in zip(video_list, tokens):
+        trending_terms.extend(video_tokens.capitalized)
+        engagement_weight = max(1, int(video.get("engagement_score", 0) / 2))
+        for word in video_tokens.words:
+            if word not in STOPWORDS and len(word) > 3:
+                trending_terms.extend([word] * engagement_weight)
+        category = video.get("categoryName", "")
+        if category:
+            category_tags.append(category.lower().replace(" & ", "").replace(" ", ""))
+    return Counter(trending_terms + category_tags * 3).most_common(20)
+
+
+def bench_weighted_hashtags(sizes=(200, 2000, 20000)):
+    """
+    Hashtag counting on charts without #tags (the word-weighting path):
+    list expansion vs weighted Counter, time and peak traced memory.
+    """
+    from .ai_analysis.hashtag_extractor import extract_hashtags
+    from .ai_analysis.tokenizer import tokenize_videos
+
+    rows = []
+    for size in sizes:
+        videos = synthetic_videos(size, seed=size)
+        rng = random.Random(size)
+        for video in videos:
+            video["description"] = video["description"].replace("#", "")
+            video["engagement_score"] = round(rng.uniform(0, 60), 2)  # viral charts reach high ratios
+            video["categoryName"] = "Music"
+        tokens = tokenize_videos(videos, sentiment=False)
+
+        _, expanded_ms, expanded_kib = traced(_expanded_hashtag_counts, videos, tokens)
+        _, weighted_ms, weighted_kib = traced(extract_hashtags, videos, tokens=tokens)
+        rows.append({
+            "videos": size,
+            "expanded_ms": round(expanded_ms, 2),
+            "weighted_ms": round(weighted_ms, 2),
+            "expanded_peak_kib": round(expanded_kib),
+            "weighted_peak_kib": round(weighted_kib),
+        })
+    return rows
+
+
+def bench_engagement(sizes=(1000, 10000, 50000)):
+    """Per-video calculate_engagement + sort/filter vs the array versions (historical recompute)."""
+    from .ai_analysis.engagement_calculator import (
+        calculate_engagement, calculate_engagement_array, engagement_level_mask, rank_by_engagement,
+    )
+
+    rows = []
+    for size in sizes:
+        videos = synthetic_videos(size, seed=size)
+        columns = [[v[field] for v in videos] for field in ("views", "likes", "comments", "channel_subscribers")]
+
+        def scalar():
+            scores = [calculate_engagement(*row)["ratio"] for row in zip(*columns)]
+            ranked = sorted(range(size), key=lambda i: scores[i], reverse=True)
+            return [i for i in ranked if scores[i] > 5]
+
+        def vectorized():
+            scores = calculate_engagement_array(*columns)
+            in_level = engagement_level_mask(scores, "high")
+            ranked = rank_by_engagement(scores)
+            return ranked[in_level[ranked]].tolist()
+
+        (expected, scalar_ms), (actual, array_ms) = timed(scalar), timed(vectorized)
+        rows.append({
+            "videos": size,
+            "scalar_ms": round(scalar_ms, 2),
+            "array_ms": round(array_ms, 2),
+            "speedup": round(scalar_ms / array_ms, 1) if array_ms else None,
+            "same": expected == actual,
+        })
+    return rows
+
+
+def _video_dict(item, subscribers_by_channel):
+    """The per-video dict fetch_trending_videos used to build."""
+    snippet = item.get("snippet", {})
+    stats = item.get("statistics", {})
+    video_id = item.get("id")
+    channel_id = snippet.get("channelId")
+    return {
+        "id": video_id,
+        "videoId": video_id,
+        "title": snippet.get("title", "No title"),
+        "description": snippet.get("description", ""),
+        "channel": snippet.get("channelTitle", "Unknown"),
+        "thumbnail": snippet.get("thumbnails", {}).get("medium", {}).get("url", ""),
+        "views": int(stats.get("viewCount", 0)),
+        "likes": int(stats.get("likeCount", 0)),
+        "comments": int(stats.get("commentCount", 0)),
+        "link": f"https://www.youtube.com/watch?v={video_id}",
+        "channel_subscribers": subscribers_by_channel.get(channel_id, 0),
+        "channelId": channel_id,
+        "categoryId": snippet.get("categoryId", "0"),
+        "publishedAt": snippet.get("publishedAt"),
+    }
+
+
+def bench_video_records(sizes=(20, 50, 200)):
+    """
+    Memory per chart: parsed videos held in process (dicts vs VideoRecords,
+    excluding the text shared with the API response) and bytes stored per
+    cache entry (pickled list of dicts vs pickled VideoBatch).
+    """
+    from .video_records import VideoBatch, VideoRecord
+
+    rows = []
+    for size in sizes:
+        videos = synthetic_videos(size, seed=size)
+        items = synthetic_api_items(videos)
+        subscribers = {v["channelId"]: v["channel_subscribers"] for v in videos}
+
+        dicts, _, dict_kib = traced(lambda: [_video_dict(item, subscribers) for item in items])
+        records, _, record_kib = traced(lambda: [VideoRecord.from_api_item(item, subscribers) for item in items])
+        dict_bytes = len(pickle.dumps(dicts, pickle.HIGHEST_PROTOCOL))
+        batch_bytes = len(pickle.dumps(VideoBatch.from_videos(records), pickle.HIGHEST_PROTOCOL))
+        rows.append({
+            "videos": size,
+            "dicts_kib": round(dict_kib, 1),
+            "records_kib": round(record_kib, 1),
+            "cached_dicts_kib": round(dict_bytes / 1024, 1),
+            "cached_batch_kib": round(batch_bytes / 1024, 1),
+            "cache_saving": f"{100 - 100 * batch_bytes / dict_bytes:.0f}%",
+        })
+    return rows
+
+
+class _PagedYouTube:
+    """Offline stand-in for the YouTube service: a chart served in pages, with fixed latency per call."""
+
+    def __init__(self, items, latency_ms):
+        self.items = items
+        self.latency = latency_ms / 1000
+
+    def _response(self, body):
+        class Request:
+            headers = {}
+
+            def execute(request):
+                time.sleep(self.latency)
+                return body
+
+        return Request()
+
+    def videos(self):
+        def list_(maxResults, pageToken=None, **kw):
+            start = int(pageToken or 0)
+            end = start + maxResults
+            return self._response({
+                "items": self.items[start:end],
+                "nextPageToken": str(end) if end < len(self.items) else None,
+            })
+        return type("Videos", (), {"list": staticmethod(list_)})
+
+    def channels(self):
+        def list_(id, **kw):
+            return self._response({"items": [
+                {"id": cid, "statistics": {"subscriberCount": "1000"}} for cid in id.split(",")
+            ]})
+        return type("Channels", (), {"list": staticmethod(list_)})
+
+
+def bench_pagination(sizes=(50, 200), latency_ms=30):
+    """
+    Time to the first analysed video, total time and peak memory for a
+    paged chart: fetch_trending_videos + analysis of the full list vs
+    iter_trending_videos streamed through iter_enriched_videos (keeping
+    only a top-10 and sentiment counts). API latency is simulated.
+    """
+    import heapq
+
+    from django.test import override_settings
+
+    from . import youtube_fetcher
+    from .ai_analysis import sentiment_analyzer
+    from .chart_analysis import iter_enriched_videos
+
+    rows = []
+    for limit in sizes:
+        items = synthetic_api_items(synthetic_videos(limit, seed=limit))
+        pool = youtube_fetcher.YouTubeClientPool(factory=lambda: _PagedYouTube(items, latency_ms))
+
+        def whole_list():
+            videos = youtube_fetcher.fetch_trending_videos("US", max_results=limit)
+            enriched = list(iter_enriched_videos(videos, "US"))
+            return (time.perf_counter() - started) * 1000, len(enriched)
+
+        def streamed():
+            first_ms, top, counts = None, [], Counter()
+            stream = youtube_fetcher.iter_trending_videos("US", limit=limit)
+            for video, _ in iter_enriched_videos(stream, "US"):
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - started) * 1000
+                counts[video["sentiment"]["label"]] += 1
+                heapq.heappush(top, (video["engagement_score"], video["id"]))
+                if len(top) > 10:
+                    heapq.heappop(top)
+            return first_ms, sum(counts.values())
+
+        original = youtube_fetcher.client_pool
+        youtube_fetcher.client_pool = pool
+        try:
+            with override_settings(YOUTUBE_CONDITIONAL_REQUESTS=False):
+                for mode, run in (("list", whole_list), ("stream", streamed)):
+                    sentiment_analyzer.sentiment_cache.clear()
+                    started = time.perf_counter()
+                    (first_ms, count), total_ms, peak_kib = traced(run)
+                    rows.append({
+                        "videos": limit,
+                        "mode": mode,
+                        "first_ms": round(first_ms, 1),
+                        "total_ms": round(total_ms, 1),
+                        "peak_kib": round(peak_kib, 1),
+                        "analysed": count,
+                    })
+        finally:
+            youtube_fetcher.client_pool = original
+    return rows
+
+
+def bench_instrumentation(sizes=(200,), calls=200_000):
+    """
+    Cost of instrumentation: per call of an @instrumented function (plain,
+    disabled, enabled) and on a whole live chart analysis.
+    """
+    from . import instrumentation
+    from .ai_analysis.sentiment_analyzer import _get_pool, _score_chunk, sentiment_cache
+    from .chart_analysis import analyze_chart
+
+    # Start the sentiment worker processes up front so spawn time isn't measured
+    _get_pool().submit(_score_chunk, ["warm up"]).result()
+
+    def noop():
+        return None
+
+    wrapped = instrumentation.instrumented("noop")(noop)
+    enabled = instrumentation.is_enabled()
+    rows = []
+    try:
+        for mode, fn, on in (("plain", noop, False), ("disabled", wrapped, False), ("enabled", wrapped, True)):
+            instrumentation.configure(on)
+            _, ms = timed(lambda: [fn() for _ in range(calls)])
+            rows.append({"case": f"call ({mode})", "ms": round(ms, 2), "ns_per_call": round(ms * 1e6 / calls, 1)})
+
+        for size in sizes:
+            for mode, on in (("disabled", False), ("enabled", True)):
+                instrumentation.configure(on)
+                samples = []
+                for _ in range(5):
+                    sentiment_cache.clear()
+                    _, ms = timed(analyze_chart, synthetic_videos(size, seed=size), "US")
+                    samples.append(ms)
+                rows.append({"case": f"analyze_chart {size} ({mode})", "ms": round(_percentile(samples, 50), 2),
+                             "ns_per_call": ""})
+    finally:
+        instrumentation.configure(enabled)
+    return rows
+
+
+# ---------------------- End-to-end request paths ----------------------
+
+# Stages the views report through instrumentation (Server-Timing), in request
+# order. They nest: "chart" covers the YouTube fetch ("youtube") and, on a
+# miss, persisting and materializing the snapshot, whose analysis stages are
+# also counted under their own names. A stage's time is summed over its calls,
+# including concurrent ones (compare's regions), so stages don't add up to the total.
+E2E_STAGES = (
+    "chart", "youtube", "tokenize", "keywords", "sentiment", "engagement", "hashtags", "summary",
+    "stored_analysis", "rising", "render",
+)
+
+
+@contextmanager
+def offline_youtube(api=None):
+    """Point the fetcher at a fake YouTube API server (fake_youtube) for the duration."""
+    from django.test import override_settings
+
+    from . import youtube_fetcher
+    from .fake_youtube import FakeYouTubeAPI, serve_in_thread
+
+    original = youtube_fetcher.client_pool
+    with serve_in_thread(api or FakeYouTubeAPI()) as endpoint:
+        # Full fetch + parse every time: no 304s from earlier repeats
+        with override_settings(YOUTUBE_API_ENDPOINT=endpoint, YOUTUBE_CONDITIONAL_REQUESTS=False):
+            youtube_fetcher.client_pool = youtube_fetcher.YouTubeClientPool()
+            try:
+                yield endpoint
+            finally:
+                youtube_fetcher.client_pool = original
+
+
+def server_timing(header):
+    """{stage: ms} from a Server-Timing header (InstrumentationMiddleware), "total" included."""
+    stages = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+def _e2e_request(client, url, cold):
+    """One GET through the middleware and view; returns its stage timings."""
+    from .ai_analysis import sentiment_analyzer
+    from .models import TrendSnapshot
+    from .trend_cache import _cache
+
+    if cold:
+        # No cached chart or stored snapshot: the view fetches, persists and materializes
+        _cache().clear()
+        TrendSnapshot.objects.all().delete()
+        sentiment_analyzer.sentiment_cache.clear()
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return server_timing(response["Server-Timing"])
+
+
+def bench_e2e(sizes=(2, 5, 10), repeat=5, scratch_db=True):
+    """
+    views.home and views.compare_trends (over each region count in
+    `sizes`) as served: test-client requests through the middleware,
+    trend cache and views against the offline fake API, timed per stage
+    by the views' own instrumentation. Each path runs cold (nothing
+    cached or stored, cold sentiment cache) and warm (cached chart,
+    materialized analysis): p50/p95 per stage over `repeat` runs after a
+    warm-up run, plus the request's peak traced memory from one extra run.
+    """
+    from django.conf import settings
+    from django.test import Client, override_settings
+
+    from . import instrumentation
+    from .ai_analysis.sentiment_analyzer import _get_pool, _score_chunk
+    from .constants import COUNTRIES
+
+    # Start the sentiment worker processes up front so spawn time isn't measured
+    _get_pool().submit(_score_chunk, ["warm up"]).result()
+
+    cases = [("home", "1 region", "/?country=US")]
+    cases += [("compare", f"{count} regions", "/compare/?countries=" + ",".join(list(COUNTRIES)[:count]))
+              for count in sizes]
+
+    enabled = instrumentation.is_enabled()
+    instrumentation.configure(True)
+    # Requests, fetches and ingests each log an info record; keep them out of the results table
+    app_log = logging.getLogger("trends")
+    log_level = app_log.level
+    app_log.setLevel(logging.WARNING)
+    rows = []
+    try:
+        with scratch_database() if scratch_db else nullcontext(), offline_youtube(), \
+                override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):  # the test client's host
+            client = Client()
+            for path, scale, url in cases:
+                for state in ("cold", "warm"):
+                    cold = state == "cold"
+                    # Untimed warm-up: templates, the fake's charts, pooled clients (and the warm cache)
+                    _e2e_request(client, url, cold)
+                    runs = []
+                    for _ in range(repeat):
+                        gc.collect()
+                        runs.append(_e2e_request(client, url, cold))
+                    _, _, peak = traced(_e2e_request, client, url, cold)
+
+                    for name in ("total", *E2E_STAGES):
+                        if not any(name in run for run in runs):
+                            continue  # not on this path, e.g. no YouTube call when warm
+                        samples = [run.get(name, 0.0) for run in runs]
+                        row = {
+                            "path": path,
+                            "scale": scale,
+                            "cache": state,
+                            "stage": name,
+                            "p50_ms": round(_percentile(samples, 50), 2),
+                            "p95_ms": round(_percentile(samples, 95), 2),
+                        }
+                        if name == "total":
+                            row["peak_kib"] = round(peak, 1)
+                        rows.append(row)
+    finally:
+        instrumentation.configure(enabled)
+        app_log.setLevel(log_level)
+    return rows
+
+
+PIPELINE_STAGES = ("tokenize", "sentiment", "engagement", "keywords", "hashtags", "summary")
+
+
+class StagePeaks(StageTimings):
+    """
+    StageTimings for a traced run: each stage also records the peak traced
+    memory since the previous stage finished (tracemalloc must be on).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.peaks = {}  # stage -> KiB
+
+    def add(self, name, ms):
+        super().add(name, ms)
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.reset_peak()
+        with self._lock:
+            self.peaks[name] = max(self.peaks.get(name, 0.0), peak)
+
+
+def bench_pipeline(sizes=(20, 200, 2000, 20000), repeat=3):
+    """
+    analyze_chart over synthetic charts of each size in `sizes`, timed per
+    stage by the analyzers' own instrumentation with a cold sentiment
+    cache: p50/p95 per stage over `repeat` runs, plus the peak memory the
+    analysis allocated by the end of each stage (and overall) from one
+    extra traced run. The chart itself and the sentiment pool's worker
+    processes are not traced.
+    """
+    from . import instrumentation
+    from .ai_analysis import sentiment_analyzer
+    from .ai_analysis.sentiment_analyzer import _get_pool, _score_chunk
+    from .chart_analysis import analyze_chart
+
+    def run(videos, timings=None):
+        sentiment_analyzer.sentiment_cache.clear()
+        gc.collect()
+        timings, token = instrumentation.start_request(timings)
+        try:
+            analyze_chart(videos, "US")
+        finally:
+            instrumentation.end_request(token)
+        return {**timings.as_dict(), "total": timings.elapsed_ms()}, timings
+
+    # Start the sentiment worker processes up front so spawn time isn't measured
+    _get_pool().submit(_score_chunk, ["warm up"]).result()
+    enabled = instrumentation.is_enabled()
+    instrumentation.configure(True)
+    rows = []
+    try:
+        run(synthetic_videos(20))  # untimed warm-up: imports, lexicons, caches
+        for size in sizes:
+            # A fresh chart per run (analysis adds fields in place), built before tracing starts
+            runs = [run(synthetic_videos(size, seed=size))[0] for _ in range(repeat)]
+            videos = synthetic_videos(size, seed=size)
+            tracemalloc.start()
+            try:
+                _, traced_timings = run(videos, StagePeaks())
+                peak = tracemalloc.get_traced_memory()[1] / 1024
+            finally:
+                tracemalloc.stop()
+            peaks = {**traced_timings.peaks, "total": max(peak, *traced_timings.peaks.values())}
+
+            for name in ("total", *PIPELINE_STAGES):
+                samples = [r.get(name, 0.0) for r in runs]
+                rows.append({
+                    "videos": size,
+                    "stage": name,
+                    "p50_ms": round(_percentile(samples, 50), 2),
+                    "p95_ms": round(_percentile(samples, 95), 2),
+                    "peak_kib": round(peaks.get(name, 0.0), 1),
+                })
+    finally:
+        instrumentation.configure(enabled)
+    return rows
+
+
+def url_conf(async_views):
+    """A ROOT_URLCONF serving the app with the sync or the async home/compare views."""
+    from django.urls import include, path
+
+    from .urls import trend_urlpatterns
+
+    return type("TrendsURLConf", (), {"urlpatterns": [path("", include((trend_urlpatterns(async_views), "trends")))]})
+
+
+@contextmanager
+def scratch_database():
+    """
+    A freshly migrated throwaway (test) database, for suites that go through
+    the views. SQLite gets a temporary file instead of its in-memory test
+    database, whose shared cache fails concurrent writers ("table is
+    locked") where a file waits: compare persists its regions in parallel.
+    """
+    import os
+    import tempfile
+
+    from django.db import connection
+
+    name = connection.settings_dict["NAME"]
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    test_name = test_settings.get("NAME")
+    with tempfile.TemporaryDirectory() as scratch:
+        if connection.vendor == "sqlite" and not test_name:
+            test_settings["NAME"] = os.path.join(scratch, "benchmark.sqlite3")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(name, verbosity=0)
+            test_settings["NAME"] = test_name
+
+
+def _wsgi_load(path, clients, requests, server_threads):
+    """
+    `clients` threads sending `requests` requests in total through the WSGI
+    handler, which runs on `server_threads` threads fed from a FIFO queue
+    (a threaded WSGI server). Returns [(ms, status)], queueing included.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.test import Client
+
+    def handle():
+        return Client().get(path).status_code
+
+    with ThreadPoolExecutor(max_workers=server_threads) as server:
+        def one(_):
+            started = time.perf_counter()
+            status = server.submit(handle).result()
+            return (time.perf_counter() - started) * 1000, status
+
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            return list(pool.map(one, range(requests)))
+
+
+def _asgi_load(path, clients, requests):
+    """`clients` concurrent requests at a time through the ASGI handler, on one event loop."""
+    import asyncio
+
+    from asgiref.sync import ThreadSensitiveContext
+    from django.test import AsyncClient
+
+    async def run():
+        gate = asyncio.Semaphore(clients)
+
+        async def one():
+            # A thread for sync code per request, as ASGIHandler (but not AsyncClient) sets up
+            async with gate, ThreadSensitiveContext():
+                started = time.perf_counter()
+                response = await AsyncClient().get(path)
+                return (time.perf_counter() - started) * 1000, response.status_code
+
+        return await asyncio.gather(*(one() for _ in range(requests)))
+
+    return asyncio.run(run())
+
+
+LOAD_PATHS = {
+    "home": "/?country=US",
+    "compare": "/compare/?countries=US,IN,GB",
+}
+
+
+def bench_load(sizes=(1, 8, 32), latency_ms=50, requests_per_client=4, server_threads=8, scratch_db=True):
+    """
+    Load test of the WSGI and ASGI request paths, in process: at each
+    concurrency in `sizes`, home and compare requests against the offline
+    fake API (`latency_ms` per call) with the trend cache off, so every
+    request waits on YouTube. Modes:
+
+    - wsgi: sync views, at most `server_threads` requests at a time
+      (gunicorn --threads);
+    - asgi-sync: the ASGI handler with the sync views;
+    - asgi-async: the ASGI handler with the async views (TRENDS_ASYNC_VIEWS).
+    """
+    from django.conf import settings
+    from django.test import override_settings
+
+    from .fake_youtube import FakeYouTubeAPI
+
+    modes = (
+        ("wsgi", False, lambda path, clients, count: _wsgi_load(path, clients, count, server_threads)),
+        ("asgi-sync", False, _asgi_load),
+        ("asgi-async", True, _asgi_load),
+    )
+    no_cache = {**settings.CACHES, "load_test": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+    rows = []
+    with scratch_database() if scratch_db else nullcontext(), \
+            offline_youtube(FakeYouTubeAPI(latency_ms=latency_ms)), \
+            override_settings(CACHES=no_cache, TRENDS_CACHE_ALIAS="load_test", TRENDS_PERSIST_SNAPSHOTS=False,
+                              ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):  # the test clients' host
+        for name, path in LOAD_PATHS.items():
+            for mode, async_views, load in modes:
+                with override_settings(ROOT_URLCONF=url_conf(async_views)):
+                    load(path, 1, 1)  # warm-up: templates, pooled clients, the fake's charts
+                    for clients in sizes:
+                        count = clients * requests_per_client
+                        started = time.perf_counter()
+                        results = load(path, clients, count)
+                        elapsed = time.perf_counter() - started
+                        latencies = [ms for ms, _ in results]
+                        rows.append({
+                            "path": name,
+                            "mode": mode,
+                            "clients": clients,
+                            "requests": count,
+                            "req_per_s": round(count / elapsed, 1),
+                            "p50_ms": round(_percentile(latencies, 50), 1),
+                            "p95_ms": round(_percentile(latencies, 95), 1),
+                            "errors": sum(status != 200 for _, status in results)
+                        })
+    return rows
+
+
+# ---------------------- Baselines ----------------------
+
+# Suites whose results can be stored as a baseline: the columns that identify a row
+BASELINE_KEYS = {
+    "pipeline": ("videos", "stage"),
+    "e2e": ("path", "scale", "cache", "stage"),
+}
+# Compared against the baseline; p95 over a handful of runs is too noisy to gate on
+BASELINE_METRICS = ("p50_ms", "peak_kib")
+# Differences below these never count as regressions (timer and allocator noise)
+BASELINE_SLACK = {"p50_ms": 5.0, "peak_kib": 256.0}
+
+
+def _baseline_key(suite, row):
+    return " | ".join(str(row[column]) for column in BASELINE_KEYS[suite])
+
+
+def baseline_entries(suite, rows):
+    """{row key: {metric: value}} for storing as a baseline."""
+    return {
+        _baseline_key(suite, row): {metric: row[metric] for metric in BASELINE_METRICS if metric in row}
+        for row in rows
+    }
+
+
+def find_regressions(suite, rows, baseline, tolerance=0.5):
+    """
+    Rows whose metrics exceed the baseline by more than `tolerance`
+    (a fraction) and the metric's slack. Rows missing from the baseline
+    are skipped.
+    """
+    regressions = []
+    for row in rows:
+        expected = baseline.get(_baseline_key(suite, row))
+        if not expected:
+            continue
+        for metric, before in expected.items():
+            after = row.get(metric)
+            if after is None:
+                continue
+            if after > before * (1 + tolerance) and after - before > BASELINE_SLACK.get(metric, 0):
+                regressions.append({
+                    "row": _baseline_key(suite, row),
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": f"+{100 * (after - before) / before:.0f}%" if before else "new",
+                })
+    return regressions
+
+
+SUITES = {
+    "sentiment": bench_sentiment_batch,
+    "text_prep": bench_text_prep,
+    "tokenizer": bench_tokenizer,
+    "hashtags": bench_weighted_hashtags,
+    "engagement": bench_engagement,
+    "records": bench_video_records,
+    "pagination": bench_pagination,
+    "pipeline": bench_pipeline,
+    "e2e": bench_e2e,
+    "instrumentation": bench_instrumentation,
+    "load": bench_load,
+}
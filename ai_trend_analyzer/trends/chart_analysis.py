@@ -0,0 +1,315 @@
+"""
+Chart analysis shared by the views and the ingest pipeline.
+
+analyze_chart() runs the keyword/sentiment/engagement/hashtag/summary
+pipeline over a list of videos; iter_enriched_videos() scores a stream of
+them batch by batch. materialize_snapshot() runs it once per
+stored snapshot and saves the results: per-video scores on SnapshotEntry
+and chart-level results on SnapshotAnalysis, keyed by snapshot and
+ANALYZER_VERSION. load_chart_analysis() reads them back with indexed
+queries, so views don't re-run the analyzers on every request. Each
+materialized snapshot is also fed into the sliding term windows
+(term_stream).
+"""
+import hashlib
+import logging
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .ai_analysis.engagement_calculator import (
+    calculate_engagement_array, engagement_level_mask, rank_by_engagement,
+)
+from .ai_analysis.hashtag_extractor import extract_hashtags
+from .ai_analysis.keyword_analyzer import extract_keywords
+from .ai_analysis.sentiment_analyzer import analyze_video_sentiment_batch
+from .ai_analysis.summarizer import generate_trend_summary
+from .ai_analysis.tokenizer import tokenize_videos
+from .constants import CATEGORIES
+from .ingest import entry_to_video
+from .instrumentation import instrumented
+from .models import SnapshotAnalysis, SnapshotEntry, TrendSnapshot
+from .rising import cached_rising_trends
+from .term_stream import snapshot_terms, stream_snapshot
+from .youtube_fetcher import MAX_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever an analyzer's output changes so stale rows are recomputed
+ANALYZER_VERSION = 2
+
+# Engagement filters offered on the home page ('' = no filter)
+ENGAGEMENT_LEVELS = ("", "high", "medium", "low")
+
+
+def engagement_level_q(level):
+    """Same buckets as engagement_level_mask, as a filter on SnapshotEntry."""
+    if level == "high":
+        return Q(engagement_score__gt=5)
+    if level == "medium":
+        return Q(engagement_score__gte=2, engagement_score__lte=5)
+    if level == "low":
+        return Q(engagement_score__lt=2)
+    return Q()
+
+
+def enrich_videos(videos, country, tokens=None, known_sentiments=None):
+    """
+    Add categoryName, sentiment and engagement_score to each video dict in
+    place. `known_sentiments` maps video id → sentiment already computed
+    for the same text; only the other videos are scored.
+    Returns the engagement scores as an array for ranking/filtering.
+    """
+    known_sentiments = known_sentiments or {}
+    sentiments = [known_sentiments.get(video.get("id")) for video in videos]
+    pending = [i for i, sentiment in enumerate(sentiments) if sentiment is None]
+
+    # Title + (prepared) description for better context; scored as one batch
+    scored = analyze_video_sentiment_batch(
+        [videos[i].get('title', '') for i in pending],
+        [videos[i].get('description', '') for i in pending],
+        country,
+        tokens=[tokens[i] for i in pending] if tokens is not None else None,
+    )
+    for i, sentiment in zip(pending, scored):
+        sentiments[i] = sentiment
+
+    # Whole chart at once; the display text is formatted by the template
+    scores = calculate_engagement_array(
+        views=[video.get("views", 0) for video in videos],
+        likes=[video.get("likes", 0) for video in videos],
+        comments=[video.get("comments", 0) for video in videos],
+        subscribers=[video.get("channel_subscribers", 0) for video in videos],
+    )
+
+    for video, sentiment, score in zip(videos, sentiments, scores.tolist()):
+        # Map categoryId → categoryName
+        cat_id = str(video.get("categoryId", ""))
+        video["categoryName"] = CATEGORIES.get(cat_id, "Miscellaneous")
+
+        video["sentiment"] = sentiment
+        video["engagement_score"] = score
+    return scores
+
+
+def iter_enriched_videos(videos, country, batch_size=MAX_PAGE_SIZE):
+    """
+    enrich_videos() over any iterable of videos (e.g. iter_trending_videos),
+    a batch at a time. Yields (video, tokens) as soon as each batch is
+    scored, so the first results don't wait for the rest of the chart and
+    a consumer that keeps only aggregates never holds all of it.
+    """
+    videos = iter(videos)
+    while batch := list(islice(videos, batch_size)):
+        tokens = tokenize_videos(batch)
+        enrich_videos(batch, country, tokens)
+        yield from zip(batch, tokens)
+
+
+def sentiment_distribution(videos):
+    counts = {"positive": 0, "neutral": 0, "negative": 0}
+    for v in videos:
+        label = v.get("sentiment", {}).get("label", "neutral")
+        counts[label] = counts.get(label, 0) + 1
+    return counts
+
+
+def average_engagement(videos):
+    if not videos:
+        return 0
+    return round(sum(v.get("engagement_score", 0) for v in videos) / len(videos), 2)
+
+
+def analyze_chart(videos, country, engagement=""):
+    """
+    Live analysis of one chart. `videos` in the result are filtered to the
+    engagement level and sorted by engagement; keywords, the average and
+    the sentiment distribution cover the whole chart.
+    """
+    # Tokenize each video once; every analyzer below reuses the tokens
+    tokens = tokenize_videos(videos)
+    tokens_by_video = {id(v): t for v, t in zip(videos, tokens)}
+    scores = enrich_videos(videos, country, tokens)
+
+    # AI Analysis: keywords from titles
+    keywords = extract_keywords([v.get("title", "") for v in videos], tokens=tokens)
+
+    # Sort by engagement descending, then filter by engagement level (on the score array)
+    in_level = engagement_level_mask(scores, engagement)
+    shown = [videos[i] for i in rank_by_engagement(scores) if in_level[i]]
+
+    # Hashtags use engagement scores, so they come after engagement is calculated
+    hashtags = extract_hashtags(shown, tokens=[tokens_by_video[id(v)] for v in shown])
+
+    return {
+        "videos": shown,
+        "keywords": keywords,
+        "hashtags": hashtags,
+        "summary": generate_trend_summary(shown, keywords, hashtags),
+        "avg_engagement": average_engagement(videos),
+        "sentiment_counts": sentiment_distribution(videos),
+        "total_videos": len(videos),
+    }
+
+
+def sentiment_text_hash(video):
+    """Hash of the text sentiment is scored from (title + description)."""
+    text = f"{video.get('title', '')}\0{video.get('description', '')}"
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _previous_sentiments(snapshot, hashes):
+    """
+    Sentiment already stored for the same text in the previous analysed
+    snapshot of the same chart, keyed by video id. `hashes` maps video id →
+    sentiment_text_hash of this snapshot's text; a video is reused only if
+    the stored entry was scored from text with the same hash.
+    """
+    previous = (
+        TrendSnapshot.objects
+        .filter(
+            platform=snapshot.platform,
+            region=snapshot.region,
+            category=snapshot.category,
+            fetched_at__lt=snapshot.fetched_at,
+            analyses__analyzer_version=ANALYZER_VERSION,
+        )
+        .order_by("-fetched_at")
+        .first()
+    )
+    if previous is None:
+        return {}
+    rows = (
+        SnapshotEntry.objects
+        .filter(snapshot=previous, video__video_id__in=list(hashes))
+        .exclude(sentiment_label="")
+        .values_list("video__video_id", "sentiment_text_hash", "sentiment_label", "sentiment_score", "sentiment_raw")
+    )
+    return {
+        video_id: {"label": label, "score": score, "raw": raw}
+        for video_id, text_hash, label, score, raw in rows
+        if text_hash == hashes[video_id]
+    }
+
+
+def materialize_snapshot(snapshot, max_results=None):
+    """
+    Analyse the top `max_results` entries of a stored snapshot once and save
+    the results. Sentiment is only computed for videos whose text differs
+    from the previous analysed snapshot of the chart and copied for the
+    rest. Safe to re-run; returns the SnapshotAnalysis.
+    """
+    max_results = max_results or getattr(settings, "TRENDS_ANALYSIS_MAX_RESULTS", 20)
+    if not isinstance(snapshot, TrendSnapshot):
+        snapshot = TrendSnapshot.objects.get(pk=snapshot)
+
+    entries = list(
+        snapshot.entries.select_related("video").filter(rank__lte=max_results).order_by("rank")
+    )
+    videos = [entry_to_video(e) for e in entries]
+    tokens = tokenize_videos(videos)
+    tokens_by_video = {id(v): t for v, t in zip(videos, tokens)}
+    hashes = {video["id"]: sentiment_text_hash(video) for video in videos}
+    known = _previous_sentiments(snapshot, hashes)
+    scores = enrich_videos(videos, snapshot.region, tokens, known_sentiments=known)
+
+    for entry, video in zip(entries, videos):
+        entry.engagement_score = video["engagement_score"]
+        entry.sentiment_label = video["sentiment"]["label"]
+        entry.sentiment_score = video["sentiment"]["score"]
+        entry.sentiment_raw = video["sentiment"]["raw"]
+        entry.sentiment_text_hash = hashes[video["id"]]
+
+    keywords = extract_keywords([v.get("title", "") for v in videos], tokens=tokens)
+    ranked = rank_by_engagement(scores)
+    hashtags = {}
+    summaries = {}
+    for level in ENGAGEMENT_LEVELS:
+        in_level = engagement_level_mask(scores, level)
+        shown = [videos[i] for i in ranked if in_level[i]]
+        hashtags[level] = extract_hashtags(shown, tokens=[tokens_by_video[id(v)] for v in shown])
+        summaries[level] = generate_trend_summary(shown, keywords, hashtags[level])
+
+    with transaction.atomic():
+        SnapshotEntry.objects.bulk_update(
+            entries,
+            ["engagement_score", "sentiment_label", "sentiment_score", "sentiment_raw", "sentiment_text_hash"],
+            batch_size=500,
+        )
+        analysis, _ = SnapshotAnalysis.objects.update_or_create(
+            snapshot=snapshot,
+            analyzer_version=ANALYZER_VERSION,
+            defaults={
+                "region": snapshot.region,
+                "category": snapshot.category,
+                "max_results": max_results,
+                "total_videos": len(videos),
+                "keywords": keywords,
+                "hashtags": hashtags,
+                "summaries": summaries,
+                "avg_engagement": average_engagement(videos),
+                "sentiment_counts": sentiment_distribution(videos),
+            },
+        )
+
+    # Same tokens feed the incremental last-hour/last-24h counters
+    stream_snapshot(snapshot, snapshot_terms(snapshot, tokens))
+    # Rising terms/videos for the home page, now that this snapshot's terms are stored
+    cached_rising_trends(snapshot.region, snapshot.category, platform=snapshot.platform)
+
+    logger.info("materialized snapshot id=%s videos=%d", snapshot.pk, len(videos))
+    return analysis
+
+
+@instrumented("stored_analysis")
+def load_chart_analysis(snapshot_id, engagement="", max_results=20, limit=None):
+    """
+    Read a materialized analysis in the same shape as analyze_chart().
+    Returns None if the snapshot hasn't been analysed with this
+    ANALYZER_VERSION over the same number of videos.
+    """
+    analysis = (
+        SnapshotAnalysis.objects
+        .filter(snapshot_id=snapshot_id, analyzer_version=ANALYZER_VERSION, max_results=max_results)
+        .first()
+    )
+    if analysis is None:
+        return None
+    if engagement not in ENGAGEMENT_LEVELS:
+        engagement = ""  # unfiltered, as engagement_level_mask treats it in analyze_chart()
+
+    # Engagement filter + sort as one query on the (snapshot, -engagement_score) index
+    entries = (
+        SnapshotEntry.objects
+        .filter(snapshot_id=snapshot_id, rank__lte=max_results)
+        .filter(engagement_level_q(engagement))
+        .select_related("video")
+        .order_by("-engagement_score", "rank")
+    )
+    if limit:
+        entries = entries[:limit]
+
+    videos = []
+    for entry in entries:
+        video = entry_to_video(entry)
+        video["categoryName"] = CATEGORIES.get(video["categoryId"], "Miscellaneous")
+        video["sentiment"] = {
+            "label": entry.sentiment_label,
+            "score": entry.sentiment_score,
+            "raw": entry.sentiment_raw,
+        }
+        video["engagement_score"] = entry.engagement_score
+        videos.append(video)
+
+    # JSON turns (term, count) tuples into lists; restore them for the templates
+    return {
+        "videos": videos,
+        "keywords": [tuple(kw) for kw in analysis.keywords],
+        "hashtags": [tuple(tag) for tag in analysis.hashtags.get(engagement, [])],
+        "summary": analysis.summaries.get(engagement, ""),
+        "avg_engagement": analysis.avg_engagement,
+        "sentiment_counts": analysis.sentiment_counts,
+        "total_videos": analysis.total_videos,
+    }
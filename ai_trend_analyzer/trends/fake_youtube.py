@@ -0,0 +1,251 @@
+"""
+Offline stand-in for the two YouTube Data API endpoints the app calls:
+videos.list (chart=mostPopular) and channels.list. It is meant for load
+tests and benchmarks that need no network access, API key or quota.
+
+Point the fetcher at it with
+YOUTUBE_API_ENDPOINT=http://127.0.0.1:8765/youtube/v3/
+(`manage.py fake_youtube` prints the exact value).
+
+Payloads come from a fixture file, either recorded from the live API
+with `manage.py fake_youtube --record` or written by hand. Without one,
+charts are generated from a seed (synthetic.synthetic_videos). Latency,
+random 500s and 429s, and a daily quota (403 quotaExceeded) are
+configurable. Responses carry ETags and honour If-None-Match like the
+real API.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .synthetic import synthetic_api_items, synthetic_videos
+
+# videos.list: default and maximum maxResults, and the size of a mostPopular chart
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 50
+CHART_SIZE = 200
+
+ERRORS = {
+    403: ("quotaExceeded", "youtube.quota",
+          "The request cannot be completed because you have exceeded your quota."),
+    429: ("rateLimitExceeded", "youtube.quota", "Too many requests."),
+    500: ("backendError", "global", "Backend Error"),
+}
+
+
+def error_body(status):
+    reason, domain, message = ERRORS[status]
+    return {"error": {"code": status, "message": message,
+                      "errors": [{"message": message, "domain": domain, "reason": reason}]}}
+
+
+def chart_key(region, category=None):
+    return f"{region}:{category}" if category else region
+
+
+class FakeYouTubeAPI:
+    """
+    The fake API's state and request handling, independent of HTTP so it
+    can be driven directly. `charts` maps "REGION" or "REGION:category"
+    to videos.list items in chart order; `channels` maps channel ID to
+    subscriber count.
+    """
+
+    def __init__(self, charts=None, channels=None, latency_ms=0, jitter_ms=0, error_rate=0.0,
+                 throttle_rate=0.0, quota=None, seed=42, chart_size=CHART_SIZE):
+        self.charts = dict(charts or {})
+        self.channels = dict(channels or {})
+        self.synthetic = charts is None  # generate charts for unknown regions
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.quota = quota
+        self.seed = seed
+        self.chart_size = chart_size
+        self.units_used = 0
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_fixture(cls, path, **options):
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        return cls(charts=data.get("charts", {}), channels=data.get("channels", {}), **options)
+
+    def to_fixture(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"charts": self.charts, "channels": self.channels}, fh)
+
+    def chart(self, region, category=None):
+        """Items of a chart, generated on first use when no fixture was loaded."""
+        key = chart_key(region, category)
+        with self._lock:
+            if key not in self.charts and self.synthetic:
+                seed = self.seed + int(hashlib.blake2b(key.encode(), digest_size=4).hexdigest(), 16)
+                videos = synthetic_videos(self.chart_size, seed=seed, region=region)
+                if category:
+                    for video in videos:
+                        video["categoryId"] = category
+                self.charts[key] = synthetic_api_items(videos)
+                for video in videos:
+                    self.channels.setdefault(video["channelId"], video["channel_subscribers"])
+            return self.charts.get(key, [])
+
+    def subscribers(self, channel_id):
+        count = self.channels.get(channel_id)
+        if count is None:
+            # Stable made-up count for channels missing from the fixture
+            count = int(hashlib.blake2b(channel_id.encode(), digest_size=4).hexdigest(), 16) % 20_000_000
+        return count
+
+    def videos_list(self, params):
+        region = params.get("regionCode", "US")
+        items = self.chart(region, params.get("videoCategoryId"))
+        page_size = min(int(params.get("maxResults", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        start = int(params.get("pageToken") or 0)
+        end = start + page_size
+        body = {
+            "kind": "youtube#videoListResponse",
+            "items": items[start:end],
+            "pageInfo": {"totalResults": len(items), "resultsPerPage": page_size},
+        }
+        if end < len(items):
+            body["nextPageToken"] = str(end)
+        if start:
+            body["prevPageToken"] = str(max(0, start - page_size))
+        return body
+
+    def channels_list(self, params):
+        ids = [cid for cid in params.get("id", "").split(",") if cid][:MAX_PAGE_SIZE]
+        return {
+            "kind": "youtube#channelListResponse",
+            "items": [
+                {"kind": "youtube#channel", "id": cid, "statistics": {"subscriberCount": str(self.subscribers(cid))}}
+                for cid in ids
+            ],
+        }
+
+    def _injected_error(self):
+        with self._lock:
+            self.requests += 1
+            if self.quota is not None and self.units_used >= self.quota:
+                return 403
+            self.units_used += 1  # both endpoints cost 1 unit, even on 304
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.throttle_rate:
+            return 429
+        return None
+
+    def handle(self, path, params, headers=None):
+        """
+        Answer one GET request. `params` maps query names to values.
+        Returns (status, headers, body bytes).
+        """
+        headers = headers or {}
+        if self.latency_ms or self.jitter_ms:
+            time.sleep((self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000)
+
+        endpoint = path.rstrip("/").rsplit("/", 1)[-1]
+        handlers = {"videos": self.videos_list, "channels": self.channels_list}
+        if endpoint not in handlers:
+            return 404, {}, b""
+
+        status = self._injected_error()
+        if status is not None:
+            return status, {"Content-Type": "application/json"}, json.dumps(error_body(status)).encode()
+
+        body = handlers[endpoint](params)
+        etag = '"' + hashlib.blake2b(json.dumps(body, sort_keys=True).encode(), digest_size=16).hexdigest() + '"'
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        body["etag"] = etag
+        return 200, {"Content-Type": "application/json; charset=UTF-8", "ETag": etag}, json.dumps(body).encode()
+
+
+def make_handler(api):
+    class FakeYouTubeHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like googleapis.com
+        # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per response
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            status, headers, body = api.handle(url.path, params, self.headers)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # one line per request would swamp a load test
+
+    return FakeYouTubeHandler
+
+
+def make_server(api, host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    return server
+
+
+def endpoint_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/youtube/v3/"
+
+
+@contextmanager
+def serve_in_thread(api, host="127.0.0.1", port=0):
+    """Run a fake server in a background thread; yields its YOUTUBE_API_ENDPOINT."""
+    server = make_server(api, host, port)
+    thread = threading.Thread(target=server.serve_forever, name="fake-youtube", daemon=True)
+    thread.start()
+    try:
+        yield endpoint_url(server)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def record_fixture(youtube, regions, categories=(None,), limit=CHART_SIZE):
+    """
+    Fetch raw videos.list pages and their channels' subscriber counts from
+    a (live) service object, in the fixture layout of FakeYouTubeAPI.
+    """
+    charts, channels = {}, {}
+    for region in regions:
+        for category in categories:
+            items, token = [], None
+            while len(items) < limit:
+                response = youtube.videos().list(
+                    part="snippet,statistics", chart="mostPopular", regionCode=region,
+                    maxResults=min(MAX_PAGE_SIZE, limit - len(items)),
+                    videoCategoryId=category or None, pageToken=token,
+                ).execute()
+                items.extend(response.get("items", []))
+                token = response.get("nextPageToken")
+                if not token:
+                    break
+            charts[chart_key(region, category)] = items
+
+    channel_ids = list(dict.fromkeys(
+        item["snippet"]["channelId"] for items in charts.values() for item in items
+        if item.get("snippet", {}).get("channelId")
+    ))
+    for start in range(0, len(channel_ids), MAX_PAGE_SIZE):
+        chunk = channel_ids[start:start + MAX_PAGE_SIZE]
+        response = youtube.channels().list(part="statistics", id=",".join(chunk), maxResults=len(chunk)).execute()
+        for item in response.get("items", []):
+            channels[item["id"]] = int(item.get("statistics", {}).get("subscriberCount", 0))
+    return {"charts": charts, "channels": channels}
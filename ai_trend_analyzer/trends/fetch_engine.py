@@ -0,0 +1,160 @@
+"""
+Concurrent multi-region fetch engine.
+
+Runs a list of (region, category) fetches on a shared, process-wide thread
+pool so a page that needs N charts waits roughly as long as the slowest
+one instead of the sum of all of them. The pool size is the global cap on
+in-flight YouTube requests (TRENDS_FETCH_CONCURRENCY), and every call is
+bounded by a per-request timeout (TRENDS_FETCH_TIMEOUT).
+
+The async views (ASGI) await the same pool through afetch_regions, and
+hand chart analysis and ORM reads to a second bounded pool
+(TRENDS_ANALYSIS_WORKERS) through run_analysis, so the event loop never
+blocks on either.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .trend_cache import get_trending_videos
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_analysis_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Shared thread pool; its size caps concurrent YouTube fetches per process."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "TRENDS_FETCH_CONCURRENCY", 8),
+                    thread_name_prefix="trends-fetch",
+                )
+    return _executor
+
+
+def get_analysis_executor():
+    """
+    Shared thread pool for the async views' analysis and database work.
+    Its size caps how many requests analyse at once per process; the rest
+    queue instead of piling CPU-bound threads onto the GIL.
+    """
+    global _analysis_executor
+    if _analysis_executor is None:
+        with _executor_lock:
+            if _analysis_executor is None:
+                _analysis_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "TRENDS_ANALYSIS_WORKERS", 2),
+                    thread_name_prefix="trends-analysis",
+                )
+    return _analysis_executor
+
+
+def _call(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()  # pool threads are long-lived
+
+
+def _submit(executor, fn, *args, **kwargs):
+    # Each call runs in a copy of the caller's context, so its stage timings
+    # (instrumentation) are credited to the request that asked for it
+    return executor.submit(contextvars.copy_context().run, _call, fn, *args, **kwargs)
+
+
+async def run_analysis(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) on the analysis pool (for CPU-heavy or ORM work in async views)."""
+    return await asyncio.wrap_future(_submit(get_analysis_executor(), fn, *args, **kwargs))
+
+
+def _failed(pair, error, default):
+    if isinstance(error, (FutureTimeout, asyncio.TimeoutError)):
+        logger.warning("region fetch timed out region=%s category=%s", pair[0], pair[1] or "all")
+    else:
+        logger.error("region fetch failed region=%s category=%s", pair[0], pair[1] or "all", exc_info=error)
+    return default
+
+
+def fetch_regions(pairs, max_results=20, timeout=None, fetch=get_trending_videos, default=None):
+    """
+    Fetch trending videos for several (region, category) pairs concurrently.
+    Returns {(region, category): result of fetch}. A fetch that fails or
+    does not finish within `timeout` seconds maps to `default` (an empty
+    list unless given).
+    """
+    if default is None:
+        default = []
+    if timeout is None:
+        timeout = getattr(settings, "TRENDS_FETCH_TIMEOUT", 15)
+
+    started = time.perf_counter()
+    pairs = list(dict.fromkeys(pairs))  # drop duplicate pairs, keep order
+    executor = get_executor()
+    futures = {pair: _submit(executor, fetch, pair[0], pair[1], max_results) for pair in pairs}
+
+    # One shared deadline: every fetch gets `timeout` from submission
+    deadline = time.monotonic() + timeout
+    results = {}
+    for pair, future in futures.items():
+        try:
+            results[pair] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout as e:
+            future.cancel()
+            results[pair] = _failed(pair, e, default)
+        except Exception as e:
+            results[pair] = _failed(pair, e, default)
+
+    logger.info(
+        "fetch_regions pairs=%d elapsed_ms=%.1f",
+        len(pairs), (time.perf_counter() - started) * 1000,
+    )
+    return results
+
+
+async def afetch_regions(pairs, max_results=20, timeout=None, fetch=get_trending_videos, default=None):
+    """
+    fetch_regions for async views: the fetches run on the same pool, under
+    the same shared deadline, while the event loop serves other requests.
+    """
+    if default is None:
+        default = []
+    if timeout is None:
+        timeout = getattr(settings, "TRENDS_FETCH_TIMEOUT", 15)
+
+    started = time.perf_counter()
+    pairs = list(dict.fromkeys(pairs))
+    executor = get_executor()
+    futures = {
+        pair: asyncio.wrap_future(_submit(executor, fetch, pair[0], pair[1], max_results))
+        for pair in pairs
+    }
+    if futures:
+        await asyncio.wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for pair, future in futures.items():
+        if not future.done():
+            future.cancel()  # also cancels the pool's future if it hasn't started
+            results[pair] = _failed(pair, asyncio.TimeoutError(), default)
+        elif future.exception() is not None:
+            results[pair] = _failed(pair, future.exception(), default)
+        else:
+            results[pair] = future.result()
+
+    logger.info(
+        "afetch_regions pairs=%d elapsed_ms=%.1f",
+        len(pairs), (time.perf_counter() - started) * 1000,
+    )
+    return results
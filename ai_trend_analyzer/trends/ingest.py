@@ -0,0 +1,159 @@
+"""
+Snapshot ingestion: persist fetched trending charts to the database.
+
+Each fetched chart becomes a TrendSnapshot. Its videos are upserted into
+Video in batches with bulk_create(update_conflicts=True) on the
+(platform, video_id) unique constraint, and their counters as of that
+fetch are stored as SnapshotEntry rows, giving a time series per video.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import SnapshotEntry, TrendSnapshot, Video
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_SIZE = 500
+
+# Columns refreshed when a video already exists
+VIDEO_UPDATE_FIELDS = [
+    "title", "description", "channel", "channel_id", "category_id",
+    "video_url", "thumbnail_url", "views", "likes", "comments",
+    "channel_subscribers", "published_at", "fetched_at",
+]
+
+
+def _video_row(video, platform, fetched_at):
+    published = video.get("publishedAt")
+    return Video(
+        platform=platform,
+        video_id=video["id"],
+        title=(video.get("title") or "")[:255],
+        description=video.get("description") or "",
+        channel=(video.get("channel") or "")[:255],
+        channel_id=video.get("channelId") or "",
+        category_id=str(video.get("categoryId") or ""),
+        video_url=video.get("link") or "",
+        thumbnail_url=video.get("thumbnail") or None,
+        views=video.get("views", 0),
+        likes=video.get("likes", 0),
+        comments=video.get("comments", 0),
+        channel_subscribers=video.get("channel_subscribers", 0),
+        published_at=parse_datetime(published) if published else None,
+        fetched_at=fetched_at,
+    )
+
+
+def save_snapshot(videos, region, category=None, platform="youtube",
+                  fetched_at=None, batch_size=INGEST_BATCH_SIZE):
+    """
+    Store one fetched chart (a list of fetch_trending_videos dicts) as a
+    snapshot. Returns the TrendSnapshot, or None if there was nothing to save.
+    """
+    # A video listed twice would hit the same conflict row twice in one statement
+    unique_videos = list({v["id"]: v for v in videos if v.get("id")}.values())
+    if not unique_videos:
+        return None
+
+    fetched_at = fetched_at or timezone.now()
+
+    with transaction.atomic():
+        snapshot = TrendSnapshot.objects.create(
+            platform=platform,
+            region=region,
+            category=category or "",
+            fetched_at=fetched_at,
+            video_count=len(unique_videos),
+        )
+
+        Video.objects.bulk_create(
+            [_video_row(v, platform, fetched_at) for v in unique_videos],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["platform", "video_id"],
+            update_fields=VIDEO_UPDATE_FIELDS,
+        )
+
+        # Upserted rows don't reliably return PKs on every backend
+        pks = dict(
+            Video.objects.filter(
+                platform=platform, video_id__in=[v["id"] for v in unique_videos]
+            ).values_list("video_id", "pk")
+        )
+
+        SnapshotEntry.objects.bulk_create(
+            [
+                SnapshotEntry(
+                    snapshot=snapshot,
+                    video_id=pks[v["id"]],
+                    rank=rank,
+                    views=v.get("views", 0),
+                    likes=v.get("likes", 0),
+                    comments=v.get("comments", 0),
+                    channel_subscribers=v.get("channel_subscribers", 0),
+                )
+                for rank, v in enumerate(unique_videos, start=1)
+            ],
+            batch_size=batch_size,
+        )
+
+    logger.info(
+        "saved snapshot id=%s region=%s category=%s videos=%d",
+        snapshot.pk, region, category, len(unique_videos),
+    )
+    return snapshot
+
+
+def entry_to_video(entry):
+    """SnapshotEntry (with its video loaded) → fetch_trending_videos-style dict."""
+    video = entry.video
+    return {
+        "id": video.video_id,
+        "videoId": video.video_id,
+        "title": video.title,
+        "description": video.description,
+        "channel": video.channel,
+        "thumbnail": video.thumbnail_url or "",
+        "views": entry.views,
+        "likes": entry.likes,
+        "comments": entry.comments,
+        "link": video.video_url,
+        "channel_subscribers": entry.channel_subscribers,
+        "channelId": video.channel_id,
+        "categoryId": video.category_id or "0",
+        "publishedAt": video.published_at.isoformat() if video.published_at else None,
+    }
+
+
+def load_snapshot_videos(region, category=None, platform="youtube", max_results=None):
+    """
+    Return the most recent stored chart for (region, category) in the same
+    dict shape as fetch_trending_videos, plus its TrendSnapshot.
+    Runs as one query (latest snapshot resolved in a subquery).
+    Returns ([], None) when nothing is stored.
+    """
+    latest_id = (
+        TrendSnapshot.objects
+        .filter(platform=platform, region=region, category=category or "")
+        .order_by("-fetched_at")
+        .values("pk")[:1]
+    )
+    entries = (
+        SnapshotEntry.objects
+        .filter(snapshot_id=Subquery(latest_id))
+        .select_related("video", "snapshot")
+        .order_by("rank")
+    )
+    if max_results:
+        entries = entries[:max_results]
+
+    videos = []
+    snapshot = None
+    for entry in entries:
+        snapshot = entry.snapshot
+        videos.append(entry_to_video(entry))
+    return videos, snapshot
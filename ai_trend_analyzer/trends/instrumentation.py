@@ -0,0 +1,214 @@
+"""
+Per-request stage timing and in-process metrics.
+
+Functions decorated with @instrumented("stage") (the YouTube fetch and
+the chart-level ai_analysis functions) and blocks wrapped in
+`with stage("render")` report how long they took:
+
+- to the current request's StageTimings, which
+  middleware.InstrumentationMiddleware turns into a Server-Timing
+  header and one structured log record;
+- to a per-stage histogram, which the /metrics view serves in Prometheus
+  text format along with the YouTube API call and quota counters.
+
+This module does not import Django, so ai_analysis stays usable on its
+own. configure() switches it on (TrendsConfig.ready passes
+TRENDS_INSTRUMENTATION). While it is off, an instrumented call costs one
+flag check.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_timings = ContextVar("trends_stage_timings", default=None)
+
+
+def configure(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus exposes them."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by (name, labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter_value(self, name, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name, **labels):
+        return self.histograms.get((name, tuple(sorted(labels.items()))))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count)) for key, h in self.histograms.items()
+            )
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip((*BUCKETS, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text((*labels, ('le', bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every thread of this process
+registry = Registry()
+
+
+class StageTimings:
+    """Elapsed time per stage for one request; a stage that runs more than once is summed."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # name -> [ms, calls], in first-finished order
+        self._lock = threading.Lock()  # concurrent fetches report from pool threads
+
+    def add(self, name, ms):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += ms
+            entry[1] += 1
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self):
+        return {name: round(ms, 2) for name, (ms, _) in self.stages.items()}
+
+    def server_timing(self, total_ms):
+        """Server-Timing header value, e.g. `youtube;dur=120.5, sentiment;dur=8.1;desc="x2", total;dur=150.0`."""
+        parts = [
+            f"{name};dur={ms:.1f}" + (f';desc="x{calls}"' if calls > 1 else "")
+            for name, (ms, calls) in self.stages.items()
+        ]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+def start_request(timings=None):
+    """
+    Collect stage timings for the current request (into `timings`, a
+    StageTimings, if given). Returns (timings, token for end_request).
+    """
+    timings = timings if timings is not None else StageTimings()
+    return timings, _timings.set(timings)
+
+
+def end_request(token):
+    _timings.reset(token)
+
+
+def current_timings():
+    return _timings.get()
+
+
+def record(name, ms):
+    registry.observe("trends_stage_duration_seconds", ms / 1000, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, ms)
+
+
+@contextmanager
+def stage(name):
+    """Time a block as stage `name`."""
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - started) * 1000)
+
+
+def instrumented(name):
+    """Decorator: time every call of the function as stage `name`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - started) * 1000)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1, **labels):
+    """Add to a counter (no-op while disabled)."""
+    if _enabled and amount:
+        registry.inc(name, amount, **labels)
@@ -0,0 +1,76 @@
+import inspect
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trends.benchmarks import BASELINE_KEYS, SUITES, baseline_entries, find_regressions
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / "benchmark_baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run offline benchmarks (synthetic data, no API calls). Suites with a stored "
+        "baseline fail the run when they regress"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("suites", nargs="*", help=f"Suites to run (default: all). Choices: {', '.join(SUITES)}")
+        parser.add_argument("--sizes", help="Comma-separated input sizes, overriding the suite defaults")
+        parser.add_argument("--repeat", type=int, help="Runs per measurement, for suites that repeat")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE),
+                            help=f"Baseline file (default: {DEFAULT_BASELINE.name} in the trends app)")
+        parser.add_argument("--save-baseline", action="store_true",
+                            help="Store these results as the baseline instead of checking against it")
+        # Back-to-back runs on one machine differ by up to ~35% on the smaller stages
+        parser.add_argument("--tolerance", type=float, default=0.5,
+                            help="Allowed slowdown/growth over the baseline before failing (default: 0.5 = 50%%)")
+
+    def handle(self, *args, **options):
+        names = options["suites"] or list(SUITES)
+        unknown = [name for name in names if name not in SUITES]
+        if unknown:
+            raise CommandError(f"Unknown suite(s): {', '.join(unknown)}")
+
+        baseline_path = Path(options["baseline"])
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        regressions = []
+
+        for name in names:
+            suite = SUITES[name]
+            kwargs = {}
+            if options["sizes"]:
+                kwargs["sizes"] = [int(size) for size in options["sizes"].split(",")]
+            if options["repeat"] and "repeat" in inspect.signature(suite).parameters:
+                kwargs["repeat"] = options["repeat"]
+
+            self.stdout.write(self.style.NOTICE(f"⏱️ {name}"))
+            rows = suite(**kwargs)
+            self.write_table(rows)
+
+            if name not in BASELINE_KEYS:
+                continue
+            if options["save_baseline"]:
+                baseline.setdefault(name, {}).update(baseline_entries(name, rows))
+            elif name in baseline:
+                found = find_regressions(name, rows, baseline[name], options["tolerance"])
+                regressions.extend({"suite": name, **regression} for regression in found)
+
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"💾 Baseline saved to {baseline_path}"))
+        elif regressions:
+            self.stdout.write(self.style.ERROR("📉 Regressions against the baseline"))
+            self.write_table(regressions)
+            raise CommandError(f"{len(regressions)} benchmark regression(s) over {options['tolerance']:.0%} tolerance")
+
+    def write_table(self, rows):
+        if not rows:
+            self.stdout.write("(no results)")
+            return
+        columns = list(rows[0])
+        widths = [max(len(str(col)), *(len(str(row.get(col, ""))) for row in rows)) for col in columns]
+        self.stdout.write("  ".join(str(col).rjust(w) for col, w in zip(columns, widths)))
+        for row in rows:
+            self.stdout.write("  ".join(str(row.get(col, "")).rjust(w) for col, w in zip(columns, widths)))
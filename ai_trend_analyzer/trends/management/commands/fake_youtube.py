@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trends.fake_youtube import CHART_SIZE, FakeYouTubeAPI, endpoint_url, make_server, record_fixture
+from trends.youtube_fetcher import build_youtube_client
+
+
+def split_csv(value):
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve an offline fake of the YouTube Data API (videos.list, channels.list) "
+        "for load tests, or record a fixture for it from the live API"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--fixture", help="JSON fixture to serve (default: seeded synthetic charts)")
+        parser.add_argument("--seed", type=int, default=42, help="Seed for synthetic charts")
+        parser.add_argument("--chart-size", type=int, default=CHART_SIZE, help="Videos per synthetic chart")
+        parser.add_argument("--latency-ms", type=float, default=0, help="Added to every response")
+        parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency, up to this much")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 500")
+        parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered 429")
+        parser.add_argument("--quota", type=int, help="Units before every request is answered 403 quotaExceeded")
+        parser.add_argument("--record", metavar="PATH",
+                            help="Record a fixture from the live API (needs YOUTUBE_API_KEY) and exit")
+        parser.add_argument("--regions", default="US,IN,PK,GB,CA", help="Regions to record")
+        parser.add_argument("--categories", default="all", help="Category IDs to record; 'all' means no filter")
+
+    def handle(self, *args, **options):
+        if options["record"]:
+            return self.record(options)
+
+        settings = {
+            "latency_ms": options["latency_ms"],
+            "jitter_ms": options["jitter_ms"],
+            "error_rate": options["error_rate"],
+            "throttle_rate": options["throttle_rate"],
+            "quota": options["quota"],
+            "seed": options["seed"],
+            "chart_size": options["chart_size"],
+        }
+        if options["fixture"]:
+            api = FakeYouTubeAPI.from_fixture(options["fixture"], **settings)
+        else:
+            api = FakeYouTubeAPI(**settings)
+
+        server = make_server(api, options["host"], options["port"])
+        self.stdout.write(self.style.SUCCESS(f"🧪 Fake YouTube API at {endpoint_url(server)}"))
+        self.stdout.write(f"   YOUTUBE_API_ENDPOINT={endpoint_url(server)}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {api.requests} requests ({api.units_used} quota units)")
+
+    def record(self, options):
+        regions = [r.upper() for r in split_csv(options["regions"])]
+        categories = [None if c.lower() == "all" else c for c in split_csv(options["categories"])]
+        try:
+            fixture = record_fixture(build_youtube_client(), regions, categories or [None], options["chart_size"])
+        except Exception as e:
+            raise CommandError(f"Recording failed: {e}")
+        with open(options["record"], "w", encoding="utf-8") as fh:
+            json.dump(fixture, fh)
+        videos = sum(len(items) for items in fixture["charts"].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"📼 Recorded {len(fixture['charts'])} charts ({videos} videos, "
+            f"{len(fixture['channels'])} channels) to {options['record']}"
+        ))
@@ -1,9 +1,52 @@
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
 from django.core.management.base import BaseCommand
-from googleapiclient.discovery import build
 from django.conf import settings
+from django.db import close_old_connections
+
+from trends.chart_analysis import materialize_snapshot
+from trends.ingest import save_snapshot
+from trends.quota import QuotaBudget
+from trends.youtube_fetcher import CHART_LIMIT, MAX_PAGE_SIZE, fetch_trending_videos
+
+logger = logging.getLogger("trends.ingest")
+
+# 403 reasons that mean the key's daily quota is spent (until the Pacific midnight reset)
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+# 403 reasons that only mean "slow down", like a 429
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def split_csv(value):
+    return [part.strip() for part in value.split(",") if part.strip()]
+
 
 class Command(BaseCommand):
-    help = "Fetch real trending YouTube videos by country"
+    help = (
+        "Ingest worker: fetch trending YouTube videos for every region/category "
+        "combination in parallel and store them as snapshots"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--regions", default="US,IN,PK,GB,CA",
+                            help="Comma-separated region codes (default: US,IN,PK,GB,CA)")
+        parser.add_argument("--categories", default="all",
+                            help="Comma-separated category IDs; 'all' means no category filter")
+        parser.add_argument("--max-results", type=int, default=MAX_PAGE_SIZE,
+                            help=f"Videos per chart, fetched in pages of 50 (default: 50, max: {CHART_LIMIT})")
+        parser.add_argument("--interval", type=int, default=300,
+                            help="Seconds between cycles (default: 300)")
+        parser.add_argument("--concurrency", type=int,
+                            default=getattr(settings, "TRENDS_FETCH_CONCURRENCY", 8),
+                            help="Charts fetched in parallel")
+        parser.add_argument("--max-backoff", type=int, default=3600,
+                            help="Upper bound in seconds for the backoff delay after 403/429")
+        parser.add_argument("--once", action="store_true",
+                            help="Run a single cycle and exit")
 
     def handle(self, *args, **options):
         api_key = settings.YOUTUBE_API_KEY
@@ -11,25 +54,106 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("❌ Missing YOUTUBE_API_KEY in .env"))
             return
 
-        youtube = build("youtube", "v3", developerKey=api_key)
-        countries = ["US", "IN", "PK", "GB", "CA"]
+        regions = [r.upper() for r in split_csv(options["regions"])]
+        categories = [None if c.lower() == "all" else c for c in split_csv(options["categories"])]
+        pairs = list(product(regions, categories or [None]))
+        budget = QuotaBudget(api_key)
+        if not budget.is_shared():
+            self.stdout.write(self.style.WARNING(
+                "⚠️ YOUTUBE_QUOTA_CACHE_ALIAS is a local-memory cache: the quota budget only counts "
+                "this process's calls and resets on restart"
+            ))
+        backoff = 0
 
-        for country in countries:
-            self.stdout.write(self.style.NOTICE(f"🌍 Fetching trending videos for {country}..."))
+        self.stdout.write(self.style.NOTICE(
+            f"🌍 Ingesting {len(pairs)} charts ({len(regions)} regions × {len(categories or [None])} categories)"
+        ))
 
-            request = youtube.videos().list(
-                part="snippet,statistics",
-                chart="mostPopular",
-                regionCode=country,
-                maxResults=5
-            )
-            response = request.execute()
+        with ThreadPoolExecutor(max_workers=options["concurrency"], thread_name_prefix="ingest") as executor:
+            while True:
+                throttled = self.run_cycle(executor, pairs, options["max_results"], budget)
+                close_old_connections()
 
-            for item in response.get("items", []):
-                title = item["snippet"]["title"]
-                channel = item["snippet"]["channelTitle"]
-                views = item["statistics"].get("viewCount", "0")
-                video_url = f"https://www.youtube.com/watch?v={item['id']}"
-                self.stdout.write(f"🎬 {title} — {channel} ({views} views)\n🔗 {video_url}\n")
+                if options["once"]:
+                    break
+
+                # Exponential backoff while YouTube is pushing back, reset on a clean cycle
+                backoff = backoff + 1 if throttled else 0
+                delay = min(options["interval"] * (2 ** backoff), options["max_backoff"])
+                if throttled:
+                    self.stdout.write(self.style.WARNING(f"⏳ Throttled, backing off {delay}s"))
+                time.sleep(delay)
 
         self.stdout.write(self.style.SUCCESS("✅ Successfully fetched trending videos!"))
+
+    def run_cycle(self, executor, pairs, max_results, budget):
+        """Fetch and store every chart once. Returns True if the cycle was throttled."""
+        # Per chart and page of 50: one videos.list + up to one channels.list
+        estimated_units = len(pairs) * 2 * math.ceil(max_results / MAX_PAGE_SIZE)
+        if not budget.can_spend(estimated_units):
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Quota budget too low ({budget.remaining()} units left, "
+                f"cycle needs ~{estimated_units}); skipping"
+            ))
+            return True
+
+        started = time.perf_counter()
+
+        def fetch(pair):
+            fetch_stats = {}
+            videos = fetch_trending_videos(pair[0], pair[1], max_results, fetch_stats=fetch_stats)
+            return pair, videos, fetch_stats
+
+        results = list(executor.map(fetch, pairs))
+        fetch_ms = (time.perf_counter() - started) * 1000
+
+        throttled = False
+        api_calls = 0
+        for pair, videos, fetch_stats in results:
+            api_calls += fetch_stats.get("api_calls", 0)  # already charged to the budget by the fetcher
+            status = fetch_stats.get("error_status")
+            reason = fetch_stats.get("error_reason")
+            if status is None:
+                continue
+            label = f"{pair[0]}/{pair[1] or 'all'}: HTTP {status}" + (f" {reason}" if reason else "")
+            if status == 429 or (status == 403 and reason in QUOTA_REASONS | RATE_LIMIT_REASONS):
+                throttled = True
+                if reason in QUOTA_REASONS:
+                    budget.exhaust()  # stop until the daily reset
+                self.stdout.write(self.style.WARNING(f"⚠️ {label}"))
+            else:
+                # Bad key, forbidden, region restrictions...: this chart failed, the rest go on
+                self.stdout.write(self.style.ERROR(f"❌ {label}"))
+
+        save_started = time.perf_counter()
+        saved_charts = 0
+        saved_videos = 0
+        unchanged_charts = 0
+        for (region, category), videos, fetch_stats in results:
+            if not videos:
+                continue
+            if fetch_stats.get("not_modified"):
+                unchanged_charts += 1  # 304: the latest snapshot is still current
+                continue
+            try:
+                snapshot = save_snapshot(videos, region, category)
+                # Analyse once here, not per request; only changed videos get re-scored
+                materialize_snapshot(snapshot)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"❌ Error saving {region}/{category or 'all'}: {e}"))
+                continue
+            saved_charts += 1
+            saved_videos += len(videos)
+        save_ms = (time.perf_counter() - save_started) * 1000  # includes analysis
+
+        logger.info(
+            "ingest cycle charts=%d/%d unchanged=%d videos=%d api_calls=%d quota_remaining=%d "
+            "fetch_ms=%.1f save_ms=%.1f",
+            saved_charts, len(pairs), unchanged_charts, saved_videos, api_calls, budget.remaining(),
+            fetch_ms, save_ms,
+        )
+        self.stdout.write(
+            f"🎬 Stored {saved_charts}/{len(pairs)} charts ({saved_videos} videos, {unchanged_charts} unchanged) "
+            f"in {fetch_ms + save_ms:.0f} ms — {api_calls} API calls, {budget.remaining()} quota units left"
+        )
+        return throttled
@@ -0,0 +1,77 @@
+import pstats
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Position of each sort column in the report rows (function, calls, tottime, cumtime)
+SORT_KEYS = {"calls": 1, "tottime": 2, "cumtime": 3}
+
+
+class Command(BaseCommand):
+    help = "Merge the request profiles written by ProfilingMiddleware into a ranked report of hot functions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*",
+                            help="Profile files or directories (default: TRENDS_PROFILE_DIR)")
+        parser.add_argument("--view", help="Only profiles of this view, e.g. trends:home")
+        parser.add_argument("--sort", choices=list(SORT_KEYS), default="tottime",
+                            help="tottime = time in the function itself (default), cumtime = including callees")
+        parser.add_argument("--limit", type=int, default=30, help="Functions to list (default: 30)")
+        parser.add_argument("--match", help="Only functions whose file or name contains this, e.g. ai_analysis")
+        parser.add_argument("--output", help="Also write the merged profile here (for snakeviz/pstats)")
+
+    def handle(self, *args, **options):
+        files = self.profile_files(options["paths"], options["view"])
+        if not files:
+            raise CommandError("No profiles found")
+
+        stats = pstats.Stats(*map(str, files))
+        if options["output"]:
+            stats.dump_stats(options["output"])
+
+        total = stats.total_tt or 1
+        rows = [
+            (func, calls, tottime, cumtime)
+            for func, (_, calls, tottime, cumtime, _) in stats.stats.items()
+            if not options["match"] or options["match"] in f"{func[0]}:{func[2]}"
+        ]
+        rows.sort(key=lambda row: row[SORT_KEYS[options["sort"]]], reverse=True)
+
+        self.stdout.write(self.style.NOTICE(
+            f"🔥 {len(files)} profiles, {total * 1000:.1f} ms profiled, sorted by {options['sort']}"
+        ))
+        self.stdout.write(f"{'#':>3}  {'calls':>9}  {'tottime_ms':>10}  {'cumtime_ms':>10}  {'self%':>6}  function")
+        for rank, (func, calls, tottime, cumtime) in enumerate(rows[:options["limit"]], 1):
+            self.stdout.write(
+                f"{rank:>3}  {calls:>9}  {tottime * 1000:>10.1f}  {cumtime * 1000:>10.1f}  "
+                f"{100 * tottime / total:>5.1f}%  {self.label(func)}"
+            )
+
+    def profile_files(self, paths, view):
+        paths = [Path(p) for p in paths] or [Path(getattr(settings, "TRENDS_PROFILE_DIR", "profiles"))]
+        files = []
+        for path in paths:
+            files.extend(sorted(path.glob("*.prof")) if path.is_dir() else [path])
+        if view:
+            prefix = view.replace(":", ".") + "-"
+            files = [f for f in files if f.name.startswith(prefix)]
+        return [f for f in files if f.exists()]
+
+    @staticmethod
+    def label(func):
+        filename, line, name = func
+        if filename == "~":
+            return name  # built-in, e.g. <method 'sort' of 'list' objects>
+        parts = Path(filename).parts
+        # Shorten site-packages / project paths to the package-relative part
+        for anchor in ("site-packages", "ai_trend_analyzer"):
+            if anchor in parts:
+                parts = parts[parts.index(anchor) + 1:]
+                break
+        else:
+            # Standard library: keep the module path below pythonX.Y/
+            lib = [i for i, part in enumerate(parts) if part.startswith("python3")]
+            if lib:
+                parts = parts[lib[-1] + 1:]
+        return f"{'/'.join(parts).lstrip('/')}:{line}({name})"
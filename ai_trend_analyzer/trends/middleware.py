@@ -0,0 +1,213 @@
+import cProfile
+import hmac
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import instrumentation
+
+logger = logging.getLogger("trends.requests")
+
+
+class DualModeMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI: when
+    the rest of the chain is async, __call__ hands over to __acall__
+    instead of Django running this middleware on a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class StaticFilesMiddleware(DualModeMiddleware, WhiteNoiseMiddleware):
+    """
+    WhiteNoise, without forcing every ASGI request through a thread:
+    WhiteNoiseMiddleware is sync-only, so under ASGI Django would run it,
+    and everything after it, in a thread per request.
+    """
+
+    def __init__(self, get_response):
+        WhiteNoiseMiddleware.__init__(self, get_response)
+        DualModeMiddleware.__init__(self, get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class InstrumentationMiddleware(DualModeMiddleware):
+    """
+    With TRENDS_INSTRUMENTATION on: collects the stage timings of each
+    request (see instrumentation), adds them as a Server-Timing header,
+    records request metrics and writes one structured log record per
+    request. Off, it only passes the request through.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not instrumentation.is_enabled():
+            return self.get_response(request)
+
+        timings, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not instrumentation.is_enabled():
+            return await self.get_response(request)
+
+        timings, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total_ms = timings.elapsed_ms()
+        view = self.view_name(request)
+        response["Server-Timing"] = timings.server_timing(total_ms)
+        instrumentation.registry.observe("trends_request_duration_seconds", total_ms / 1000, view=view)
+        instrumentation.registry.inc("trends_requests_total", view=view, status=response.status_code)
+
+        stages = timings.as_dict()
+        logger.info(
+            "request view=%s method=%s status=%d duration_ms=%.1f %s",
+            view, request.method, response.status_code, total_ms,
+            " ".join(f"{name}_ms={ms}" for name, ms in stages.items()),
+            extra={
+                "view": view,
+                "path": request.path,
+                "method": request.method,
+                "status": response.status_code,
+                "duration_ms": round(total_ms, 2),
+                "stages": stages,
+            },
+        )
+        return response
+
+    def process_exception(self, request, exception):
+        if instrumentation.is_enabled():
+            view = self.view_name(request)
+            instrumentation.registry.inc("trends_request_errors_total", view=view, error=type(exception).__name__)
+            timings = instrumentation.current_timings()
+            logger.exception(
+                "request failed view=%s path=%s error=%s", view, request.path, type(exception).__name__,
+                extra={"view": view, "path": request.path, "stages": timings.as_dict() if timings else {}},
+            )
+        return None  # let Django build the error response
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, "resolver_match", None)
+        return match.view_name if match is not None else "unmatched"
+
+
+class ProfilingMiddleware(DualModeMiddleware):
+    """
+    Runs cProfile over the handling of a sample of requests and writes each
+    profile to TRENDS_PROFILE_DIR (merge them with `manage.py
+    profile_report`).
+
+    A request is profiled if its view is in TRENDS_PROFILE_VIEWS and either
+    it wins the TRENDS_PROFILE_SAMPLE_RATE draw or it sends an
+    X-Trends-Profile header equal to TRENDS_PROFILE_TOKEN. One profile
+    runs at a time. Only the request thread is profiled: concurrent fetches
+    and batches big enough for the sentiment process pool are not, and
+    nothing is under ASGI, where the view's work is spread over pool
+    threads. With no sample rate and no token the middleware is
+    not loaded at all.
+    """
+
+    HEADER = "HTTP_X_TRENDS_PROFILE"
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, "TRENDS_PROFILE_SAMPLE_RATE", 0.0)
+        self.token = getattr(settings, "TRENDS_PROFILE_TOKEN", None)
+        if self.sample_rate <= 0 and not self.token:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.views = set(getattr(settings, "TRENDS_PROFILE_VIEWS", ("trends:home", "trends:compare")))
+        self.directory = Path(getattr(settings, "TRENDS_PROFILE_DIR", "profiles"))
+        self._busy = threading.Lock()
+
+    def sampled(self, request):
+        if request.resolver_match.view_name not in self.views:
+            return False
+        sent = request.META.get(self.HEADER, "")
+        if self.token and sent and hmac.compare_digest(sent.encode(), self.token.encode()):
+            return True
+        return random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler = request.__dict__.pop("_trends_profiler", None)
+            if profiler is not None:
+                profiler.disable()
+                self._busy.release()
+        if profiler is not None:
+            path = self.save(profiler, request.resolver_match.view_name)
+            response["X-Trends-Profile"] = path.name
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Only the sampling decision happens here: the profiler runs until the
+        # handler returns, so the view still goes through ATOMIC_REQUESTS and
+        # every middleware's process_exception as usual. Under ASGI the view
+        # may run on another thread than this one, so nothing is profiled.
+        if self.async_mode or iscoroutinefunction(view_func):
+            return None
+        if not self.sampled(request) or not self._busy.acquire(blocking=False):
+            return None  # the view runs normally, unprofiled
+        profiler = cProfile.Profile()
+        request._trends_profiler = profiler
+        profiler.enable()
+        return None
+
+    def save(self, profiler, view_name):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # <view>-<ns timestamp>-<pid>.prof; profile_report filters on the view prefix
+        path = self.directory / f"{view_name.replace(':', '.')}-{time.time_ns()}-{os.getpid()}.prof"
+        profiler.dump_stats(path)
+        return path
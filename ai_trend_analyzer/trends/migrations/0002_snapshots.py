@@ -0,0 +1,119 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trends', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('views', models.BigIntegerField(default=0)),
+                ('likes', models.BigIntegerField(default=0)),
+                ('comments', models.BigIntegerField(default=0)),
+                ('channel_subscribers', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('youtube', 'YouTube'), ('tiktok', 'TikTok'), ('instagram', 'Instagram')], default='youtube', max_length=20)),
+                ('region', models.CharField(max_length=2)),
+                ('category', models.CharField(blank=True, max_length=10)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('video_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='category_id',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='channel',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='channel_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='channel_subscribers',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='comments',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='video_id',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='fetched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='published_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['platform', 'fetched_at'], name='trends_vide_platfor_6341b9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['category_id'], name='trends_vide_categor_3bf574_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='video',
+            constraint=models.UniqueConstraint(fields=('platform', 'video_id'), name='unique_platform_video'),
+        ),
+        migrations.AddField(
+            model_name='snapshotentry',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot_entries', to='trends.video'),
+        ),
+        migrations.AddIndex(
+            model_name='trendsnapshot',
+            index=models.Index(fields=['platform', 'fetched_at'], name='trends_tren_platfor_4af3f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendsnapshot',
+            index=models.Index(fields=['region', 'category', '-fetched_at'], name='trends_tren_region_8b6298_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendsnapshot',
+            index=models.Index(fields=['category'], name='trends_tren_categor_8c9989_idx'),
+        ),
+        migrations.AddField(
+            model_name='snapshotentry',
+            name='snapshot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='trends.trendsnapshot'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotentry',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'video'), name='unique_snapshot_video'),
+        ),
+    ]
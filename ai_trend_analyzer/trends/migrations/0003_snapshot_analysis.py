@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trends', '0002_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('analyzer_version', models.PositiveIntegerField()),
+                ('region', models.CharField(max_length=2)),
+                ('category', models.CharField(blank=True, max_length=10)),
+                ('max_results', models.PositiveIntegerField()),
+                ('total_videos', models.PositiveIntegerField(default=0)),
+                ('keywords', models.JSONField(default=list)),
+                ('hashtags', models.JSONField(default=dict)),
+                ('summaries', models.JSONField(default=dict)),
+                ('avg_engagement', models.FloatField(default=0)),
+                ('sentiment_counts', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='snapshotentry',
+            name='engagement_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='snapshotentry',
+            name='sentiment_label',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='snapshotentry',
+            name='sentiment_raw',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='snapshotentry',
+            name='sentiment_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotentry',
+            index=models.Index(fields=['snapshot', '-engagement_score'], name='trends_snap_snapsho_1b7031_idx'),
+        ),
+        migrations.AddField(
+            model_name='snapshotanalysis',
+            name='snapshot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analyses', to='trends.trendsnapshot'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotanalysis',
+            index=models.Index(fields=['region', 'category', 'analyzer_version'], name='trends_snap_region_c8a522_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotanalysis',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'analyzer_version'), name='unique_snapshot_analysis'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trends', '0003_snapshot_analysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotTerms',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keywords', models.JSONField(default=dict)),
+                ('hashtags', models.JSONField(default=dict)),
+                ('snapshot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='trends.trendsnapshot')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TermWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('youtube', 'YouTube'), ('tiktok', 'TikTok'), ('instagram', 'Instagram')], default='youtube', max_length=20)),
+                ('region', models.CharField(max_length=2)),
+                ('category', models.CharField(blank=True, max_length=10)),
+                ('window', models.CharField(max_length=10)),
+                ('keywords', models.JSONField(default=dict)),
+                ('hashtags', models.JSONField(default=dict)),
+                ('snapshots', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('platform', 'region', 'category', 'window'), name='unique_term_window')],
+            },
+        ),
+    ]
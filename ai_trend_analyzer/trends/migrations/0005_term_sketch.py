@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trends', '0004_term_windows'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('youtube', 'YouTube'), ('tiktok', 'TikTok'), ('instagram', 'Instagram')], default='youtube', max_length=20)),
+                ('region', models.CharField(max_length=2)),
+                ('kind', models.CharField(choices=[('keywords', 'Keywords'), ('hashtags', 'Hashtags')], max_length=10)),
+                ('sketch', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('platform', 'region', 'kind'), name='unique_term_sketch')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trends', '0005_term_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshotentry',
+            name='sentiment_text_hash',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
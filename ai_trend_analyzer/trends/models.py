@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Video(models.Model):
     PLATFORM_CHOICES = [
@@ -8,14 +9,181 @@ class Video(models.Model):
     ]
 
     platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
+    video_id = models.CharField(max_length=64)  # platform's own ID, e.g. YouTube videoId
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
+    channel = models.CharField(max_length=255, blank=True)
+    channel_id = models.CharField(max_length=64, blank=True)
+    category_id = models.CharField(max_length=10, blank=True)
     video_url = models.URLField()
     thumbnail_url = models.URLField(blank=True, null=True)
+    # Latest counters; per-snapshot history lives in SnapshotEntry
     views = models.BigIntegerField(default=0)
     likes = models.BigIntegerField(default=0)
-    published_at = models.DateTimeField()
-    fetched_at = models.DateTimeField(auto_now_add=True)
+    comments = models.BigIntegerField(default=0)
+    channel_subscribers = models.BigIntegerField(default=0)
+    published_at = models.DateTimeField(null=True, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)  # last time seen in a chart
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['platform', 'video_id'], name='unique_platform_video'),
+        ]
+        indexes = [
+            models.Index(fields=['platform', 'fetched_at']),
+            models.Index(fields=['category_id']),
+        ]
 
     def __str__(self):
         return f"{self.platform.capitalize()} - {self.title[:50]}"
+
+
+class TrendSnapshot(models.Model):
+    """One fetched trending chart (platform + region + category) at a point in time."""
+
+    platform = models.CharField(max_length=20, choices=Video.PLATFORM_CHOICES, default='youtube')
+    region = models.CharField(max_length=2)
+    category = models.CharField(max_length=10, blank=True)  # '' = all categories
+    fetched_at = models.DateTimeField(default=timezone.now)
+    video_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['platform', 'fetched_at']),
+            models.Index(fields=['region', 'category', '-fetched_at']),
+            models.Index(fields=['category']),
+        ]
+
+    def __str__(self):
+        return f"{self.region}/{self.category or 'all'} @ {self.fetched_at:%Y-%m-%d %H:%M}"
+
+
+class SnapshotEntry(models.Model):
+    """A video's chart position and counters as of one snapshot."""
+
+    snapshot = models.ForeignKey(TrendSnapshot, on_delete=models.CASCADE, related_name='entries')
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='snapshot_entries')
+    rank = models.PositiveIntegerField()
+    views = models.BigIntegerField(default=0)
+    likes = models.BigIntegerField(default=0)
+    comments = models.BigIntegerField(default=0)
+    channel_subscribers = models.BigIntegerField(default=0)
+    # Filled in by chart_analysis.materialize_snapshot
+    engagement_score = models.FloatField(null=True, blank=True)
+    sentiment_label = models.CharField(max_length=10, blank=True)
+    sentiment_score = models.FloatField(null=True, blank=True)
+    sentiment_raw = models.JSONField(null=True, blank=True)
+    # Hash of the text the sentiment was scored from; a later snapshot reuses
+    # the sentiment only when its text hashes the same
+    sentiment_text_hash = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'video'], name='unique_snapshot_video'),
+        ]
+        indexes = [
+            models.Index(fields=['snapshot', '-engagement_score']),
+        ]
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.video_id} in snapshot {self.snapshot_id}"
+
+
+class SnapshotAnalysis(models.Model):
+    """
+    Chart-level analysis of one snapshot, computed once at ingest time.
+    Hashtags and summaries are stored per engagement filter ('' = all).
+    """
+
+    snapshot = models.ForeignKey(TrendSnapshot, on_delete=models.CASCADE, related_name='analyses')
+    analyzer_version = models.PositiveIntegerField()
+    region = models.CharField(max_length=2)
+    category = models.CharField(max_length=10, blank=True)
+    max_results = models.PositiveIntegerField()  # top-N entries (by rank) analysed
+    total_videos = models.PositiveIntegerField(default=0)
+    keywords = models.JSONField(default=list)
+    hashtags = models.JSONField(default=dict)
+    summaries = models.JSONField(default=dict)
+    avg_engagement = models.FloatField(default=0)
+    sentiment_counts = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'analyzer_version'], name='unique_snapshot_analysis'),
+        ]
+        indexes = [
+            models.Index(fields=['region', 'category', 'analyzer_version']),
+        ]
+
+    def __str__(self):
+        return f"Analysis v{self.analyzer_version} of snapshot {self.snapshot_id}"
+
+
+class SnapshotTerms(models.Model):
+    """
+    Keyword and #tag counts one snapshot contributes to the sliding term
+    windows. Frozen when first computed, so a snapshot leaving a window
+    subtracts exactly what it added.
+    """
+
+    snapshot = models.OneToOneField(TrendSnapshot, on_delete=models.CASCADE, related_name='terms')
+    keywords = models.JSONField(default=dict)
+    hashtags = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"Terms of snapshot {self.snapshot_id}"
+
+
+class TermWindow(models.Model):
+    """
+    Running keyword/#tag totals over the snapshots of one region/category
+    fetched within a sliding time window (e.g. the last hour).
+    """
+
+    platform = models.CharField(max_length=20, choices=Video.PLATFORM_CHOICES, default='youtube')
+    region = models.CharField(max_length=2)
+    category = models.CharField(max_length=10, blank=True)  # '' = all categories
+    window = models.CharField(max_length=10)  # key of term_stream.WINDOWS, e.g. '1h'
+    keywords = models.JSONField(default=dict)
+    hashtags = models.JSONField(default=dict)
+    # [[snapshot_id, fetched_at ISO], ...] in fetch order
+    snapshots = models.JSONField(default=list)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['platform', 'region', 'category', 'window'], name='unique_term_window'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.region}/{self.category or 'all'} last {self.window}"
+
+
+class TermSketch(models.Model):
+    """
+    Bounded-memory heavy-hitter summary (ai_analysis.heavy_hitters.SpaceSaving)
+    of the keywords or #tags of every snapshot ever stored for a region.
+    """
+
+    KIND_CHOICES = [
+        ('keywords', 'Keywords'),
+        ('hashtags', 'Hashtags'),
+    ]
+
+    platform = models.CharField(max_length=20, choices=Video.PLATFORM_CHOICES, default='youtube')
+    region = models.CharField(max_length=2)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    sketch = models.JSONField(default=dict)  # SpaceSaving.to_dict()
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['platform', 'region', 'kind'], name='unique_term_sketch'),
+        ]
+
+    def __str__(self):
+        return f"{self.region} {self.kind} sketch"
@@ -0,0 +1,60 @@
+"""
+Daily YouTube Data API quota budget, tracked per API key.
+
+Usage is counted in the Django cache named by YOUTUBE_QUOTA_CACHE_ALIAS
+under a key derived from a hash of the API key and the quota day. Every
+fetch (web requests and the fetch_trends worker alike) charges it, so
+the alias must point at a cache shared by all processes (Redis,
+Memcached or the database cache): with a local-memory cache each process
+counts only its own calls and starts from zero when it restarts.
+YouTube resets quotas at midnight Pacific time, so the day rolls over
+then rather than at UTC midnight.
+"""
+import hashlib
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+# Usage keys outlive their quota day so a late read still sees it
+USAGE_TIMEOUT = 2 * 24 * 3600
+
+
+class QuotaBudget:
+    def __init__(self, api_key, daily_units=None):
+        self.key_id = hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+        self.daily_units = daily_units or getattr(settings, "YOUTUBE_DAILY_QUOTA", 10000)
+
+    @staticmethod
+    def _cache():
+        return caches[getattr(settings, "YOUTUBE_QUOTA_CACHE_ALIAS", "default")]
+
+    def is_shared(self):
+        """False if usage is only counted in this process (local-memory or dummy cache)."""
+        return not isinstance(self._cache(), (LocMemCache, DummyCache))
+
+    def _cache_key(self):
+        day = datetime.now(QUOTA_TIMEZONE).strftime("%Y%m%d")
+        return f"quota:{self.key_id}:{day}"
+
+    def used(self):
+        return self._cache().get(self._cache_key(), 0)
+
+    def remaining(self):
+        return max(0, self.daily_units - self.used())
+
+    def can_spend(self, units):
+        return self.remaining() >= units
+
+    def charge(self, units):
+        cache, key = self._cache(), self._cache_key()
+        cache.add(key, 0, timeout=USAGE_TIMEOUT)
+        return cache.incr(key, units)
+
+    def exhaust(self):
+        """Mark the budget spent, e.g. after a 403 quotaExceeded response."""
+        self._cache().set(self._cache_key(), self.daily_units, timeout=USAGE_TIMEOUT)
@@ -0,0 +1,126 @@
+"""
+Fastest-rising keywords, hashtags and videos per region, from stored
+snapshot history.
+
+The last TRENDS_RISING_HISTORY snapshots of a region/category are loaded
+with values_list() queries (no model instances) into term × snapshot and
+video × snapshot matrices. ai_analysis.trend_velocity then scores every
+row at once.
+
+That is too much work per page view, so the home page reads
+cached_rising_trends(): computed when a snapshot is materialized (and on
+a cache miss), then cached under the latest analysed snapshot's ID.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .ai_analysis.trend_velocity import top_rising, trend_velocity
+from .instrumentation import instrumented
+from .models import SnapshotEntry, SnapshotTerms, TrendSnapshot
+
+# Rising items per kind shown on the home page
+HOME_TOP_N = 8
+
+
+def _term_matrix(term_counts, columns):
+    """(terms, matrix) from [(snapshot_id, {term: count}), ...]; absent terms count 0."""
+    vocabulary = {}
+    rows, cols, values = [], [], []
+    for snapshot_id, counts in term_counts:
+        col = columns[snapshot_id]
+        for term, count in counts.items():
+            rows.append(vocabulary.setdefault(term, len(vocabulary)))
+            cols.append(col)
+            values.append(count)
+    matrix = np.zeros((len(vocabulary), len(columns)))
+    matrix[rows, cols] = values
+    return list(vocabulary), matrix
+
+
+@instrumented("rising")
+def rising_trends(region, category="", top_n=10, history=None, platform="youtube"):
+    """
+    Rising keywords and hashtags (by z-score of their latest count) and
+    videos on the latest chart (by views gained per hour), each with
+    value, velocity, acceleration and zscore. Empty lists until at least
+    two analysed snapshots are stored.
+    """
+    history = history or getattr(settings, "TRENDS_RISING_HISTORY", 48)
+    recent = list(
+        TrendSnapshot.objects
+        .filter(platform=platform, region=region, category=category or "", terms__isnull=False)
+        .order_by("-fetched_at")
+        .values_list("pk", "fetched_at")[:history]
+    )[::-1]
+    result = {"keywords": [], "hashtags": [], "videos": [], "snapshots": len(recent)}
+    if len(recent) < 2:
+        return result
+
+    columns = {pk: col for col, (pk, _) in enumerate(recent)}
+    started = recent[0][1]
+    hours = np.array([(fetched_at - started).total_seconds() / 3600 for _, fetched_at in recent])
+
+    terms = list(
+        SnapshotTerms.objects.filter(snapshot_id__in=columns).values_list("snapshot_id", "keywords", "hashtags")
+    )
+    for kind, position in (("keywords", 1), ("hashtags", 2)):
+        labels, matrix = _term_matrix([(row[0], row[position]) for row in terms], columns)
+        if labels:
+            result[kind] = top_rising(labels, trend_velocity(matrix, hours), top_n)
+
+    # Videos on the latest chart, with their views in every earlier snapshot (NaN if absent)
+    latest_id = recent[-1][0]
+    entries = list(
+        SnapshotEntry.objects
+        .filter(
+            snapshot_id__in=columns,
+            video__snapshot_entries__snapshot_id=latest_id,
+        )
+        .values_list("snapshot_id", "video__video_id", "video__title", "views", "engagement_score")
+    )
+    videos = {}
+    for snapshot_id, video_id, title, views, engagement in entries:
+        if snapshot_id == latest_id:
+            videos[video_id] = {"title": title, "engagement_score": engagement}
+    index = {video_id: row for row, video_id in enumerate(videos)}
+    views = np.full((len(index), len(columns)), np.nan)
+    for snapshot_id, video_id, _, count, _ in entries:
+        views[index[video_id], columns[snapshot_id]] = count
+
+    if index:
+        for item in top_rising(list(index), trend_velocity(views, hours), top_n, key="velocity"):
+            item.update(videos[item["label"]])
+            result["videos"].append(item)
+    return result
+
+
+def _cache():
+    return caches[getattr(settings, "TRENDS_CACHE_ALIAS", "default")]
+
+
+def _latest_analysed(region, category, platform):
+    return (
+        TrendSnapshot.objects
+        .filter(platform=platform, region=region, category=category or "", terms__isnull=False)
+        .order_by("-fetched_at")
+        .values_list("pk", flat=True)
+        .first()
+    )
+
+
+def cached_rising_trends(region, category="", top_n=HOME_TOP_N, platform="youtube"):
+    """
+    rising_trends() cached under the latest analysed snapshot's ID: it only
+    changes when a snapshot's terms are stored, so a newer snapshot simply
+    gets a new key.
+    """
+    snapshot_id = _latest_analysed(region, category, platform)
+    if snapshot_id is None:
+        return {"keywords": [], "hashtags": [], "videos": [], "snapshots": 0}
+    key = f"rising:{platform}:{region}:{category or 'all'}:{top_n}:{snapshot_id}"
+    result = _cache().get(key)
+    if result is None:
+        result = rising_trends(region, category, top_n, platform=platform)
+        _cache().set(key, result, timeout=getattr(settings, "TRENDS_CACHE_STALE_TTL", 3600))
+    return result
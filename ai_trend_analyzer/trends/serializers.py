@@ -0,0 +1,88 @@
+"""
+Serializers for the read-only JSON API (api.py).
+
+They read the video dicts / VideoRecords and analysis dicts that
+analyze_chart() and load_chart_analysis() return. Each accepts a
+`fields` list (the `?fields=` query parameter): only those fields are
+serialized. Without one, every field except the `detail_fields` is
+(full descriptions and raw VADER scores are large and rarely needed).
+"""
+from rest_framework import serializers
+
+
+class ProjectedSerializer(serializers.Serializer):
+    """Serializer whose output fields can be narrowed with `fields=[...]`."""
+
+    detail_fields = ()  # only serialized when asked for by name
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = set(fields) if fields else set(self.fields) - set(self.detail_fields)
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def parse_fields(cls, value, param="fields"):
+        """`?fields=id,title` → ['id', 'title']; empty → None (default fields)."""
+        names = [name.strip() for name in (value or "").split(",") if name.strip()]
+        unknown = [name for name in names if name not in cls._declared_fields]
+        if unknown:
+            raise serializers.ValidationError({param: f"Unknown field(s): {', '.join(unknown)}"})
+        return names or None
+
+
+class VideoSerializer(ProjectedSerializer):
+    id = serializers.CharField()
+    title = serializers.CharField()
+    channel = serializers.CharField()
+    channel_id = serializers.CharField(source="channelId", allow_null=True)
+    category_id = serializers.CharField(source="categoryId")
+    category = serializers.CharField(source="categoryName", default="")
+    published_at = serializers.CharField(source="publishedAt", allow_null=True, default=None)
+    link = serializers.CharField(default="")
+    thumbnail = serializers.CharField(default="")
+    views = serializers.IntegerField()
+    likes = serializers.IntegerField()
+    comments = serializers.IntegerField()
+    channel_subscribers = serializers.IntegerField()
+    engagement_score = serializers.FloatField(allow_null=True)
+    sentiment = serializers.CharField(source="sentiment.label")
+    sentiment_score = serializers.FloatField(source="sentiment.score", allow_null=True)
+    description = serializers.CharField()
+    sentiment_raw = serializers.JSONField(source="sentiment.raw", default=None)
+
+    detail_fields = ("description", "sentiment_raw")
+
+
+class TermSerializer(ProjectedSerializer):
+    term = serializers.CharField()
+    # As stored: int for keywords, float for weighted hashtags
+    count = serializers.ReadOnlyField()
+
+
+class CountrySerializer(ProjectedSerializer):
+    """One country of a comparison; `video_fields` narrows its nested videos."""
+
+    code = serializers.CharField()
+    name = serializers.CharField()
+    snapshot = serializers.IntegerField(allow_null=True)
+    total_videos = serializers.IntegerField()
+    avg_engagement = serializers.FloatField()
+    sentiment_counts = serializers.DictField(child=serializers.IntegerField())
+    keywords = TermSerializer(many=True)
+    hashtags = TermSerializer(many=True)
+    summary = serializers.CharField()
+    videos = VideoSerializer(many=True)
+
+    detail_fields = ("summary",)
+
+    def __init__(self, *args, video_fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if "videos" in self.fields:
+            self.fields["videos"] = VideoSerializer(many=True, fields=video_fields)
+
+
+def term_rows(pairs):
+    """(term, count) pairs, as analysis results hold them, → TermSerializer input."""
+    return [{"term": term, "count": count} for term, count in pairs]
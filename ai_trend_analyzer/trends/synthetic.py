@@ -0,0 +1,81 @@
+"""
+Seeded synthetic charts for benchmarks and the fake YouTube server:
+fetch_trending_videos-shaped dicts with realistic-looking text and
+counters, and the videos.list items they would have come from.
+"""
+import random
+
+VOCABULARY = (
+    "amazing official video trailer live music new song reaction highlights match goal "
+    "best funny challenge gameplay update news review vlog football cricket terrible "
+    "love hate win lose epic fail shocking tutorial recipe travel episode season final"
+).split()
+
+DESCRIPTION_LINES = (
+    "Subscribe for more videos every week!",
+    "Follow us on https://instagram.com/example and https://twitter.com/example",
+    "00:00 Intro 01:23 Highlights 05:40 Reactions 09:12 Outro",
+    "This video is sponsored by Example VPN. Use code TRENDS for 20% off.",
+    "#trending #viral #music #shorts",
+    "Thanks for watching, we really appreciate the amazing support!",
+)
+
+
+def synthetic_title(rng):
+    words = rng.choices(VOCABULARY, k=rng.randint(4, 10))
+    return " ".join(w.capitalize() if rng.random() < 0.4 else w for w in words)
+
+
+def synthetic_description(rng, lines=None):
+    lines = lines if lines is not None else rng.randint(1, 30)
+    return "\n".join(rng.choice(DESCRIPTION_LINES) for _ in range(lines))
+
+
+def synthetic_videos(n, seed=42, region="US"):
+    """fetch_trending_videos-shaped dicts with realistic-looking text and counters."""
+    rng = random.Random(seed)
+    videos = []
+    for i in range(n):
+        video_id = f"{region}{seed}{i:06d}"
+        views = rng.randint(1_000, 50_000_000)
+        videos.append({
+            "id": video_id,
+            "videoId": video_id,
+            "title": synthetic_title(rng),
+            "description": synthetic_description(rng),
+            "channel": f"Channel {rng.randint(1, max(1, n // 3))}",
+            "thumbnail": f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
+            "views": views,
+            "likes": int(views * rng.uniform(0, 0.1)),
+            "comments": int(views * rng.uniform(0, 0.01)),
+            "link": f"https://www.youtube.com/watch?v={video_id}",
+            "channel_subscribers": rng.randint(0, 20_000_000),
+            "channelId": f"UC{rng.randint(1, max(1, n // 3)):08d}",
+            "categoryId": rng.choice(["1", "10", "17", "20", "22", "24", "25"]),
+            "publishedAt": "2026-01-01T00:00:00Z",
+        })
+    return videos
+
+
+def synthetic_api_items(videos):
+    """videos.list-shaped items (snippet + statistics) for synthetic_videos output."""
+    return [
+        {
+            "id": v["id"],
+            "snippet": {
+                "title": v["title"],
+                "description": v["description"],
+                "channelTitle": v["channel"],
+                "channelId": v["channelId"],
+                "categoryId": v["categoryId"],
+                "publishedAt": v["publishedAt"],
+                "thumbnails": {"medium": {"url": v["thumbnail"]}},
+            },
+            "statistics": {
+                "viewCount": str(v["views"]),
+                "likeCount": str(v["likes"]),
+                "commentCount": str(v["comments"]),
+            },
+        }
+        for v in videos
+    ]
@@ -0,0 +1,11 @@
+from django import template
+
+from ..ai_analysis.engagement_calculator import engagement_text as format_engagement
+
+register = template.Library()
+
+
+@register.filter
+def engagement_text(score, views=None):
+    """{{ video.engagement_score|engagement_text:video.views }} → "5.42% Engagement"."""
+    return format_engagement(score, views)
@@ -0,0 +1,254 @@
+"""
+Incremental keyword/#tag counters over the ingest stream.
+
+Each stored snapshot contributes its title keywords and #tags once
+(SnapshotTerms, computed when the snapshot is materialized). For every
+region/category and every window in WINDOWS, a TermWindow row keeps the
+running totals of the snapshots fetched inside that window. add() counts
+a new snapshot in and remove() takes an expired one back out, so "top
+keywords of the last hour" is always current without recounting history.
+The totals live in the database and survive restarts.
+
+Across all time, each region also keeps a bounded Space-Saving sketch of
+its keywords and #tags (TermSketch). global_trending_terms() merges them
+into one "trending everywhere" top-K in constant memory.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ai_analysis.hashtag_extractor import hashtag_counts
+from .ai_analysis.heavy_hitters import SpaceSaving
+from .ai_analysis.keyword_analyzer import keyword_counts
+from .ai_analysis.tokenizer import tokenize
+from .models import SnapshotTerms, TermSketch, TermWindow, TrendSnapshot
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+}
+
+
+def snapshot_terms(snapshot, tokens=None, max_results=None):
+    """
+    The SnapshotTerms of a snapshot, computed on first use from `tokens`
+    (tokenizer output for its analysed videos) or its top entries.
+    """
+    try:
+        return snapshot.terms
+    except SnapshotTerms.DoesNotExist:
+        pass
+
+    if tokens is None:
+        max_results = max_results or getattr(settings, "TRENDS_ANALYSIS_MAX_RESULTS", 20)
+        entries = snapshot.entries.select_related("video").filter(rank__lte=max_results)
+        tokens = [tokenize(e.video.title, e.video.description, sentiment=False) for e in entries]
+
+    terms, _ = SnapshotTerms.objects.get_or_create(
+        snapshot=snapshot,
+        defaults={
+            "keywords": dict(keyword_counts([], tokens)),
+            "hashtags": dict(hashtag_counts(tokens)),
+        },
+    )
+    return terms
+
+
+def _subtract(totals, counts):
+    for term, count in counts.items():
+        remaining = totals.get(term, 0) - count
+        if remaining > 0:
+            totals[term] = remaining
+        else:
+            totals.pop(term, None)
+
+
+class SlidingTermCounter:
+    """
+    Keyword/#tag totals of one TermWindow, updated in place with add(),
+    remove() and expire(); save() writes them back.
+    """
+
+    def __init__(self, row):
+        self.row = row
+        self.span = WINDOWS[row.window]
+        self.keywords = Counter(row.keywords)
+        self.hashtags = Counter(row.hashtags)
+        self.snapshots = [(snapshot_id, parse_datetime(at)) for snapshot_id, at in row.snapshots]
+
+    @classmethod
+    def load(cls, region, category="", window="1h", platform="youtube", for_update=False):
+        """The counter for (region, category, window); lock the row with for_update in a transaction."""
+        rows = TermWindow.objects.select_for_update() if for_update else TermWindow.objects
+        row, _ = rows.get_or_create(
+            platform=platform, region=region, category=category or "", window=window,
+        )
+        return cls(row)
+
+    def __contains__(self, snapshot_id):
+        return any(counted == snapshot_id for counted, _ in self.snapshots)
+
+    def add(self, snapshot, terms=None, now=None):
+        """
+        Count a snapshot in. Returns False (and does nothing) if it is
+        already counted or was fetched before the window starts.
+        """
+        cutoff = (now or timezone.now()) - self.span
+        if snapshot.pk in self or snapshot.fetched_at <= cutoff:
+            return False
+        terms = terms or snapshot_terms(snapshot)
+        self.keywords.update(terms.keywords)
+        self.hashtags.update(terms.hashtags)
+        self.snapshots.append((snapshot.pk, snapshot.fetched_at))
+        self.snapshots.sort(key=lambda item: item[1])
+        return True
+
+    def remove(self, snapshot, terms=None):
+        """Take a counted snapshot's terms back out. Returns False if it wasn't counted."""
+        if snapshot.pk not in self:
+            return False
+        terms = terms or snapshot_terms(snapshot)
+        _subtract(self.keywords, terms.keywords)
+        _subtract(self.hashtags, terms.hashtags)
+        self.snapshots = [item for item in self.snapshots if item[0] != snapshot.pk]
+        return True
+
+    def expire(self, now=None):
+        """Remove every snapshot fetched before the window start. Returns how many were removed."""
+        cutoff = (now or timezone.now()) - self.span
+        expired = [snapshot_id for snapshot_id, at in self.snapshots if at <= cutoff]
+        if not expired:
+            return 0
+
+        snapshots = TrendSnapshot.objects.select_related("terms").in_bulk(expired)
+        if any(snapshot_id not in snapshots for snapshot_id in expired):
+            # A counted snapshot was deleted, so its terms can't be subtracted
+            self.rebuild(now)
+            return len(expired)
+
+        for snapshot_id in expired:
+            self.remove(snapshots[snapshot_id])
+        return len(expired)
+
+    def rebuild(self, now=None):
+        """Recount the window from the stored SnapshotTerms of its snapshots."""
+        cutoff = (now or timezone.now()) - self.span
+        terms = (
+            SnapshotTerms.objects
+            .filter(
+                snapshot__platform=self.row.platform,
+                snapshot__region=self.row.region,
+                snapshot__category=self.row.category,
+                snapshot__fetched_at__gt=cutoff,
+            )
+            .select_related("snapshot")
+            .order_by("snapshot__fetched_at")
+        )
+        self.keywords = Counter()
+        self.hashtags = Counter()
+        self.snapshots = []
+        for t in terms:
+            self.keywords.update(t.keywords)
+            self.hashtags.update(t.hashtags)
+            self.snapshots.append((t.snapshot_id, t.snapshot.fetched_at))
+
+    def top_keywords(self, top_n=10):
+        return self.keywords.most_common(top_n)
+
+    def top_hashtags(self, top_n=10):
+        return self.hashtags.most_common(top_n)
+
+    def save(self):
+        self.row.keywords = dict(self.keywords)
+        self.row.hashtags = dict(self.hashtags)
+        self.row.snapshots = [[snapshot_id, at.isoformat()] for snapshot_id, at in self.snapshots]
+        self.row.updated_at = timezone.now()
+        self.row.save()
+
+
+def stream_snapshot(snapshot, terms=None):
+    """Add a newly stored snapshot to every window of its region/category."""
+    terms = terms or snapshot_terms(snapshot)
+    with transaction.atomic():
+        for window in WINDOWS:
+            counter = SlidingTermCounter.load(
+                snapshot.region, snapshot.category, window, snapshot.platform, for_update=True,
+            )
+            counter.add(snapshot, terms)
+            counter.expire()
+            counter.save()
+        _update_sketches(snapshot, terms)
+    logger.debug("streamed snapshot id=%s into %d term windows", snapshot.pk, len(WINDOWS))
+
+
+def trending_terms(region, category="", window="1h", top_n=10, platform="youtube"):
+    """Top keywords and #tags of the snapshots fetched in the last `window`."""
+    with transaction.atomic():
+        counter = SlidingTermCounter.load(region, category, window, platform, for_update=True)
+        if counter.expire():
+            counter.save()
+    return {
+        "keywords": counter.top_keywords(top_n),
+        "hashtags": counter.top_hashtags(top_n),
+        "snapshots": len(counter.snapshots),
+    }
+
+
+# ---------------------- All-time heavy hitters ----------------------
+
+def new_sketch():
+    """An empty sketch sized by TRENDS_SKETCH_MEMORY_KB."""
+    return SpaceSaving.for_memory(getattr(settings, "TRENDS_SKETCH_MEMORY_KB", 256) * 1024)
+
+
+def _load_sketch(data):
+    sketch = new_sketch()
+    if not data:
+        return sketch
+    stored = SpaceSaving.from_dict(data)
+    if stored.capacity == sketch.capacity:
+        return stored
+    return sketch.merge(stored)  # memory budget changed; resize
+
+
+def _update_sketches(snapshot, terms):
+    """Add a snapshot's terms to its region's all-time sketches (call inside a transaction)."""
+    for kind in ("keywords", "hashtags"):
+        row, _ = TermSketch.objects.select_for_update().get_or_create(
+            platform=snapshot.platform, region=snapshot.region, kind=kind,
+        )
+        sketch = _load_sketch(row.sketch)
+        sketch.update(getattr(terms, kind))
+        row.sketch = sketch.to_dict()
+        row.updated_at = timezone.now()
+        row.save()
+
+
+def global_trending_terms(top_n=10, platform="youtube"):
+    """
+    Top keywords and #tags across every region and snapshot, from the
+    merged per-region sketches. Counts are upper bounds; `max_error` is
+    the most any of them can overstate.
+    """
+    result = {"regions": 0}
+    for kind in ("keywords", "hashtags"):
+        merged = new_sketch()
+        regions = 0
+        # One region's sketch in memory at a time
+        for data in TermSketch.objects.filter(platform=platform, kind=kind).values_list("sketch", flat=True).iterator():
+            merged.merge(_load_sketch(data))
+            regions += 1
+        result[kind] = [
+            {"term": term, "count": count, "error": merged.error(term)}
+            for term, count in merged.most_common(top_n)
+        ]
+        result[f"{kind}_max_error"] = merged.max_error
+        result["regions"] = max(result["regions"], regions)
+    return result
@@ -1,3 +1,1316 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import chart_analysis, fetch_engine, trend_cache
+from .ai_analysis.hashtag_extractor import extract_hashtags
+from .ai_analysis.heavy_hitters import SpaceSaving
+from .chart_analysis import analyze_chart, load_chart_analysis, materialize_snapshot
+from .ingest import load_snapshot_videos, save_snapshot
+from .models import SnapshotAnalysis, SnapshotEntry, TrendSnapshot, Video
+from .rising import cached_rising_trends, rising_trends
+from .serializers import TermSerializer, term_rows
+from .term_stream import SlidingTermCounter, trending_terms
+from .youtube_fetcher import YouTubeClientPool, fetch_trending_videos
+
+
+def make_video_item(video_id, channel_id, views=1000, likes=50, comments=5):
+    """Minimal videos.list item shaped like the YouTube Data API response."""
+    return {
+        "id": video_id,
+        "snippet": {
+            "title": f"Video {video_id}",
+            "description": "",
+            "channelId": channel_id,
+            "channelTitle": f"Channel {channel_id}",
+            "categoryId": "24",
+            "thumbnails": {"medium": {"url": f"https://i.ytimg.com/{video_id}.jpg"}},
+        },
+        "statistics": {
+            "viewCount": str(views),
+            "likeCount": str(likes),
+            "commentCount": str(comments),
+        },
+    }
+
+
+def make_chart_videos():
+    """Five videos shaped like fetch_trending_videos output, spread over the engagement levels."""
+    return [
+        {"id": f"v{i}", "title": f"Great Football Match {i}", "description": "Amazing #goal highlights",
+         "link": f"https://www.youtube.com/watch?v=v{i}", "views": 1000, "likes": likes,
+         "comments": 5, "channel_subscribers": 100, "categoryId": "17"}
+        for i, likes in enumerate([10, 30, 80, 0, 200])
+    ]
+
+
+class FakeYouTube:
+    """Stand-in for the googleapiclient service that records channels().list calls."""
+
+    def __init__(self, items):
+        self.items = items
+        self.channel_requests = []
+
+    def videos(self):
+        return mock.Mock(list=lambda **kw: mock.Mock(execute=lambda: {"items": self.items}))
+
+    def channels(self):
+        def list_(**kw):
+            ids = kw["id"].split(",")
+            self.channel_requests.append(ids)
+            return mock.Mock(execute=lambda: {"items": [
+                {"id": cid, "statistics": {"subscriberCount": "100"}} for cid in ids
+            ]})
+        return mock.Mock(list=list_)
+
+
+class BatchedChannelLookupTests(TestCase):
+    def test_unique_channels_resolved_in_one_call(self):
+        # 21 videos across 7 channels → one channels().list call
+        items = [make_video_item(f"v{i}", f"c{i % 7}") for i in range(21)]
+        youtube = FakeYouTube(items)
+        fetch_stats = {}
+
+        with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: youtube)):
+            videos = fetch_trending_videos("US", fetch_stats=fetch_stats)
+
+        self.assertEqual(len(videos), 21)
+        self.assertEqual(len(youtube.channel_requests), 1)
+        self.assertEqual(sorted(youtube.channel_requests[0]), sorted(f"c{i}" for i in range(7)))
+        self.assertTrue(all(v["channel_subscribers"] == 100 for v in videos))
+        self.assertEqual(fetch_stats["api_calls"], 2)
+
+    def test_channels_chunked_by_fifty(self):
+        items = [make_video_item(f"v{i}", f"c{i}") for i in range(120)]
+        youtube = FakeYouTube(items)
+        fetch_stats = {}
+
+        with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: youtube)):
+            fetch_trending_videos("US", max_results=120, fetch_stats=fetch_stats)
+
+        self.assertEqual([len(ids) for ids in youtube.channel_requests], [50, 50, 20])
+        self.assertEqual(fetch_stats["channel_calls"], 3)
+
+    def test_failed_channel_lookup_logged_and_counted(self):
+        from . import instrumentation
+
+        instrumentation.registry.reset()
+        instrumentation.configure(True)
+        self.addCleanup(instrumentation.configure, False)
+        youtube = FakeYouTube([make_video_item("v0", "c0")])
+        youtube.channels = lambda: mock.Mock(list=lambda **kw: mock.Mock(execute=mock.Mock(side_effect=ValueError("boom"))))
+
+        with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: youtube)), \
+                self.assertLogs("trends.youtube_fetcher", "WARNING") as logs:
+            videos = fetch_trending_videos("US")
+
+        self.assertEqual(videos[0]["channel_subscribers"], 0)
+        self.assertIn("youtube channel statistics failed channels=1", logs.output[0])
+        self.assertEqual(
+            instrumentation.registry.counter_value("youtube_api_errors_total", endpoint="channels", status="ValueError"), 1,
+        )
+
+
+class YouTubeClientPoolTests(TestCase):
+    def test_clients_are_reused(self):
+        pool = YouTubeClientPool(max_size=2, factory=object)
+        with pool.client() as first:
+            pass
+        with pool.client() as second:
+            pass
+        self.assertIs(first, second)
+
+    def test_ssl_error_discards_client(self):
+        import ssl
+
+        pool = YouTubeClientPool(max_size=1, factory=object)
+        with self.assertRaises(ssl.SSLError):
+            with pool.client() as broken:
+                raise ssl.SSLError("bad record mac")
+        with pool.client() as fresh:
+            self.assertIsNot(fresh, broken)
+
+    def test_pool_is_bounded(self):
+        pool = YouTubeClientPool(max_size=1, factory=object, timeout=0.01)
+        pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+
+    def test_discard_wakes_a_waiter_to_build_a_client(self):
+        import threading
+
+        pool = YouTubeClientPool(max_size=1, factory=object, timeout=5)
+        broken = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+        pool.discard(broken)
+        waiter.join(timeout=1)
+
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(len(acquired), 1)
+        self.assertIsNot(acquired[0], broken)
+
+
+class TrendCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fresh_entry_served_without_fetch(self):
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=[{"id": "a"}]) as fetch:
+            trend_cache.get_trending_videos("US")
+            videos = trend_cache.get_trending_videos("US")
+        self.assertEqual([v["id"] for v in videos], ["a"])
+        self.assertEqual(fetch.call_count, 1)
+
+    @override_settings(TRENDS_CACHE_TTL=0)
+    def test_stale_entry_served_while_refreshing_once(self):
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=[{"id": "a"}]):
+            trend_cache.get_trending_videos("US")
+
+        with mock.patch("trends.trend_cache._start_refresh") as refresh:
+            first = trend_cache.get_trending_videos("US")
+            second = trend_cache.get_trending_videos("US")
+        self.assertEqual([v["id"] for v in first], ["a"])
+        self.assertEqual([v["id"] for v in second], ["a"])
+        # The lock held by the first refresh stops a second one
+        self.assertEqual(refresh.call_count, 1)
+
+    def test_failed_fetch_not_cached(self):
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=[]) as fetch:
+            trend_cache.get_trending_videos("US")
+            trend_cache.get_trending_videos("US")
+        self.assertEqual(fetch.call_count, 2)
+
+    @override_settings(TRENDS_PERSIST_SNAPSHOTS=False, TRENDS_CACHE_LOCK_TIMEOUT=0.2)
+    def test_waiters_never_fetch_without_the_lock(self):
+        lock_key = f"{trend_cache.cache_key('US', None, 20)}:lock"
+        cache.add(lock_key, 1)  # another worker's fetch is hanging
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=[{"id": "a"}]) as fetch:
+            self.assertEqual(trend_cache.get_trending_chart("US"), ([], None))
+            self.assertEqual(fetch.call_count, 0)
+
+            # That fetch fails and releases the lock: one waiter takes it and fetches
+            with mock.patch("trends.trend_cache.time.sleep", side_effect=lambda _: cache.delete(lock_key)):
+                videos, _ = trend_cache.get_trending_chart("US")
+        self.assertEqual([v["id"] for v in videos], ["a"])
+        self.assertEqual(fetch.call_count, 1)
+
+    @override_settings(TRENDS_PERSIST_SNAPSHOTS=False, TRENDS_FETCH_TIMEOUT=0.2)
+    def test_waiters_give_up_within_the_fetch_timeout(self):
+        import time
+
+        cache.add(f"{trend_cache.cache_key('US', None, 20)}:lock", 1)  # held for TRENDS_CACHE_LOCK_TIMEOUT (30s)
+        started = time.monotonic()
+        with mock.patch("trends.trend_cache.fetch_trending_videos") as fetch:
+            self.assertEqual(trend_cache.get_trending_chart("US"), ([], None))
+        self.assertLess(time.monotonic() - started, 5)
+        fetch.assert_not_called()
+
+
+class FetchEngineTests(TestCase):
+    def test_regions_fetched_concurrently(self):
+        import time
+
+        def slow_fetch(region, category, max_results):
+            time.sleep(0.2)
+            return [{"id": region}]
+
+        started = time.perf_counter()
+        results = fetch_engine.fetch_regions(
+            [("US", None), ("IN", None), ("GB", None), ("JP", None)], fetch=slow_fetch
+        )
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(results[("GB", None)], [{"id": "GB"}])
+        self.assertLess(elapsed, 0.6)
+
+    def test_timeout_and_errors_return_empty(self):
+        import time
+
+        def flaky_fetch(region, category, max_results):
+            if region == "US":
+                raise RuntimeError("quota")
+            time.sleep(0.5)
+            return [{"id": region}]
+
+        results = fetch_engine.fetch_regions([("US", None), ("IN", None)], timeout=0.05, fetch=flaky_fetch)
+        self.assertEqual(results, {("US", None): [], ("IN", None): []})
+
+    def test_compare_view_supports_many_countries(self):
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=[]):
+            response = self.client.get("/compare/?countries=US,IN,GB")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["code"] for row in response.context["comparisons"]], ["US", "IN", "GB"])
+
+    def test_compare_view_drops_unknown_countries(self):
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=[]) as fetch:
+            response = self.client.get("/compare/?countries=us,NOWHERE,gb,'; --&country1=XX")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["selected_countries"], "US,GB")
+        self.assertEqual(sorted(call.args[0] for call in fetch.call_args_list), ["GB", "US"])
+
+    def test_home_ignores_unknown_category(self):
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=[]) as fetch:
+            response = self.client.get("/?country=IN&category=not a category id")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["selected_category"])
+        self.assertEqual(fetch.call_args.args[:2], ("IN", None))
+
+
+class SnapshotIngestTests(TestCase):
+    def make_videos(self, views):
+        return [
+            {"id": f"v{i}", "title": f"Video {i}", "link": f"https://www.youtube.com/watch?v=v{i}",
+             "views": views, "likes": 10, "comments": 1, "categoryId": "24"}
+            for i in range(3)
+        ]
+
+    def test_upsert_keeps_one_row_per_video_and_history_per_snapshot(self):
+        save_snapshot(self.make_videos(100), "US")
+        save_snapshot(self.make_videos(250), "US")
+
+        self.assertEqual(Video.objects.count(), 3)
+        self.assertEqual(Video.objects.get(video_id="v0").views, 250)
+        self.assertEqual(TrendSnapshot.objects.count(), 2)
+        self.assertEqual(
+            list(SnapshotEntry.objects.filter(video__video_id="v0").order_by("snapshot_id").values_list("views", flat=True)),
+            [100, 250],
+        )
+
+    def test_load_latest_snapshot(self):
+        save_snapshot(self.make_videos(100), "US")
+        save_snapshot(self.make_videos(250), "US")
+        save_snapshot(self.make_videos(999), "IN")
+
+        videos, snapshot = load_snapshot_videos("US", max_results=2)
+        self.assertEqual([v["id"] for v in videos], ["v0", "v1"])
+        self.assertEqual(videos[0]["views"], 250)
+        self.assertEqual(snapshot.region, "US")
+        self.assertEqual(load_snapshot_videos("GB"), ([], None))
+
+
+class FetchTrendsCommandTests(TestCase):
+    @override_settings(YOUTUBE_API_KEY="test-key")
+    def test_once_stores_every_region_category_pair(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        def fake_fetch(region, category, max_results, fetch_stats=None):
+            fetch_stats.update({"api_calls": 2, "quota_units": 2})
+            return [{"id": f"{region}-{category}", "title": "t", "link": "https://youtu.be/x"}]
+
+        with mock.patch("trends.management.commands.fetch_trends.fetch_trending_videos", fake_fetch):
+            call_command("fetch_trends", "--once", "--regions=US,IN", "--categories=all,10", stdout=StringIO())
+
+        self.assertEqual(
+            set(TrendSnapshot.objects.values_list("region", "category")),
+            {("US", ""), ("US", "10"), ("IN", ""), ("IN", "10")},
+        )
+
+    @override_settings(YOUTUBE_API_KEY="test-key")
+    def test_quota_exceeded_exhausts_budget(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from .quota import QuotaBudget
+
+        def quota_fetch(region, category, max_results, fetch_stats=None):
+            reason = "quotaExceeded" if region == "US" else "forbidden"
+            fetch_stats.update({"api_calls": 1, "quota_units": 1, "error_status": 403, "error_reason": reason})
+            return []
+
+        cache.clear()
+        with mock.patch("trends.management.commands.fetch_trends.fetch_trending_videos", quota_fetch):
+            # A forbidden chart (bad key, region restriction) is only that chart's failure
+            call_command("fetch_trends", "--once", "--regions=IN", stdout=StringIO())
+            self.assertEqual(QuotaBudget("test-key").remaining(), QuotaBudget("test-key").daily_units)
+
+            call_command("fetch_trends", "--once", "--regions=US", stdout=StringIO())
+
+        self.assertEqual(QuotaBudget("test-key").remaining(), 0)
+        self.assertEqual(TrendSnapshot.objects.count(), 0)
+
+    def test_every_fetch_charges_the_configured_budget_cache(self):
+        from django.conf import settings
+
+        from . import youtube_fetcher
+        from .quota import QuotaBudget
+
+        cache.clear()
+        quota_cache = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "quota-test"}
+        youtube = FakeYouTube([make_video_item("v0", "c0")])
+        with override_settings(CACHES={**settings.CACHES, "quota": quota_cache}, YOUTUBE_QUOTA_CACHE_ALIAS="quota"), \
+                mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: youtube)):
+            fetch_trending_videos("US")
+            budget = QuotaBudget(youtube_fetcher.YOUTUBE_API_KEY)
+            self.assertEqual(budget.used(), 2)  # videos.list + channels.list, as a web request
+            self.assertFalse(budget.is_shared())
+        self.assertEqual(QuotaBudget(youtube_fetcher.YOUTUBE_API_KEY).used(), 0)  # not the default cache
+
+
+class MaterializedAnalysisTests(TestCase):
+    def test_materialized_matches_live_analysis(self):
+        snapshot = save_snapshot(make_chart_videos(), "IN")
+        materialize_snapshot(snapshot, max_results=20)
+
+        for level in ("", "high", "medium", "low", "bogus"):  # unknown levels mean no filter
+            live = analyze_chart(make_chart_videos(), "IN", level)
+            stored = load_chart_analysis(snapshot.pk, level, max_results=20)
+            self.assertEqual([v["id"] for v in stored["videos"]], [v["id"] for v in live["videos"]])
+            self.assertEqual(
+                [(v["engagement_score"], v["sentiment"]["label"]) for v in stored["videos"]],
+                [(v["engagement_score"], v["sentiment"]["label"]) for v in live["videos"]],
+            )
+            for field in ("keywords", "hashtags", "summary", "avg_engagement", "sentiment_counts", "total_videos"):
+                self.assertEqual(stored[field], live[field], field)
+
+    def test_missing_analysis_returns_none(self):
+        snapshot = save_snapshot(make_chart_videos(), "IN")
+        self.assertIsNone(load_chart_analysis(snapshot.pk))
+
+    def test_home_serves_materialized_analysis(self):
+        cache.clear()
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=make_chart_videos()):
+            response = self.client.get("/?country=IN&engagement=high")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([v["id"] for v in response.context["videos"]], ["v4", "v2"])
+        self.assertTrue(SnapshotAnalysis.objects.filter(region="IN").exists())
+
+
+class SentimentCacheTests(TestCase):
+    def test_cache_hit_applies_country_multiplier_after_lookup(self):
+        from .ai_analysis import sentiment_analyzer
+
+        cache_ = sentiment_analyzer.configure_sentiment_cache(maxsize=2)
+        text = "What an amazing, wonderful day"
+
+        us = sentiment_analyzer.analyze_sentiment(text, country="US")
+        kr = sentiment_analyzer.analyze_sentiment("What an  amazing,\nwonderful day", country="KR")
+
+        self.assertEqual(cache_.info()["misses"], 1)
+        self.assertEqual(cache_.info()["hits"], 1)
+        self.assertAlmostEqual(kr["score"], us["score"] * 0.90)
+        self.assertEqual(us["raw"], sentiment_analyzer.analyzer.polarity_scores(text))
+
+    def test_lru_evicts_oldest(self):
+        from .ai_analysis import sentiment_analyzer
+
+        cache_ = sentiment_analyzer.configure_sentiment_cache(maxsize=2)
+        for text in ("one", "two", "three"):
+            sentiment_analyzer.analyze_sentiment(text)
+        sentiment_analyzer.analyze_sentiment("one")
+
+        info = cache_.info()
+        self.assertEqual(info["evictions"], 2)
+        self.assertEqual(info["size"], 2)
+        self.assertEqual(info["misses"], 4)
+
+    def test_batch_matches_scalar(self):
+        from .ai_analysis import sentiment_analyzer
+        from .synthetic import synthetic_videos
+
+        texts = [f"{v['title']} {v['description']}" for v in synthetic_videos(40)]
+        texts += texts[:10] + [None, 42]
+        countries = ["US", "IN", "KR", None] * (len(texts) // 4) + ["JP"] * (len(texts) % 4)
+
+        sentiment_analyzer.configure_sentiment_cache(maxsize=1000)
+        expected = [sentiment_analyzer.analyze_sentiment(t, c) for t, c in zip(texts, countries)]
+
+        for min_parallel in (1000, 1):  # in-process, then on the process pool
+            sentiment_analyzer.configure_sentiment_cache(maxsize=1000)
+            batch = sentiment_analyzer.analyze_sentiment_batch(texts, countries, min_parallel=min_parallel)
+            self.assertEqual(batch, expected)
+
+    def test_broken_pool_is_dropped_and_batch_scored_in_process(self):
+        from concurrent.futures.process import BrokenProcessPool
+
+        from .ai_analysis import sentiment_analyzer
+
+        broken = mock.Mock(**{"map.side_effect": BrokenProcessPool("worker died")})
+        texts = [f"great video {i}" for i in range(5)]
+        sentiment_analyzer.configure_sentiment_cache(maxsize=100)
+        with mock.patch.object(sentiment_analyzer, "_pool", broken):
+            scores = sentiment_analyzer.polarity_scores_batch(texts, min_parallel=1)
+            self.assertIsNone(sentiment_analyzer._pool)
+        self.assertEqual(scores, [sentiment_analyzer.analyzer.polarity_scores(t) for t in texts])
+        broken.shutdown.assert_called_once()
+
+
+class TextPrepTests(TestCase):
+    def test_noise_stripped_and_tokens_bounded(self):
+        from .ai_analysis.text_prep import TextPrepConfig, clean_text, prepare_sentiment_text
+
+        description = "Loved it! https://example.com/x 00:00 Intro 12:34:56 #a #b #c\n" + "Great show. " * 500
+        self.assertEqual(clean_text("Watch https://x.co/y now 01:02 #one #two"), "Watch now")
+
+        for mode in ("head", "sample"):
+            text = prepare_sentiment_text("Title", description, TextPrepConfig(max_tokens=50, mode=mode))
+            self.assertTrue(text.startswith("Title "))
+            self.assertLessEqual(len(text.split()), 51)
+            self.assertNotIn("https://", text)
+
+    def test_disabled_keeps_full_text(self):
+        from .ai_analysis.text_prep import TextPrepConfig, prepare_sentiment_text
+
+        self.assertEqual(prepare_sentiment_text("T", "a https://x.co", TextPrepConfig(enabled=False)), "T a https://x.co")
+
+
+class SharedTokenizerTests(TestCase):
+    def test_analyzers_give_same_results_from_shared_tokens(self):
+        from .ai_analysis.hashtag_extractor import extract_hashtags
+        from .ai_analysis.keyword_analyzer import extract_keywords
+        from .ai_analysis.tokenizer import tokenize_videos
+        from .synthetic import synthetic_videos
+
+        videos = synthetic_videos(30)
+        for i, video in enumerate(videos):
+            video["engagement_score"] = i % 9
+            video["categoryName"] = "Music"
+        untagged = [dict(v, description=v["description"].replace("#", "")) for v in videos]
+
+        for chart in (videos, untagged):
+            tokens = tokenize_videos(chart)
+            titles = [v["title"] for v in chart]
+            self.assertEqual(extract_keywords(titles, tokens=tokens), extract_keywords(titles))
+            self.assertEqual(extract_hashtags(chart, tokens=tokens), extract_hashtags(chart))
+
+
+class WeightedHashtagTests(TestCase):
+    def videos(self):
+        return [
+            {"title": "Epic Football Match", "description": "stadium crowd", "engagement_score": 9,
+             "categoryName": "Sports"},
+            {"title": "football recap", "description": "", "engagement_score": 1,
+             "categoryName": "Sports"},
+        ]
+
+    def test_counts_are_weighted_by_engagement_and_category(self):
+        tags = dict(extract_hashtags(self.videos()))
+
+        # "football": 4 (engagement 9 // 2) + 1, plus 1 as a capitalized title term
+        self.assertEqual(tags["football"], 6)
+        self.assertEqual(tags["stadium"], 4)
+        self.assertEqual(tags["sports"], 6)  # 3 per video
+
+    def test_float_weights(self):
+        tags = dict(extract_hashtags(self.videos(), weight=lambda score: score / 4))
+
+        self.assertEqual(tags["stadium"], 2.25)
+        self.assertEqual(tags["football"], 3.5)
+
+
+class TermStreamTests(TestCase):
+    def store(self, titles, minutes_ago, region="US"):
+        videos = [
+            {"id": f"{region}{minutes_ago}-{i}", "title": title, "description": "#live",
+             "link": "https://www.youtube.com/watch?v=x", "views": 100}
+            for i, title in enumerate(titles)
+        ]
+        snapshot = save_snapshot(videos, region, fetched_at=timezone.now() - timedelta(minutes=minutes_ago))
+        materialize_snapshot(snapshot)
+        return snapshot
+
+    def test_windows_add_new_snapshots_and_drop_expired_ones(self):
+        old = self.store(["football final", "cricket final"], minutes_ago=50)
+        self.store(["football derby"], minutes_ago=10)
+
+        last_hour = trending_terms("US", window="1h")
+        self.assertEqual(last_hour["snapshots"], 2)
+        self.assertEqual(dict(last_hour["keywords"]), {"football": 2, "final": 2, "cricket": 1, "derby": 1})
+        self.assertEqual(last_hour["hashtags"], [("live", 3)])
+
+        # Twenty minutes later the first snapshot has left the hour but not the day
+        with mock.patch("trends.term_stream.timezone.now", return_value=old.fetched_at + timedelta(minutes=61)):
+            last_hour = trending_terms("US", window="1h")
+            last_day = trending_terms("US", window="24h")
+        self.assertEqual(last_hour["keywords"], [("football", 1), ("derby", 1)])
+        self.assertEqual(last_day["snapshots"], 2)
+
+    def test_totals_persist_and_match_a_full_recount(self):
+        self.store(["epic goal"], minutes_ago=30)
+        self.store(["epic save", "goal of the year"], minutes_ago=5)
+
+        reloaded = SlidingTermCounter.load("US", window="24h")  # fresh instance, state from the database
+        recounted = SlidingTermCounter.load("US", window="24h")
+        recounted.rebuild()
+        self.assertEqual(reloaded.keywords, recounted.keywords)
+        self.assertEqual(reloaded.hashtags, recounted.hashtags)
+        self.assertEqual(trending_terms("GB")["snapshots"], 0)
+
+
+class HeavyHitterSketchTests(TestCase):
+    def zipf_stream(self, n, seed):
+        import random
+        rng = random.Random(seed)
+        terms = [f"term{i}" for i in range(2000)]
+        weights = [1 / (rank + 1) for rank in range(len(terms))]
+        return rng.choices(terms, weights, k=n)
+
+    def assert_within_bounds(self, sketch, exact):
+        total = sum(exact.values())
+        self.assertEqual(sketch.total, total)
+        bound = total / sketch.capacity
+        for term, count in sketch.most_common():
+            self.assertGreaterEqual(count, exact[term])
+            self.assertLessEqual(count - exact[term], sketch.error(term))
+            self.assertLessEqual(sketch.error(term), bound)
+        # Every term above N / capacity is tracked
+        for term, count in exact.items():
+            if count > bound:
+                self.assertIn(term, sketch)
+
+    def test_counts_are_bounded_overestimates_of_exact_counts(self):
+        from collections import Counter
+
+        stream = self.zipf_stream(20000, seed=1)
+        sketch = SpaceSaving(capacity=100)
+        for term in stream:
+            sketch.add(term)
+        exact = Counter(stream)
+
+        self.assertEqual(len(sketch), 100)
+        self.assert_within_bounds(sketch, exact)
+        self.assertLessEqual(sketch.max_error, len(stream) / 100)
+        self.assertEqual([t for t, _ in sketch.most_common(5)], [t for t, _ in exact.most_common(5)])
+
+    def test_merged_sketches_match_combined_stream(self):
+        from collections import Counter
+
+        streams = [self.zipf_stream(8000, seed) for seed in (2, 3, 4)]
+        merged = SpaceSaving(capacity=80)
+        for stream in streams:
+            regional = SpaceSaving(capacity=80)
+            regional.update(Counter(stream))
+            merged.merge(SpaceSaving.from_dict(regional.to_dict()))
+        exact = Counter(term for stream in streams for term in stream)
+
+        self.assert_within_bounds(merged, exact)
+        self.assertEqual([t for t, _ in merged.most_common(3)], [t for t, _ in exact.most_common(3)])
+
+    def test_memory_budget_sets_capacity(self):
+        self.assertEqual(SpaceSaving.for_memory(256 * 1024).capacity, 1310)
+
+    def test_global_endpoint_merges_regions(self):
+        for region, title in (("US", "Football final"), ("GB", "Football derby"), ("IN", "Cricket final")):
+            snapshot = save_snapshot(
+                [{"id": region, "title": title, "description": "", "link": "https://youtu.be/x"}], region,
+            )
+            materialize_snapshot(snapshot)
+
+        data = self.client.get("/trending/everywhere/?top=2").json()
+
+        self.assertEqual(data["regions"], 3)
+        self.assertEqual(
+            [(k["term"], k["count"]) for k in data["keywords"]], [("football", 2), ("final", 2)],
+        )
+        self.assertEqual(data["keywords_max_error"], 0)
+
+
+class RisingTrendTests(TestCase):
+    def test_velocity_acceleration_and_zscore(self):
+        from .ai_analysis.trend_velocity import top_rising, trend_velocity
+
+        counts = [
+            [1, 1, 1, 1],  # flat
+            [0, 0, 1, 4],  # taking off
+            [5, 4, 3, 2],  # fading
+        ]
+        metrics = trend_velocity(counts, hours=[0, 1, 2, 4])
+
+        self.assertEqual(list(metrics["velocity"]), [0, 1.5, -0.5])
+        self.assertEqual(list(metrics["acceleration"]), [0, 0.5 / 1.5, 0.5 / 1.5])
+        self.assertAlmostEqual(metrics["zscore"][1], (4 - 1 / 3) / 1.0)
+        self.assertEqual([row["label"] for row in top_rising(["flat", "up", "down"], metrics)], ["up"])
+
+    def test_rising_keywords_and_videos_from_snapshot_history(self):
+        now = timezone.now()
+        charts = [
+            (3, [("a", "Morning news", 1000), ("b", "Football final", 500)]),
+            (2, [("a", "Morning news", 1100), ("b", "Football final", 900)]),
+            (1, [("a", "Morning news", 1200), ("b", "Football final", 2000), ("c", "Football derby", 50)]),
+        ]
+        for hours_ago, videos in charts:
+            snapshot = save_snapshot(
+                [{"id": vid, "title": title, "description": "", "link": "https://youtu.be/x", "views": views}
+                 for vid, title, views in videos],
+                "US", fetched_at=now - timedelta(hours=hours_ago),
+            )
+            materialize_snapshot(snapshot)
+
+        rising = rising_trends("US")
+
+        self.assertEqual(rising["snapshots"], 3)
+        self.assertEqual(rising["keywords"][0]["label"], "football")
+        self.assertEqual(rising["keywords"][0]["velocity"], 1)
+        self.assertEqual([v["label"] for v in rising["videos"]], ["b", "a"])  # "c" has no earlier views yet
+        self.assertEqual(rising["videos"][0]["velocity"], 1100)
+        self.assertEqual(rising["videos"][0]["acceleration"], 700)
+        self.assertEqual(rising_trends("GB")["keywords"], [])
+
+    def test_cached_rising_trends_recomputes_only_for_a_new_snapshot(self):
+        cache.clear()
+        now = timezone.now()
+
+        def ingest(hours_ago):
+            snapshot = save_snapshot(
+                [{"id": "a", "title": "Football final", "description": "", "link": "https://youtu.be/a",
+                  "views": 1000 * (4 - hours_ago)}],
+                "US", fetched_at=now - timedelta(hours=hours_ago),
+            )
+            materialize_snapshot(snapshot)
+
+        ingest(2)
+        with mock.patch("trends.rising.rising_trends", wraps=rising_trends) as computed:
+            first = cached_rising_trends("US")
+            self.assertEqual(cached_rising_trends("US"), first)
+            self.assertEqual(computed.call_count, 0)  # warmed when the snapshot was materialized
+
+            ingest(1)
+            self.assertEqual(computed.call_count, 1)
+            self.assertEqual(cached_rising_trends("US")["snapshots"], 2)
+            self.assertEqual(computed.call_count, 1)
+
+        self.assertEqual(cached_rising_trends("GB")["snapshots"], 0)
+
+
+class EngagementArrayTests(TestCase):
+    def test_array_matches_scalar_including_fallbacks(self):
+        import random
+
+        from .ai_analysis.engagement_calculator import calculate_engagement, calculate_engagement_array
+
+        rng = random.Random(7)
+        rows = [(0, 10, 1, 100), (1000, 0, 0, 500), (1000, 0, 0, 0), (1000, None, None, None), (None, 5, 5, 5)]
+        rows += [
+            (rng.randint(0, 10**9), rng.choice([0, rng.randint(0, 10**7)]),
+             rng.choice([0, rng.randint(0, 10**5)]), rng.choice([0, rng.randint(1, 10**8)]))
+            for _ in range(5000)
+        ]
+        views, likes, comments, subscribers = zip(*rows)
+
+        ratios = calculate_engagement_array(views, likes, comments, subscribers)
+
+        self.assertEqual(ratios.tolist(), [calculate_engagement(*row)["ratio"] for row in rows])
+
+    def test_ranking_and_buckets_match_sorted_filters(self):
+        from .ai_analysis.engagement_calculator import engagement_level_mask, rank_by_engagement
+
+        scores = [1.5, 5.0, 7.2, 2.0, 5.0, 0.0, 12.1]
+        buckets = {"high": lambda s: s > 5, "medium": lambda s: 2 <= s <= 5, "low": lambda s: s < 2, "": lambda s: True}
+        expected_order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+
+        self.assertEqual(rank_by_engagement(scores).tolist(), expected_order)
+        for level, in_level in buckets.items():
+            self.assertEqual(engagement_level_mask(scores, level).tolist(), [in_level(s) for s in scores])
+
+    def test_text_is_formatted_at_render_time(self):
+        from django.template import Context, Template
+
+        template = Template("{% load trends_filters %}{{ v.engagement_score|engagement_text:v.views }}")
+        self.assertEqual(template.render(Context({"v": {"engagement_score": 5.42, "views": 10}})), "5.42% Engagement")
+        self.assertEqual(template.render(Context({"v": {"engagement_score": 0.0, "views": 0}})), "0% Engagement")
+
+
+class VideoRecordTests(TestCase):
+    def api_items(self):
+        from .synthetic import synthetic_api_items, synthetic_videos
+        return synthetic_api_items(synthetic_videos(5))
+
+    def test_record_reads_like_the_old_video_dict(self):
+        from .benchmarks import _video_dict
+        from .video_records import VideoRecord
+
+        for item in self.api_items():
+            record = VideoRecord.from_api_item(item, {item["snippet"]["channelId"]: 42})
+            expected = _video_dict(item, {item["snippet"]["channelId"]: 42})
+            self.assertEqual(dict(record), expected)
+            self.assertEqual(record.get("sentiment", {}), {})
+
+            record["sentiment"] = {"label": "positive"}
+            record["rank"] = 1
+            self.assertEqual(record["sentiment"]["label"], "positive")
+            self.assertEqual(list(record)[-2:], ["sentiment", "rank"])
+
+    def test_batch_survives_the_cache_and_yields_fresh_records(self):
+        import pickle
+
+        from .video_records import VideoBatch, VideoRecord
+
+        records = [VideoRecord.from_api_item(item, {}) for item in self.api_items()]
+        batch = pickle.loads(pickle.dumps(VideoBatch.from_videos(records)))
+
+        self.assertEqual([dict(r) for r in batch.records()], [dict(r) for r in records])
+        self.assertEqual(batch.column("views").tolist(), [r["views"] for r in records])
+        batch.records()[0]["title"] = "changed"
+        self.assertEqual(batch[0]["title"], records[0]["title"])
+
+    def test_cached_records_analyse_like_dicts(self):
+        from .video_records import VideoBatch
+
+        videos = make_chart_videos()
+        cached = analyze_chart(VideoBatch.from_videos(videos).records(), "IN")
+        live = analyze_chart(videos, "IN")
+        for field in ("keywords", "hashtags", "sentiment_counts"):
+            self.assertEqual(cached[field], live[field], field)
+
+
+class ConditionalYouTube(FakeYouTube):
+    """FakeYouTube that tags responses with an ETag and answers 304 when it's sent back."""
+
+    def __init__(self, items, etag="v1"):
+        super().__init__(items)
+        self.etag = etag
+        self.not_modified = 0
+
+    def _request(self, body):
+        request = mock.Mock(headers={})
+
+        def execute():
+            if request.headers.get("If-None-Match") == self.etag:
+                import httplib2
+                from googleapiclient.errors import HttpError
+
+                self.not_modified += 1
+                raise HttpError(httplib2.Response({"status": 304}), b"")
+            return {"etag": self.etag, **body()}
+
+        request.execute = execute
+        return request
+
+    def videos(self):
+        return mock.Mock(list=lambda **kw: self._request(lambda: {"items": self.items}))
+
+    def channels(self):
+        def list_(**kw):
+            ids = kw["id"].split(",")
+            self.channel_requests.append(ids)
+            return self._request(lambda: {"items": [
+                {"id": cid, "statistics": {"subscriberCount": "100"}} for cid in ids
+            ]})
+        return mock.Mock(list=list_)
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def fetch(self, youtube):
+        fetch_stats = {}
+        with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: youtube)):
+            videos = fetch_trending_videos("US", fetch_stats=fetch_stats)
+        return videos, fetch_stats
+
+    def test_unchanged_chart_served_from_304(self):
+        youtube = ConditionalYouTube([make_video_item(f"v{i}", f"c{i}") for i in range(3)])
+        first, _ = self.fetch(youtube)
+        second, fetch_stats = self.fetch(youtube)
+
+        self.assertTrue(fetch_stats["not_modified"])
+        self.assertEqual(youtube.not_modified, 1)
+        self.assertEqual(len(youtube.channel_requests), 1)  # no channel lookups on a 304
+        self.assertEqual([dict(v) for v in second], [dict(v) for v in first])
+
+    def test_changed_chart_reports_delta(self):
+        youtube = ConditionalYouTube([make_video_item(f"v{i}", "c0") for i in range(3)])
+        self.fetch(youtube)
+
+        youtube.items = [make_video_item("v0", "c0", views=5000), make_video_item("v1", "c0"),
+                         make_video_item("v3", "c0")]
+        youtube.items[1]["snippet"]["title"] = "New title"
+        youtube.etag = "v2"
+        videos, fetch_stats = self.fetch(youtube)
+
+        self.assertNotIn("not_modified", fetch_stats)
+        self.assertEqual(fetch_stats["delta"], {
+            "added": ["v3"], "removed": ["v2"], "updated": ["v0"], "edited": ["v1"],
+        })
+        self.assertTrue(all(v["channel_subscribers"] == 100 for v in videos))
+
+    @override_settings(YOUTUBE_CONDITIONAL_REQUESTS=False)
+    def test_disabled(self):
+        youtube = ConditionalYouTube([make_video_item("v0", "c0")])
+        self.fetch(youtube)
+        _, fetch_stats = self.fetch(youtube)
+        self.assertEqual(youtube.not_modified, 0)
+        self.assertNotIn("delta", fetch_stats)
+
+    def test_materialize_only_scores_videos_whose_text_changed(self):
+        videos = make_chart_videos()
+        materialize_snapshot(save_snapshot(videos, "IN"))
+
+        videos[0]["title"] = "Terrible awful match"
+        # Stored but never analysed: a fetch delta against it would call v0 unchanged,
+        # while the sentiment to copy comes from the analysed snapshot's old title
+        save_snapshot(videos, "IN")
+        snapshot = save_snapshot(videos, "IN")
+        with mock.patch("trends.chart_analysis.analyze_video_sentiment_batch",
+                        wraps=chart_analysis.analyze_video_sentiment_batch) as batch:
+            materialize_snapshot(snapshot)
+
+        self.assertEqual(batch.call_args.args[0], ["Terrible awful match"])
+        labels = dict(snapshot.entries.values_list("video__video_id", "sentiment_label"))
+        self.assertEqual(labels["v0"], "negative")
+        self.assertEqual(labels["v1"], "positive")
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def paged(self, count, channels=7):
+        from .benchmarks import _PagedYouTube
+
+        items = [make_video_item(f"v{i}", f"c{i % channels}") for i in range(count)]
+        youtube = _PagedYouTube(items, latency_ms=0)
+        youtube.calls = []
+        videos_list = youtube.videos().list
+        channels_list = youtube.channels().list
+
+        def list_videos(**kw):
+            youtube.calls.append(("videos", kw["maxResults"], kw.get("pageToken")))
+            return videos_list(**kw)
+
+        def list_channels(**kw):
+            youtube.calls.append(("channels", kw["id"].count(",") + 1, None))
+            return channels_list(**kw)
+
+        youtube.videos = lambda: mock.Mock(list=list_videos)
+        youtube.channels = lambda: mock.Mock(list=list_channels)
+        return youtube
+
+    def test_follows_page_tokens_up_to_limit(self):
+        youtube = self.paged(250)
+        fetch_stats = {}
+        with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: youtube)):
+            videos = fetch_trending_videos("US", max_results=120, fetch_stats=fetch_stats)
+            everything = fetch_trending_videos("US", max_results=1000)
+
+        self.assertEqual([v["id"] for v in videos], [f"v{i}" for i in range(120)])
+        self.assertEqual(len(everything), 200)  # a chart has at most 200 videos
+        video_pages = [(size, token) for kind, size, token in youtube.calls[:4] if kind == "videos"]
+        self.assertEqual(video_pages, [(50, None), (50, "50"), (20, "100")])
+        # The 7 channels are all seen on the first page, so later pages look up none
+        self.assertEqual(fetch_stats["channel_calls"], 1)
+        self.assertEqual(fetch_stats["pages"], 3)
+
+    def test_generator_yields_each_page_as_it_arrives(self):
+        from .youtube_fetcher import iter_trending_videos
+
+        youtube = self.paged(100)
+        with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: youtube)):
+            stream = iter_trending_videos("US", limit=100)
+            first = next(stream)
+            self.assertEqual(first["id"], "v0")
+            self.assertEqual([kind for kind, _, _ in youtube.calls], ["videos", "channels"])
+            rest = list(stream)
+
+        self.assertEqual(len(rest), 99)
+        self.assertEqual(sum(kind == "videos" for kind, _, _ in youtube.calls), 2)
+
+    def test_stream_analysis_matches_list_analysis(self):
+        from .chart_analysis import enrich_videos, iter_enriched_videos
+
+        videos = make_chart_videos() * 3
+        expected = [dict(v) for v in videos]
+        enrich_videos(expected, "IN")
+        streamed = [video for video, _ in iter_enriched_videos(iter([dict(v) for v in videos]), "IN", batch_size=4)]
+        self.assertEqual(
+            [(v["engagement_score"], v["sentiment"]) for v in streamed],
+            [(v["engagement_score"], v["sentiment"]) for v in expected],
+        )
+
+
+class FakeYouTubeServerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_and_etags(self):
+        import json
+
+        from .fake_youtube import FakeYouTubeAPI
+
+        api = FakeYouTubeAPI(chart_size=120)
+        status, headers, body = api.handle("/youtube/v3/videos", {"regionCode": "IN", "maxResults": "50", "pageToken": "100"})
+        page = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(page["items"]), 20)
+        self.assertNotIn("nextPageToken", page)
+
+        status, _, body = api.handle("/youtube/v3/videos", {"regionCode": "IN", "maxResults": "50", "pageToken": "100"},
+                                     {"If-None-Match": headers["ETag"]})
+        self.assertEqual((status, body), (304, b""))
+
+    def test_quota_and_injected_errors(self):
+        import json
+
+        from .fake_youtube import FakeYouTubeAPI
+
+        api = FakeYouTubeAPI(quota=2)
+        statuses = [api.handle("/youtube/v3/channels", {"id": "UC1"})[0] for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 403])
+        body = json.loads(api.handle("/youtube/v3/channels", {"id": "UC1"})[2])
+        self.assertEqual(body["error"]["errors"][0]["reason"], "quotaExceeded")
+
+        flaky = FakeYouTubeAPI(error_rate=0.5, seed=1)
+        statuses = {flaky.handle("/youtube/v3/videos", {})[0] for _ in range(50)}
+        self.assertEqual(statuses, {200, 500})
+
+    def test_fetcher_pointed_at_fake_server(self):
+        from .fake_youtube import FakeYouTubeAPI, serve_in_thread
+
+        api = FakeYouTubeAPI()
+        with serve_in_thread(api) as endpoint, override_settings(YOUTUBE_API_ENDPOINT=endpoint):
+            with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool()):
+                fetch_stats = {}
+                videos = fetch_trending_videos("GB", max_results=60, fetch_stats=fetch_stats)
+                api.quota = api.units_used  # quota now spent
+                throttled = {}
+                fetch_trending_videos("GB", max_results=60, fetch_stats=throttled)
+
+        self.assertEqual(len(videos), 60)
+        self.assertEqual(videos[0]["id"], api.chart("GB")[0]["id"])
+        self.assertTrue(all(v["channel_subscribers"] == api.subscribers(v["channelId"]) for v in videos))
+        self.assertEqual(api.units_used, fetch_stats["quota_units"])
+        self.assertEqual((throttled["error_status"], throttled["error_reason"]), (403, "quotaExceeded"))
+
+
+class EndToEndBenchmarkTests(TestCase):
+    def test_views_timed_per_stage_cold_and_warm(self):
+        from .benchmarks import bench_e2e
+
+        # The test database is already migrated; compare (sizes) persists from
+        # pool threads, which the in-memory test database can't take alongside a TestCase
+        rows = bench_e2e(sizes=(), repeat=1, scratch_db=False)
+        stages = {}
+        for row in rows:
+            stages.setdefault((row["path"], row["cache"]), []).append(row["stage"])
+
+        self.assertEqual(list(stages), [("home", "cold"), ("home", "warm")])
+        # A miss fetches, persists and materializes (warming rising trends); a hit
+        # reads the stored analysis and the cached rising trends
+        self.assertTrue({"youtube", "sentiment", "stored_analysis", "rising", "render"} <= set(stages["home", "cold"]))
+        self.assertEqual(stages["home", "warm"], ["total", "chart", "stored_analysis", "render"])
+        self.assertTrue(all(row["peak_kib"] > 0 for row in rows if row["stage"] == "total"))
+
+    def test_pipeline_stages_timed_with_peak_memory_per_chart_size(self):
+        from .benchmarks import PIPELINE_STAGES, baseline_entries, bench_pipeline
+
+        rows = bench_pipeline(sizes=(20, 40), repeat=1)
+        self.assertEqual(
+            [(row["videos"], row["stage"]) for row in rows],
+            [(size, stage) for size in (20, 40) for stage in ("total", *PIPELINE_STAGES)],
+        )
+        self.assertTrue(all(row["p50_ms"] > 0 and row["peak_kib"] > 0 for row in rows))
+        peaks = {row["videos"]: row["peak_kib"] for row in rows if row["stage"] == "total"}
+        self.assertGreater(peaks[40], peaks[20])
+        # Every row is gated against the baseline
+        self.assertEqual(len(baseline_entries("pipeline", rows)), len(rows))
+        self.assertIn("40 | sentiment", baseline_entries("pipeline", rows))
+
+    def test_load_suite_runs_every_mode(self):
+        from .benchmarks import LOAD_PATHS, bench_load
+
+        # The test database is already migrated
+        rows = bench_load(sizes=(2,), latency_ms=0, requests_per_client=1, scratch_db=False)
+        self.assertEqual(
+            [(row["path"], row["mode"]) for row in rows],
+            [(path, mode) for path in LOAD_PATHS for mode in ("wsgi", "asgi-sync", "asgi-async")],
+        )
+        self.assertEqual(sum(row["errors"] for row in rows), 0)
+
+    def test_regressions_beyond_tolerance_and_slack(self):
+        from .benchmarks import baseline_entries, find_regressions
+
+        rows = [{"path": "home", "scale": "1 region", "cache": "cold", "stage": s, "p50_ms": ms, "p95_ms": 0, "peak_kib": 10}
+                for s, ms in (("fetch", 100.0), ("render", 1.0))]
+        baseline = baseline_entries("e2e", rows)
+        slower = [dict(rows[0], p50_ms=200.0), dict(rows[1], p50_ms=3.0), dict(rows[0], scale="new")]
+
+        regressions = find_regressions("e2e", slower, baseline, tolerance=0.5)
+        # render tripled but by under the 5 ms slack; the unknown row is skipped
+        self.assertEqual([(r["row"], r["metric"]) for r in regressions], [("home | 1 region | cold | fetch", "p50_ms")])
+        self.assertEqual(find_regressions("e2e", rows, baseline), [])
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        from . import instrumentation
+
+        cache.clear()
+        instrumentation.registry.reset()
+        instrumentation.configure(True)
+        self.addCleanup(instrumentation.configure, False)
+
+    def test_server_timing_and_structured_log(self):
+        videos = make_chart_videos()
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=videos), \
+                override_settings(TRENDS_PERSIST_SNAPSHOTS=False), \
+                self.assertLogs("trends.requests", "INFO") as logs:
+            response = self.client.get("/?country=IN")
+
+        stages = [part.split(";")[0] for part in response["Server-Timing"].split(", ")]
+        for name in ("chart", "tokenize", "sentiment", "engagement", "summary", "render", "total"):
+            self.assertIn(name, stages)
+        record = logs.records[-1]
+        self.assertEqual((record.view, record.status), ("trends:home", 200))
+        self.assertIn("render", record.stages)
+
+    def test_metrics_endpoint_counts_api_calls(self):
+        from .instrumentation import configure
+
+        items = [make_video_item(f"v{i}", f"c{i}") for i in range(3)]
+        with mock.patch("trends.youtube_fetcher.client_pool", YouTubeClientPool(factory=lambda: FakeYouTube(items))):
+            fetch_trending_videos("US")
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('youtube_api_calls_total{endpoint="videos"} 1', body)
+        self.assertIn('youtube_api_calls_total{endpoint="channels"} 1', body)
+        self.assertIn("youtube_quota_units_total 2", body)
+        self.assertIn('trends_stage_duration_seconds_count{stage="youtube"} 1', body)
+
+        configure(False)
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+        self.assertNotIn("Server-Timing", self.client.get("/metrics"))
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def get_home(self, client=None, **headers):
+        from django.test import Client
+
+        videos = make_chart_videos()
+        with mock.patch("trends.trend_cache.fetch_trending_videos", return_value=videos), \
+                override_settings(TRENDS_PERSIST_SNAPSHOTS=False):
+            return (client or Client()).get("/?country=IN", **headers)  # new client: middleware reloaded
+
+    def test_sampled_request_profiled_and_reported(self):
+        import io
+
+        from django.core.management import call_command
+
+        with override_settings(TRENDS_PROFILE_SAMPLE_RATE=1.0, TRENDS_PROFILE_DIR=self.directory):
+            response = self.get_home()
+            self.get_home()
+        self.assertTrue(response["X-Trends-Profile"].startswith("trends.home-"))
+
+        out = io.StringIO()
+        call_command("profile_report", self.directory, "--view", "trends:home", "--sort", "cumtime",
+                     "--match", "ai_analysis", stdout=out)
+        report = out.getvalue()
+        self.assertIn("2 profiles", report)
+        self.assertIn("hashtag_extractor.py", report)
+
+    def test_header_token_and_disabled(self):
+        import os
+
+        with override_settings(TRENDS_PROFILE_TOKEN="secret", TRENDS_PROFILE_DIR=self.directory):
+            self.assertNotIn("X-Trends-Profile", self.get_home())
+            self.assertNotIn("X-Trends-Profile", self.get_home(HTTP_X_TRENDS_PROFILE="wrong"))
+            self.assertIn("X-Trends-Profile", self.get_home(HTTP_X_TRENDS_PROFILE="secret"))
+        with override_settings(TRENDS_PROFILE_DIR=self.directory):
+            self.assertNotIn("X-Trends-Profile", self.get_home(HTTP_X_TRENDS_PROFILE="secret"))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_failing_profiled_view_still_reaches_exception_middleware(self):
+        from django.test import Client
+
+        from . import instrumentation
+
+        instrumentation.registry.reset()
+        instrumentation.configure(True)
+        self.addCleanup(instrumentation.configure, False)
+        with override_settings(TRENDS_PROFILE_SAMPLE_RATE=1.0, TRENDS_PROFILE_DIR=self.directory), \
+                mock.patch("trends.views.cached_rising_trends", side_effect=RuntimeError("boom")), \
+                self.assertLogs("trends.requests", "ERROR"):
+            response = self.get_home(client=Client(raise_request_exception=False))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(
+            instrumentation.registry.counter_value("trends_request_errors_total", view="trends:home", error="RuntimeError"), 1,
+        )
+        # The profiler was stopped and released: the next request is profiled
+        with override_settings(TRENDS_PROFILE_SAMPLE_RATE=1.0, TRENDS_PROFILE_DIR=self.directory):
+            self.assertIn("X-Trends-Profile", self.get_home())
+
+
+class JSONAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.snapshot = save_snapshot(make_chart_videos(), "IN")
+        materialize_snapshot(self.snapshot)
+        # The API must never reach YouTube
+        patcher = mock.patch("trends.trend_cache.fetch_trending_videos", side_effect=AssertionError("API called"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.get("Content-Encoding") == "gzip":
+            import gzip
+            import json
+
+            return response, json.loads(gzip.decompress(response.content))
+        return response, response.json() if response.status_code == 200 else None
+
+    def test_fields_and_cursor_pagination(self):
+        from urllib.parse import urlsplit
+
+        expected = [v["id"] for v in load_chart_analysis(self.snapshot.pk)["videos"]]
+        ids, url = [], "/api/trending/?country=IN&fields=id,views,sentiment&page_size=2"
+        while url:
+            response, data = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(data["snapshot"], self.snapshot.pk)
+            self.assertTrue(all(set(v) == {"id", "views", "sentiment"} for v in data["results"]))
+            ids.extend(v["id"] for v in data["results"])
+            url = data["next"] and "{0.path}?{0.query}".format(urlsplit(data["next"]))
+        self.assertEqual(ids, expected)
+
+        _, data = self.get("/api/trending/?country=IN")
+        self.assertNotIn("description", data["results"][0])  # detail field, only on request
+        self.assertIn("engagement_score", data["results"][0])
+        response, _ = self.get("/api/trending/?country=IN&fields=id,nope")
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pins_snapshot(self):
+        from urllib.parse import urlsplit
+
+        _, first = self.get("/api/trending/?country=IN&page_size=2&fields=id")
+        newer = save_snapshot([{**v, "id": f"n{v['id']}"} for v in make_chart_videos()], "IN")
+        materialize_snapshot(newer)
+        cache.clear()
+
+        _, second = self.get("{0.path}?{0.query}".format(urlsplit(first["next"])))
+        self.assertEqual(second["snapshot"], self.snapshot.pk)
+        self.assertFalse(any(v["id"].startswith("n") for v in second["results"]))
+        _, fresh = self.get("/api/trending/?country=IN&fields=id")
+        self.assertEqual(fresh["snapshot"], newer.pk)
+
+    def test_cursor_only_pages_its_own_chart(self):
+        from urllib.parse import urlsplit
+
+        _, first = self.get("/api/trending/?country=IN&page_size=2&fields=id")
+        cursor = "{0.query}".format(urlsplit(first["next"]))
+        self.assertEqual(self.client.get(f"/api/trending/?{cursor}").status_code, 200)
+
+        replayed = cursor.replace("country=IN", "country=US")
+        self.assertEqual(self.client.get(f"/api/trending/?{replayed}").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/trending/?{cursor}&category=17").status_code, 404)
+
+    def test_etag_and_compression(self):
+        response, data = self.get("/api/trending/?country=IN", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(data["results"]), 5)
+
+        etag = response["ETag"]
+        with mock.patch("trends.api.load_chart_analysis") as load:
+            not_modified = self.client.get("/api/trending/?country=IN", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        load.assert_not_called()
+        changed = self.client.get("/api/trending/?country=IN&fields=id", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotIn("Content-Encoding", changed)
+
+    def test_compare_and_keywords(self):
+        _, data = self.get("/api/compare/?countries=IN,US&fields=code,total_videos,videos&video_fields=id")
+        self.assertEqual([c["code"] for c in data["results"]], ["IN", "US"])
+        self.assertEqual(data["results"][0]["total_videos"], 5)
+        self.assertEqual(set(data["results"][0]["videos"][0]), {"id"})
+        self.assertEqual(data["results"][1]["videos"], [])  # nothing stored for US
+
+        _, data = self.get("/api/keywords/?country=IN&kind=hashtags")
+        self.assertEqual(data["results"][0]["term"], "goal")
+        # Weighted hashtag counts are floats and must not be truncated
+        rows = TermSerializer(term_rows([("goal", 2.75), ("match", 3)]), many=True).data
+        self.assertEqual([row["count"] for row in rows], [2.75, 3])
+        response, _ = self.get("/api/keywords/?country=IN&kind=nope")
+        self.assertEqual(response.status_code, 400)
+
+    def test_unlisted_country_and_category_rejected(self):
+        for url in ("/api/trending/?country=ZZ", "/api/trending/?country=IN&category=9999",
+                    "/api/keywords/?country=../x", "/api/compare/?countries=IN,ZZ"):
+            response, _ = self.get(url)
+            self.assertEqual(response.status_code, 400, url)
+        response, _ = self.get("/api/trending/?country=in&category=17")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(TRENDS_PERSIST_SNAPSHOTS=False)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch(
+            "trends.trend_cache.fetch_trending_videos",
+            side_effect=lambda country, *args, **kwargs: make_chart_videos(),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_async_views_render_like_sync_views(self):
+        from django.test import AsyncClient
+
+        from .benchmarks import url_conf
+
+        sync_home = await sync_to_async(self.client.get)("/?country=IN&engagement=high")
+        sync_compare = await sync_to_async(self.client.get)("/compare/?countries=US,IN,GB")
+        with override_settings(ROOT_URLCONF=url_conf(async_views=True)):
+            home = await AsyncClient().get("/?country=IN&engagement=high")
+            compare = await AsyncClient().get("/compare/?countries=US,IN,GB")
+
+        self.assertEqual(home.status_code, 200)
+        self.assertEqual(
+            [v["id"] for v in home.context["videos"]], [v["id"] for v in sync_home.context["videos"]],
+        )
+        self.assertEqual(home.context["keywords"], sync_home.context["keywords"])
+        self.assertEqual(compare.status_code, 200)
+        self.assertEqual(
+            [(row["code"], row["data"]["total_videos"]) for row in compare.context["comparisons"]],
+            [(row["code"], row["data"]["total_videos"]) for row in sync_compare.context["comparisons"]],
+        )
+
+    async def test_stage_timings_cross_the_async_pools(self):
+        from django.test import AsyncClient
+
+        from . import instrumentation
+        from .benchmarks import url_conf
+
+        instrumentation.configure(True)
+        self.addCleanup(instrumentation.configure, False)
+        with override_settings(ROOT_URLCONF=url_conf(async_views=True)):
+            response = await AsyncClient().get("/?country=IN")
+
+        stages = [part.split(";")[0] for part in response["Server-Timing"].split(", ")]
+        for name in ("chart", "tokenize", "sentiment", "render", "total"):
+            self.assertIn(name, stages)
+
+    async def test_afetch_regions_concurrent_with_deadline(self):
+        import time
+
+        def fetch(region, category, max_results):
+            if region == "US":
+                raise RuntimeError("quota")
+            time.sleep(0.5 if region == "JP" else 0.1)
+            return [{"id": region}]
+
+        started = time.perf_counter()
+        results = await fetch_engine.afetch_regions(
+            [("US", None), ("IN", None), ("GB", None), ("JP", None)], timeout=0.3, fetch=fetch,
+        )
+        self.assertLess(time.perf_counter() - started, 0.45)
+        self.assertEqual(results, {
+            ("US", None): [], ("IN", None): [{"id": "IN"}], ("GB", None): [{"id": "GB"}], ("JP", None): [],
+        })
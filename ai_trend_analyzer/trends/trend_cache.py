@@ -0,0 +1,209 @@
+"""
+TTL + stale-while-revalidate cache around fetch_trending_videos.
+
+Entries are keyed on (country, category, max_results) and stored in the
+Django cache as a columnar VideoBatch together with the time they were
+fetched. A fresh entry is served as-is; a stale one is served
+immediately while a single background thread refreshes it. A
+short-lived lock key (cache.add is atomic) makes sure only one worker
+fetches a given key at a time.
+
+On a miss, a stored snapshot younger than the TTL is served before going
+to the API, and every successful API fetch is saved as a new snapshot
+(TRENDS_PERSIST_SNAPSHOTS). With TRENDS_SERVE_FROM_DB the API is never
+called here at all; the fetch_trends ingest worker keeps snapshots current.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .chart_analysis import materialize_snapshot
+from .instrumentation import instrumented
+from .ingest import load_snapshot_videos, save_snapshot
+from .video_records import VideoBatch
+from .youtube_fetcher import fetch_trending_videos
+
+logger = logging.getLogger(__name__)
+
+
+def _cache():
+    return caches[getattr(settings, "TRENDS_CACHE_ALIAS", "default")]
+
+
+def _ttl():
+    return getattr(settings, "TRENDS_CACHE_TTL", 300)
+
+
+def _stale_ttl():
+    return getattr(settings, "TRENDS_CACHE_STALE_TTL", 3600)
+
+
+def _lock_timeout():
+    return getattr(settings, "TRENDS_CACHE_LOCK_TIMEOUT", 30)
+
+
+def _wait_timeout():
+    # A waiter runs on a fetch-pool worker: never hold it past the request's own
+    # fetch timeout, or it outlives the fetch_regions deadline it is serving
+    return min(_lock_timeout(), getattr(settings, "TRENDS_FETCH_TIMEOUT", 15))
+
+
+def cache_key(country, category, max_results):
+    return f"trending:{country}:{category or 'all'}:{max_results}"
+
+
+def _store(key, videos, fetched_at=None, snapshot_id=None):
+    # Columnar VideoBatch: far smaller per cached chart than a list of dicts
+    entry = {"videos": VideoBatch.from_videos(videos), "fetched_at": fetched_at or time.time(), "snapshot_id": snapshot_id}
+    # Keep the entry around past its TTL so it can be served while stale
+    _cache().set(key, entry, timeout=_ttl() + _stale_ttl())
+    return entry
+
+
+def _cached_chart(entry):
+    """(videos, snapshot_id) of a cache entry, as fresh VideoRecords."""
+    return entry["videos"].records(), entry.get("snapshot_id")
+
+
+def _fetch_and_store(key, country, category, max_results):
+    """
+    Fetch under the stampede lock; empty (failed) fetches are not cached.
+    Returns (videos, snapshot_id).
+    """
+    try:
+        previous = _cache().get(key)
+        fetch_stats = {}
+        videos = fetch_trending_videos(country, category, max_results, fetch_stats=fetch_stats)
+        snapshot_id = None
+        if videos and fetch_stats.get("not_modified") and previous is not None and previous.get("snapshot_id"):
+            # 304: same chart as the stored snapshot, nothing to save or analyse again
+            snapshot_id = previous["snapshot_id"]
+        elif videos and getattr(settings, "TRENDS_PERSIST_SNAPSHOTS", True):
+            try:
+                snapshot = save_snapshot(videos, country, category)
+                if snapshot is not None:
+                    snapshot_id = snapshot.pk
+                    materialize_snapshot(snapshot)
+            except Exception:
+                logger.exception("trend cache snapshot save failed country=%s category=%s", country, category)
+        if videos:
+            _store(key, videos, snapshot_id=snapshot_id)
+        return videos, snapshot_id
+    finally:
+        _cache().delete(f"{key}:lock")
+
+
+def _refresh(key, country, category, max_results):
+    try:
+        _fetch_and_store(key, country, category, max_results)
+    finally:
+        close_old_connections()  # this thread's DB connection
+
+
+def _start_refresh(key, country, category, max_results):
+    thread = threading.Thread(
+        target=_refresh,
+        args=(key, country, category, max_results),
+        name=f"refresh-{key}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _load_fresh_snapshot(key, country, category, max_results):
+    """Warm the cache from a stored snapshot that is still within the TTL."""
+    try:
+        videos, snapshot = load_snapshot_videos(country, category, max_results=max_results)
+    except Exception:
+        logger.exception("trend cache snapshot load failed country=%s category=%s", country, category)
+        return None
+    if not videos or (timezone.now() - snapshot.fetched_at).total_seconds() >= _ttl():
+        return None
+    _store(key, videos, fetched_at=snapshot.fetched_at.timestamp(), snapshot_id=snapshot.pk)
+    return videos, snapshot.pk
+
+
+def _serve_from_snapshots(key, country, category, max_results):
+    """Latest stored snapshot, whatever its age, cached for one TTL."""
+    entry = _cache().get(key)
+    if entry is not None and time.time() - entry["fetched_at"] < _ttl():
+        return _cached_chart(entry)
+    try:
+        videos, snapshot = load_snapshot_videos(country, category, max_results=max_results)
+    except Exception:
+        logger.exception("trend cache snapshot load failed country=%s category=%s", country, category)
+        return _cached_chart(entry) if entry is not None else ([], None)
+    if not videos:
+        return [], None
+    _store(key, videos, snapshot_id=snapshot.pk)
+    return videos, snapshot.pk
+
+
+@instrumented("chart")
+def get_trending_chart(country="US", category=None, max_results=20):
+    """
+    Cached drop-in for fetch_trending_videos that also returns the ID of the
+    stored snapshot the videos came from (None if they were never stored).
+    Fresh hit → cached list. Stale hit → cached list now, refresh in the
+    background. Miss → fresh stored snapshot, else fetch (or wait for the
+    worker already fetching, at most TRENDS_FETCH_TIMEOUT; ([], None) if it
+    doesn't finish in time).
+    """
+    cache = _cache()
+    key = cache_key(country, category, max_results)
+    lock_key = f"{key}:lock"
+
+    if getattr(settings, "TRENDS_SERVE_FROM_DB", False):
+        return _serve_from_snapshots(key, country, category, max_results)
+
+    entry = cache.get(key)
+
+    if entry is not None:
+        age = time.time() - entry["fetched_at"]
+        if age >= _ttl() and cache.add(lock_key, 1, timeout=_lock_timeout()):
+            logger.info("trend cache stale key=%s age=%.0fs, refreshing", key, age)
+            _start_refresh(key, country, category, max_results)
+        return _cached_chart(entry)
+
+    loaded = _load_fresh_snapshot(key, country, category, max_results)
+    if loaded is not None:
+        return loaded
+
+    if cache.add(lock_key, 1, timeout=_lock_timeout()):
+        return _fetch_and_store(key, country, category, max_results)
+
+    # Another worker is fetching this key; wait for its result
+    deadline = time.monotonic() + _wait_timeout()
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return _cached_chart(entry)
+        if cache.add(lock_key, 1, timeout=_lock_timeout()):
+            # That fetch failed; retry under the lock so only one waiter calls the API
+            return _fetch_and_store(key, country, category, max_results)
+
+    # Never fetch without the lock: during an outage that would send every waiter to the API
+    logger.warning("trend cache gave up waiting for key=%s", key)
+    return [], None
+
+
+def get_stored_chart(country="US", category=None, max_results=20):
+    """
+    (videos, snapshot_id) from the cache or the latest stored snapshot,
+    whatever TRENDS_SERVE_FROM_DB says; never calls the API. ([], None)
+    when nothing has been fetched for the chart yet.
+    """
+    return _serve_from_snapshots(cache_key(country, category, max_results), country, category, max_results)
+
+
+def get_trending_videos(country="US", category=None, max_results=20):
+    """Cached drop-in for fetch_trending_videos (see get_trending_chart)."""
+    videos, _ = get_trending_chart(country, category, max_results)
+    return videos
@@ -1,11 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'trends'
 
-urlpatterns = [
-    path('', views.home, name='home'),  # root page (trending videos)
-    path('login/', views.login_page, name='login'),
-    path('dashboard/', views.optional_dashboard, name='dashboard'),
-    path('compare/', views.compare_trends, name='compare'),  # country comparison
-]
+
+def trend_urlpatterns(async_views=False):
+    """The app's routes; async_views serves home/compare from the async views (for ASGI)."""
+    return [
+        path('', views.home_async if async_views else views.home, name='home'),  # root page (trending videos)
+        path('login/', views.login_page, name='login'),
+        path('dashboard/', views.optional_dashboard, name='dashboard'),
+        path('compare/', views.compare_trends_async if async_views else views.compare_trends,
+             name='compare'),  # country comparison
+        path('trending/everywhere/', views.trending_everywhere, name='trending_everywhere'),  # global top terms (JSON)
+        path('metrics', views.metrics, name='metrics'),  # Prometheus scrape target (TRENDS_INSTRUMENTATION)
+        # Read-only JSON API, served from stored/cached analysis
+        path('api/trending/', api.TrendingAPIView.as_view(), name='api_trending'),
+        path('api/compare/', api.CompareAPIView.as_view(), name='api_compare'),
+        path('api/keywords/', api.KeywordsAPIView.as_view(), name='api_keywords'),
+    ]
+
+
+urlpatterns = trend_urlpatterns(getattr(settings, 'TRENDS_ASYNC_VIEWS', False))
@@ -0,0 +1,271 @@
+"""
+Compact in-memory representations of fetched videos.
+
+VideoRecord is a __slots__ object that behaves like the dicts the rest of
+the app (and the templates) already use: video["title"], video.get(...)
+and video["sentiment"] = ... all work. Aliases such as "videoId" share a
+slot and "link" is derived from the id, so no per-video dict or
+duplicated values are kept.
+
+VideoBatch stores a whole chart column by column (a tuple per text
+field, one int64 array for the counters). It is what the trend cache
+keeps for each chart; records are rebuilt from it when a chart is read.
+When pickled (i.e. when stored in a cache) its text columns are
+zlib-compressed, as descriptions make up most of a chart's size.
+"""
+import pickle
+import zlib
+from collections.abc import MutableMapping
+
+import numpy as np
+
+# Dict key → slot, in the order fetch_trending_videos has always used
+FIELD_SLOTS = {
+    "id": "id",
+    "videoId": "id",
+    "title": "title",
+    "description": "description",
+    "channel": "channel",
+    "thumbnail": "thumbnail",
+    "views": "views",
+    "likes": "likes",
+    "comments": "comments",
+    "link": None,  # derived from id
+    "channel_subscribers": "channel_subscribers",
+    "channelId": "channel_id",
+    "categoryId": "category_id",
+    "publishedAt": "published_at",
+}
+
+# Added by the analysis pipeline; absent until set
+ANALYSIS_SLOTS = {
+    "categoryName": "category_name",
+    "sentiment": "sentiment",
+    "engagement_score": "engagement_score",
+}
+
+WATCH_URL = "https://www.youtube.com/watch?v={}"
+
+
+class VideoRecord(MutableMapping):
+    """One video, as a dict-compatible object with fixed slots."""
+
+    __slots__ = (
+        "id", "title", "description", "channel", "thumbnail", "views", "likes", "comments",
+        "channel_subscribers", "channel_id", "category_id", "published_at",
+        "category_name", "sentiment", "engagement_score", "extra",
+    )
+
+    def __init__(self, id, title="", description="", channel="", thumbnail="", views=0, likes=0,
+                 comments=0, channel_subscribers=0, channel_id=None, category_id="0", published_at=None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.channel = channel
+        self.thumbnail = thumbnail
+        self.views = views
+        self.likes = likes
+        self.comments = comments
+        self.channel_subscribers = channel_subscribers
+        self.channel_id = channel_id
+        self.category_id = category_id
+        self.published_at = published_at
+        self.category_name = None
+        self.sentiment = None
+        self.engagement_score = None
+        self.extra = None  # other keys set by callers, in a dict only when used
+
+    @classmethod
+    def from_api_item(cls, item, subscribers_by_channel):
+        """Parse one videos.list item (snippet + statistics)."""
+        snippet = item.get("snippet", {})
+        stats = item.get("statistics", {})
+        channel_id = snippet.get("channelId")
+        return cls(
+            id=item.get("id"),
+            title=snippet.get("title", "No title"),
+            description=snippet.get("description", ""),
+            channel=snippet.get("channelTitle", "Unknown"),
+            thumbnail=snippet.get("thumbnails", {}).get("medium", {}).get("url", ""),
+            views=int(stats.get("viewCount", 0)),
+            likes=int(stats.get("likeCount", 0)),
+            comments=int(stats.get("commentCount", 0)),
+            channel_subscribers=subscribers_by_channel.get(channel_id, 0),
+            channel_id=channel_id,
+            category_id=snippet.get("categoryId", "0"),
+            published_at=snippet.get("publishedAt"),
+        )
+
+    def __getitem__(self, key):
+        if key == "link":
+            return WATCH_URL.format(self.id)
+        slot = FIELD_SLOTS.get(key)
+        if slot is not None:
+            return getattr(self, slot)
+        slot = ANALYSIS_SLOTS.get(key)
+        if slot is not None and getattr(self, slot) is not None:
+            return getattr(self, slot)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        slot = FIELD_SLOTS.get(key) or ANALYSIS_SLOTS.get(key)
+        if slot is not None:
+            setattr(self, slot, value)
+        elif key == "link":
+            raise KeyError("link is derived from the video id")
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        slot = ANALYSIS_SLOTS.get(key)
+        if slot is not None and getattr(self, slot) is not None:
+            setattr(self, slot, None)
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        yield from FIELD_SLOTS
+        for key, slot in ANALYSIS_SLOTS.items():
+            if getattr(self, slot) is not None:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"VideoRecord({self.id!r}, {self.title[:40]!r})"
+
+    def to_dict(self):
+        return dict(self)
+
+
+class VideoBatch:
+    """A chart stored column by column; index or iterate it to get VideoRecords."""
+
+    __slots__ = (
+        "ids", "titles", "descriptions", "channels", "thumbnails",
+        "channel_ids", "category_ids", "published_at", "counters",
+    )
+
+    # Rows of `counters`
+    COUNTERS = ("views", "likes", "comments", "channel_subscribers")
+    TEXT_COLUMNS = ("ids", "titles", "descriptions", "channels", "thumbnails",
+                    "channel_ids", "category_ids", "published_at")
+
+    def __init__(self, ids, titles, descriptions, channels, thumbnails,
+                 channel_ids, category_ids, published_at, counters):
+        self.ids = ids
+        self.titles = titles
+        self.descriptions = descriptions
+        self.channels = channels
+        self.thumbnails = thumbnails
+        self.channel_ids = channel_ids
+        self.category_ids = category_ids
+        self.published_at = published_at
+        self.counters = counters
+
+    @classmethod
+    def from_videos(cls, videos):
+        """From fetch_trending_videos output (records or dicts)."""
+        videos = list(videos)
+
+        def column(key, default):
+            return tuple(video.get(key, default) for video in videos)
+
+        counters = np.array(
+            [[video.get(key) or 0 for video in videos] for key in cls.COUNTERS], dtype=np.int64,
+        ).reshape(len(cls.COUNTERS), len(videos))
+        return cls(
+            ids=column("id", None),
+            titles=column("title", ""),
+            descriptions=column("description", ""),
+            channels=column("channel", ""),
+            thumbnails=column("thumbnail", ""),
+            channel_ids=column("channelId", None),
+            category_ids=column("categoryId", "0"),
+            published_at=column("publishedAt", None),
+            counters=counters,
+        )
+
+    def __getstate__(self):
+        text = pickle.dumps(tuple(getattr(self, name) for name in self.TEXT_COLUMNS), pickle.HIGHEST_PROTOCOL)
+        return zlib.compress(text, 1), self.counters
+
+    def __setstate__(self, state):
+        text, counters = state
+        for name, column in zip(self.TEXT_COLUMNS, pickle.loads(zlib.decompress(text))):
+            setattr(self, name, column)
+        self.counters = counters
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        views, likes, comments, subscribers = self.counters[:, index].tolist()
+        return VideoRecord(
+            id=self.ids[index],
+            title=self.titles[index],
+            description=self.descriptions[index],
+            channel=self.channels[index],
+            thumbnail=self.thumbnails[index],
+            views=views,
+            likes=likes,
+            comments=comments,
+            channel_subscribers=subscribers,
+            channel_id=self.channel_ids[index],
+            category_id=self.category_ids[index],
+            published_at=self.published_at[index],
+        )
+
+    def __iter__(self):
+        return iter(self.records())
+
+    def records(self):
+        """Fresh VideoRecords (safe to mutate; the batch is unchanged)."""
+        counters = self.counters.T.tolist()
+        return [
+            VideoRecord(
+                id=video_id, title=title, description=description, channel=channel,
+                thumbnail=thumbnail, views=views, likes=likes, comments=comments,
+                channel_subscribers=subscribers, channel_id=channel_id,
+                category_id=category_id, published_at=published_at,
+            )
+            for video_id, title, description, channel, thumbnail, channel_id, category_id, published_at,
+            (views, likes, comments, subscribers)
+            in zip(self.ids, self.titles, self.descriptions, self.channels, self.thumbnails,
+                   self.channel_ids, self.category_ids, self.published_at, counters)
+        ]
+
+    def column(self, name):
+        """One counter column as an int64 array, e.g. for calculate_engagement_array."""
+        return self.counters[self.COUNTERS.index(name)]
+
+
+def chart_delta(previous, current):
+    """
+    What changed between two fetches of the same chart (VideoBatches or
+    lists of videos), by video id: `added`, `removed`, `updated` (counters
+    changed) and `edited` (title or description changed).
+    """
+    def by_id(videos):
+        return {
+            v["id"]: ((v.get("title"), v.get("description")),
+                      tuple(v.get(key) or 0 for key in VideoBatch.COUNTERS))
+            for v in videos
+        }
+
+    before, after = by_id(previous), by_id(current)
+    return {
+        "added": [vid for vid in after if vid not in before],
+        "removed": [vid for vid in before if vid not in after],
+        "updated": [vid for vid in after if vid in before and after[vid][1] != before[vid][1]],
+        "edited": [vid for vid in after if vid in before and after[vid][0] != before[vid][0]],
+    }
@@ -1,110 +1,112 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login
 
-from .youtube_fetcher import fetch_trending_videos
-from .ai_analysis.keyword_analyzer import extract_keywords
-from .ai_analysis.hashtag_extractor import extract_hashtags
-from .ai_analysis.sentiment_analyzer import analyze_sentiment
-from .ai_analysis.engagement_calculator import calculate_engagement
-from .ai_analysis.summarizer import generate_trend_summary  # ✅ AI summarizer
+from .constants import CATEGORIES, COUNTRIES
+from .trend_cache import get_trending_chart
+from .fetch_engine import afetch_regions, fetch_regions, run_analysis
+from .chart_analysis import ENGAGEMENT_LEVELS, analyze_chart, load_chart_analysis  # ✅ AI analysis pipeline
+from . import instrumentation
+from .rising import HOME_TOP_N, cached_rising_trends
+from .term_stream import global_trending_terms
 
 
-def home(request):
-    # Country dropdown
-    countries = {
-        "US": "United States",
-        "IN": "India",
-        "PK": "Pakistan",
-        "GB": "United Kingdom",
-        "CA": "Canada",
-        "AU": "Australia",
-        "DE": "Germany",
-        "FR": "France",
-        "JP": "Japan",
-        "KR": "South Korea",
-    }
+def _country_param(request, name, default):
+    """An upper-cased ?<name>= country code, or default if it isn't one we list."""
+    code = request.GET.get(name, "").strip().upper()
+    return code if code in COUNTRIES else default
 
-    # YouTube Categories
-    categories = {
-        "1": "Film & Animation",
-        "2": "Autos & Vehicles",
-        "10": "Music",
-        "17": "Sports",
-        "20": "Gaming",
-        "22": "People & Blogs",
-        "23": "Comedy",
-        "24": "Entertainment",
-        "25": "News & Politics",
-        "26": "Howto & Style",
-    }
 
+def _category_param(request):
+    """?category= id if it's one we list, else None (all categories)."""
+    category = request.GET.get("category", "").strip()
+    return category if category in CATEGORIES else None
+
+
+def _engagement_param(request):
+    """?engagement= level; anything but high/medium/low means no filter."""
+    engagement = request.GET.get("engagement", "")
+    return engagement if engagement in ENGAGEMENT_LEVELS else ""
+
+
+def _home_params(request):
+    """(country, category, engagement filter) from the home page's dropdowns."""
+    return (
+        _country_param(request, "country", "US"),
+        _category_param(request),
+        _engagement_param(request),
+    )
+
+
+def _home_chart(videos, snapshot_id, country, engagement):
+    """Read the analysis materialized at ingest time; analyse live if there is none."""
+    chart = None
+    if snapshot_id:
+        chart = load_chart_analysis(snapshot_id, engagement)
+    if chart is None:
+        chart = analyze_chart(videos, country, engagement)
+    return chart
+
+
+def _render_home(request, country, category, engagement, chart, rising):
+    with instrumentation.stage("render"):
+        return render(request, "trends/trending_videos.html", {
+            "videos": chart["videos"],
+            "countries": COUNTRIES,
+            "categories": CATEGORIES,
+            "selected_country": country,
+            "selected_category": category,
+            "keywords": chart["keywords"],
+            "hashtags": chart["hashtags"],
+            "selected_engagement": engagement,
+            "summary": chart["summary"],
+            "rising": rising,
+        })
+
+
+def home(request):
     # Get user selection from dropdown
-    selected_country = request.GET.get("country", "US")
-    selected_category = request.GET.get("category", None)
-    selected_engagement = request.GET.get("engagement", "")
-
-    # Fetch trending videos from YouTube API
-    videos = fetch_trending_videos(selected_country, selected_category)
-
-    # Map categoryId → categoryName for each video
-    for video in videos:
-        cat_id = str(video.get("categoryId", ""))
-        video["categoryName"] = categories.get(cat_id, "Miscellaneous")
-
-    # Extract titles for AI analysis
-    video_titles = [v.get("title", "") for v in videos]
-
-    # AI Analysis: keywords from titles
-    keywords = extract_keywords(video_titles)
-
-    # Add sentiment and engagement score for each video
-    for video in videos:
-        # Combine title + description for better context
-        text = f"{video.get('title', '')} {video.get('description', '')}"
-
-        # Sentiment
-        video["sentiment"] = analyze_sentiment(text, country=selected_country)
-
-        # Engagement
-        engagement = calculate_engagement(
-            views=video.get("views", 0),
-            likes=video.get("likes", 0),
-            comments=video.get("comments", 0),
-            subscribers=video.get("channel_subscribers", 0)
-        )
-        video["engagement_score"] = engagement["ratio"]
-        video["engagement_text"] = engagement["text"]
-
-    # Filter videos by engagement level if selected
-    if selected_engagement:
-        if selected_engagement == "high":
-            videos = [v for v in videos if v.get("engagement_score", 0) > 5]
-        elif selected_engagement == "medium":
-            videos = [v for v in videos if 2 <= v.get("engagement_score", 0) <= 5]
-        elif selected_engagement == "low":
-            videos = [v for v in videos if v.get("engagement_score", 0) < 2]
-
-    # Sort videos by engagement descending
-    videos = sorted(videos, key=lambda x: x.get("engagement_score", 0), reverse=True)
-
-    # Extract hashtags from video data (after engagement is calculated)
-    hashtags = extract_hashtags(videos)
-
-    # ✅ Generate AI summary
-    summary = generate_trend_summary(videos, keywords, hashtags)
+    selected_country, selected_category, selected_engagement = _home_params(request)
+
+    # Fetch trending videos (cached, refreshed in the background when stale)
+    videos, snapshot_id = get_trending_chart(selected_country, selected_category)
+
+    chart = _home_chart(videos, snapshot_id, selected_country, selected_engagement)
+
+    # What is gaining fastest across the stored snapshot history (cached per snapshot)
+    rising = cached_rising_trends(selected_country, selected_category or "", top_n=HOME_TOP_N)
 
     # Render template with all data
-    return render(request, "trends/trending_videos.html", {
-        "videos": videos,
-        "countries": countries,
-        "categories": categories,
-        "selected_country": selected_country,
-        "selected_category": selected_category,
-        "keywords": keywords,
-        "hashtags": hashtags,
-        "selected_engagement": selected_engagement,
-        "summary": summary
-    })
+    return _render_home(request, selected_country, selected_category, selected_engagement, chart, rising)
+
+
+async def home_async(request):
+    """
+    home() for ASGI (TRENDS_ASYNC_VIEWS). The chart fetch waits on the
+    fetch pool and the analysis and rising-trends queries run on the
+    bounded analysis pool, so the event loop serves other requests
+    meanwhile.
+    """
+    selected_country, selected_category, selected_engagement = _home_params(request)
+
+    fetched = await afetch_regions(
+        [(selected_country, selected_category)], fetch=get_trending_chart, default=([], None),
+    )
+    videos, snapshot_id = fetched[(selected_country, selected_category)]
+
+    chart, rising = await asyncio.gather(
+        run_analysis(_home_chart, videos, snapshot_id, selected_country, selected_engagement),
+        run_analysis(cached_rising_trends, selected_country, selected_category or "", top_n=HOME_TOP_N),
+    )
+
+    # Context processors read the session user, so render where the ORM may run
+    return await sync_to_async(_render_home)(
+        request, selected_country, selected_category, selected_engagement, chart, rising,
+    )
 
 
 def login_page(request):
@@ -154,113 +156,133 @@ def optional_dashboard(request):
     return render(request, 'trends/dashboard.html', context)
 
 
-def compare_trends(request):
-    """Compare trending videos between two countries side-by-side.
-    
-    Takes two query parameters: country1 and country2.
-    Fetches trending videos for both countries, calculates engagement,
-    sentiment, keywords, and hashtags for each.
+def _compare_selection(request):
+    """
+    (country1, country2, selected_countries) from ?country1=&country2= or
+    the N-country ?countries=US,IN,GB,JP (capped at TRENDS_COMPARE_MAX_REGIONS).
     """
-    # Country dictionary
-    countries = {
-        "US": "United States",
-        "IN": "India",
-        "PK": "Pakistan",
-        "GB": "United Kingdom",
-        "CA": "Canada",
-        "AU": "Australia",
-        "DE": "Germany",
-        "FR": "France",
-        "JP": "Japan",
-        "KR": "South Korea",
-    }
-    
     # Get country codes from query parameters
-    country1 = request.GET.get("country1", "US")
-    country2 = request.GET.get("country2", "IN")
-    
-    # Fetch trending videos for both countries with error handling
-    try:
-        videos1 = fetch_trending_videos(country1, None)
-    except Exception as e:
-        print(f"Error fetching videos for {country1}: {e}")
-        videos1 = []
-    
-    try:
-        videos2 = fetch_trending_videos(country2, None)
-    except Exception as e:
-        print(f"Error fetching videos for {country2}: {e}")
-        videos2 = []
-    
-    # Helper function to analyze videos
-    def analyze_videos(videos, country_code):
-        # Handle empty video list
-        if not videos:
-            return {
-                "videos": [],
-                "keywords": [],
-                "hashtags": [],
-                "avg_engagement": 0,
-                "sentiment_counts": {"positive": 0, "neutral": 0, "negative": 0},
-                "total_videos": 0
-            }
-        
-        # Extract titles for keyword analysis
-        titles = [v.get("title", "") for v in videos]
-        keywords = extract_keywords(titles)
-        
-        # Calculate sentiment and engagement for each video
-        for video in videos:
-            text = f"{video.get('title', '')} {video.get('description', '')}"
-            video["sentiment"] = analyze_sentiment(text, country=country_code)
-            
-            engagement = calculate_engagement(
-                views=video.get("views", 0),
-                likes=video.get("likes", 0),
-                comments=video.get("comments", 0),
-                subscribers=video.get("channel_subscribers", 0)
-            )
-            video["engagement_score"] = engagement["ratio"]
-            video["engagement_text"] = engagement["text"]
-        
-        # Sort by engagement score
-        videos = sorted(videos, key=lambda x: x.get("engagement_score", 0), reverse=True)
-        
-        # Extract hashtags from video data (after engagement is calculated)
-        # This allows hashtag extraction to use engagement scores and full video metadata
-        hashtags = extract_hashtags(videos)
-        
-        # Calculate average engagement
-        avg_engagement = sum(v.get("engagement_score", 0) for v in videos) / len(videos) if videos else 0
-        
-        # Calculate sentiment distribution
-        sentiment_counts = {"positive": 0, "neutral": 0, "negative": 0}
-        for v in videos:
-            sentiment_label = v.get("sentiment", {}).get("label", "neutral")
-            sentiment_counts[sentiment_label] = sentiment_counts.get(sentiment_label, 0) + 1
-        
-        return {
-            "videos": videos[:10],  # Top 10 videos
-            "keywords": keywords,
-            "hashtags": hashtags,
-            "avg_engagement": round(avg_engagement, 2),
-            "sentiment_counts": sentiment_counts,
-            "total_videos": len(videos)
-        }
-    
-    # Analyze both countries
-    data1 = analyze_videos(videos1, country1)
-    data2 = analyze_videos(videos2, country2)
-    
+    country1 = _country_param(request, "country1", "US")
+    country2 = _country_param(request, "country2", "IN")
+
+    # Optional N-country list (comma-separated); codes we don't list are dropped,
+    # they would otherwise reach the API, the cache keys and TrendSnapshot.region
+    selected_countries = [
+        code.strip().upper()
+        for code in request.GET.get("countries", "").split(",")
+        if code.strip().upper() in COUNTRIES
+    ]
+    selected_countries = list(dict.fromkeys(selected_countries))[:settings.TRENDS_COMPARE_MAX_REGIONS]
+    if len(selected_countries) >= 2:
+        country1, country2 = selected_countries[0], selected_countries[1]
+    else:
+        selected_countries = [country1, country2]
+    return country1, country2, selected_countries
+
+
+def _compare_data(chart, country_code):
+    """Top 10 videos plus keyword/hashtag/engagement/sentiment stats for one country."""
+    videos, snapshot_id = chart
+    data = load_chart_analysis(snapshot_id, limit=10) if snapshot_id else None
+    if data is None:
+        data = analyze_chart(videos, country_code)
+        data["videos"] = data["videos"][:10]
+    return data
+
+
+def _render_compare(request, country1, country2, selected_countries, data_by_country):
+    data1 = data_by_country[country1]
+    data2 = data_by_country[country2]
+
+    # Extra countries for the N-country summary table
+    comparisons = []
+    if len(selected_countries) > 2:
+        for code in selected_countries:
+            comparisons.append({
+                "code": code,
+                "name": COUNTRIES.get(code, code),
+                "data": data_by_country[code],
+            })
+
     # Prepare context
     context = {
         "country1_code": country1,
-        "country1_name": countries.get(country1, country1),
+        "country1_name": COUNTRIES.get(country1, country1),
         "country2_code": country2,
-        "country2_name": countries.get(country2, country2),
+        "country2_name": COUNTRIES.get(country2, country2),
         "data1": data1,
         "data2": data2,
-        "countries": countries,
+        "countries": COUNTRIES,
+        "comparisons": comparisons,
+        "selected_countries": ",".join(selected_countries),
     }
+
+    with instrumentation.stage("render"):
+        return render(request, "trends/compare_trends.html", context)
+
+
+def compare_trends(request):
+    """Compare trending videos between two countries side-by-side.
     
-    return render(request, "trends/compare_trends.html", context)
+    Takes two query parameters: country1 and country2.
+    Fetches trending videos for both countries, calculates engagement,
+    sentiment, keywords, and hashtags for each.
+
+    N-country mode: `?countries=US,IN,GB,JP` compares any number of
+    countries (up to TRENDS_COMPARE_MAX_REGIONS); the first two also fill
+    the side-by-side columns.
+    """
+    country1, country2, selected_countries = _compare_selection(request)
+
+    # Fetch every country concurrently; failures/timeouts come back empty
+    fetched = fetch_regions(
+        [(code, None) for code in selected_countries],
+        fetch=get_trending_chart,
+        default=([], None),
+    )
+
+    # Analyze every country (country1 == country2 is analysed once)
+    data_by_country = {
+        code: _compare_data(fetched.get((code, None), ([], None)), code)
+        for code in dict.fromkeys([country1, country2, *selected_countries])
+    }
+    return _render_compare(request, country1, country2, selected_countries, data_by_country)
+
+
+async def compare_trends_async(request):
+    """
+    compare_trends() for ASGI (TRENDS_ASYNC_VIEWS): all countries are
+    fetched at once without holding a thread, then analysed side by side
+    on the bounded analysis pool.
+    """
+    country1, country2, selected_countries = _compare_selection(request)
+
+    fetched = await afetch_regions(
+        [(code, None) for code in selected_countries],
+        fetch=get_trending_chart,
+        default=([], None),
+    )
+
+    codes = list(dict.fromkeys([country1, country2, *selected_countries]))
+    analysed = await asyncio.gather(*(
+        run_analysis(_compare_data, fetched.get((code, None), ([], None)), code) for code in codes
+    ))
+    return await sync_to_async(_render_compare)(
+        request, country1, country2, selected_countries, dict(zip(codes, analysed)),
+    )
+
+
+def trending_everywhere(request):
+    """Top keywords and hashtags across all regions and stored snapshots (JSON)."""
+    try:
+        top_n = min(max(int(request.GET.get("top", 10)), 1), 50)
+    except ValueError:
+        top_n = 10
+    return JsonResponse(global_trending_terms(top_n))
+
+
+def metrics(request):
+    """Stage/request histograms and YouTube API counters in Prometheus text format (TRENDS_INSTRUMENTATION only)."""
+    if not instrumentation.is_enabled():
+        raise Http404("Instrumentation is disabled")
+    return HttpResponse(instrumentation.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,86 +1,419 @@
-from googleapiclient.discovery import build
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
 from googleapiclient.http import HttpRequest
 from django.conf import settings
+from django.core.cache import caches
 import httplib2
 import ssl
 
+from . import instrumentation
+from .quota import QuotaBudget
+from .video_records import VideoBatch, VideoRecord, chart_delta
+
+logger = logging.getLogger(__name__)
+
 # Load your YouTube API key from settings.py
 YOUTUBE_API_KEY = settings.YOUTUBE_API_KEY
 
+# channels.list accepts at most 50 comma-separated IDs per call
+CHANNEL_BATCH_SIZE = 50
+
+# videos.list returns at most 50 videos per page; a mostPopular chart has at most 200
+MAX_PAGE_SIZE = 50
+CHART_LIMIT = 200
+
+# Errors that leave an httplib2 connection unusable; the client is discarded
+CONNECTION_ERRORS = (ssl.SSLError, ConnectionError, httplib2.HttpLib2Error)
+
+# HTTP 304: the resource still matches the ETag we sent
+NOT_MODIFIED = 304
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+
+def load_discovery_document():
+    """
+    Load and parse the YouTube v3 discovery document once per process.
+    Uses settings.YOUTUBE_DISCOVERY_PATH if set, otherwise the copy bundled
+    with googleapiclient. Returns None if no local copy is available.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                path = getattr(settings, "YOUTUBE_DISCOVERY_PATH", None)
+                try:
+                    if path:
+                        with open(path, encoding="utf-8") as fh:
+                            raw = fh.read()
+                    else:
+                        raw = get_static_doc("youtube", "v3")
+                    _discovery_document = json.loads(raw) if raw else None
+                except Exception:
+                    # The client falls back to fetching the document over the network
+                    logger.exception("youtube discovery document load failed path=%s", path or "bundled")
+                    instrumentation.count("youtube_discovery_errors_total")
+    return _discovery_document
+
 
 def build_youtube_client():
     """Build YouTube client with SSL configuration to prevent SSL errors."""
+    # Create an HTTP client with SSL context that's more permissive
+    http = httplib2.Http(
+        disable_ssl_certificate_validation=True,
+        timeout=getattr(settings, "YOUTUBE_HTTP_TIMEOUT", 30),
+    )
+    document = load_discovery_document()
+    # YOUTUBE_API_ENDPOINT points the client at another server, e.g. the offline fake
+    endpoint = getattr(settings, "YOUTUBE_API_ENDPOINT", None)
+    client_options = {"api_endpoint": endpoint} if endpoint else None
     try:
-        # Create an HTTP client with SSL context that's more permissive
-        http = httplib2.Http(
-            disable_ssl_certificate_validation=True,
-            timeout=30
-        )
-        return build("youtube", "v3", developerKey=YOUTUBE_API_KEY, http=http)
+        if document is not None:
+            return build_from_document(
+                document, developerKey=YOUTUBE_API_KEY, http=http, client_options=client_options,
+            )
+        return build("youtube", "v3", developerKey=YOUTUBE_API_KEY, http=http, client_options=client_options)
     except Exception:
         # Fallback to default build
-        return build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
+        return build("youtube", "v3", developerKey=YOUTUBE_API_KEY, client_options=client_options)
 
 
-def fetch_trending_videos(country="US", category=None, max_results=20):
+class YouTubeClientPool:
     """
-    Fetch trending videos from YouTube API with statistics:
-    views, likes, comments, thumbnails, links, categoryId, and channel subscribers.
+    Bounded, thread-safe pool of built YouTube service objects.
+
+    httplib2.Http is not thread-safe, so each client (and its keep-alive
+    connection) is leased to one thread at a time. Clients that hit an
+    SSL/connection error are discarded and rebuilt on the next lease.
+    """
+
+    def __init__(self, max_size=None, factory=build_youtube_client, timeout=None):
+        self.max_size = max_size or getattr(settings, "YOUTUBE_CLIENT_POOL_SIZE", 8)
+        self.timeout = timeout or getattr(settings, "YOUTUBE_HTTP_TIMEOUT", 30)
+        self.factory = factory
+        self._idle = []  # LIFO: reuse the most recently used (warm) connection
+        # Notified whenever a client is released or discarded, so waiters can
+        # take the idle client or build one in the freed slot
+        self._available = threading.Condition()
+        self._created = 0
+
+    def acquire(self):
+        """Return an idle client, build a new one, or wait for one to be released or discarded."""
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            while not self._idle and self._created >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._available.wait(remaining):
+                    raise TimeoutError("Timed out waiting for a pooled YouTube client")
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self.factory()
+        except Exception:
+            self._forget()
+            raise
+
+    def release(self, client):
+        with self._available:
+            self._idle.append(client)
+            self._available.notify()
+
+    def _forget(self):
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def discard(self, client):
+        """Drop a broken client so the next acquire builds a fresh one."""
+        self._forget()
+
+    def reset(self):
+        """Drop every idle client, e.g. after widespread SSL failures."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._available.notify(len(idle))
+
+    @contextmanager
+    def client(self):
+        youtube = self.acquire()
+        try:
+            yield youtube
+        except CONNECTION_ERRORS:
+            self.discard(youtube)
+            raise
+        except BaseException:
+            self.release(youtube)
+            raise
+        else:
+            self.release(youtube)
+
+
+# Shared by all threads of this worker process
+client_pool = YouTubeClientPool()
+
+
+def api_error_reason(error):
+    """The `reason` of a Data API HttpError (e.g. "quotaExceeded", "forbidden"), or None."""
+    details = getattr(error, "error_details", None)
+    if isinstance(details, list):
+        for detail in details:
+            if isinstance(detail, dict) and detail.get("reason"):
+                return detail["reason"]
+    return None
+
+
+# ---------------------- Conditional requests ----------------------
+
+def _etag_cache():
+    """Where ETags and the parsed responses they stand for are kept (None = disabled)."""
+    if not getattr(settings, "YOUTUBE_CONDITIONAL_REQUESTS", True):
+        return None
+    return caches[getattr(settings, "TRENDS_CACHE_ALIAS", "default")]
+
+
+def _remember(key, etag, **payload):
+    store = _etag_cache()
+    if store is not None and etag:
+        store.set(key, {"etag": etag, **payload}, timeout=getattr(settings, "YOUTUBE_ETAG_TTL", 24 * 3600))
+
+
+def _recall(key):
+    store = _etag_cache()
+    return store.get(key) if store is not None else None
+
+
+def _execute_conditional(request, cached):
+    """
+    Execute `request` with If-None-Match when an earlier response's ETag
+    is cached. Returns the response, or None if YouTube answered 304.
     """
-    
-    # Build fresh client for each request to avoid SSL caching issues
-    youtube = build_youtube_client()
-    
+    if cached is not None:
+        request.headers["If-None-Match"] = cached["etag"]
     try:
-        request = youtube.videos().list(
-            part="snippet,statistics",
-            chart="mostPopular",
-            regionCode=country,
-            maxResults=max_results,
-            videoCategoryId=category if category else None,
-        )
+        return request.execute()
+    except HttpError as e:
+        if cached is not None and e.resp.status == NOT_MODIFIED:
+            return None
+        raise
+
 
-        response = request.execute()
-        videos = []
+def chart_etag_key(country, category, max_results):
+    return f"etag:videos:{country}:{category or 'all'}:{max_results}"
 
+
+def page_etag_key(country, category, page_size, page_token):
+    return f"etag:videos:{country}:{category or 'all'}:{page_size}:{page_token or 'first'}"
+
+
+def fetch_channel_subscribers(youtube, channel_ids, batch_size=CHANNEL_BATCH_SIZE):
+    """
+    Resolve subscriber counts for a list of channel IDs.
+    Duplicate IDs are collapsed and the rest are requested in chunks of
+    up to `batch_size` IDs per channels().list call, conditionally on the
+    chunk's last ETag (a 304 reuses the cached counts).
+    Returns (subscribers_by_channel_id, api_calls_made).
+    """
+    # Keep first-seen order so chunks are deterministic
+    unique_ids = list(dict.fromkeys(cid for cid in channel_ids if cid))
+    subscribers = {}
+    calls = 0
+
+    for start in range(0, len(unique_ids), batch_size):
+        chunk = unique_ids[start:start + batch_size]
+        joined = ",".join(chunk)
+        key = f"etag:channels:{hashlib.blake2b(joined.encode(), digest_size=16).hexdigest()}"
+        cached = _recall(key)
+        calls += 1
+        try:
+            response = _execute_conditional(
+                youtube.channels().list(part="statistics", id=joined, maxResults=len(chunk)),
+                cached,
+            )
+        except CONNECTION_ERRORS:
+            raise  # let the pool discard this client
+        except Exception as e:
+            status = e.resp.status if isinstance(e, HttpError) else None
+            logger.warning("youtube channel statistics failed channels=%d status=%s error=%s", len(chunk), status, e)
+            instrumentation.count("youtube_api_errors_total", endpoint="channels", status=status or type(e).__name__)
+            continue  # channels in this chunk fall back to 0
+
+        if response is None:
+            subscribers.update(cached["subscribers"])
+            continue
+
+        chunk_subscribers = {}
         for item in response.get("items", []):
-            snippet = item.get("snippet", {})
             stats = item.get("statistics", {})
+            chunk_subscribers[item.get("id")] = int(stats.get("subscriberCount", 0))
+        subscribers.update(chunk_subscribers)
+        _remember(key, response.get("etag"), subscribers=chunk_subscribers)
+
+    return subscribers, calls
+
 
-            video_id = item.get("id")
-            channel_id = snippet.get("channelId")
+def iter_trending_videos(country="US", category=None, limit=CHART_LIMIT, fetch_stats=None):
+    """
+    Yield a chart's videos (VideoRecords) page by page, following
+    nextPageToken up to `limit` videos (at most CHART_LIMIT, the size of
+    a mostPopular chart). Each page is yielded as soon as it and its
+    channels are fetched; channels already resolved on an earlier page
+    are not looked up again.
+
+    Every page is requested with If-None-Match on its last ETag; a 304
+    yields the cached page. The pooled client is held until the generator
+    is exhausted or closed.
 
-            # Fetch channel subscriber count
-            subscribers = 0
-            try:
-                channel_request = youtube.channels().list(
-                    part="statistics",
-                    id=channel_id
+    `fetch_stats`, if passed, is filled like fetch_trending_videos' plus
+    `pages`, `not_modified_pages` and the pages' `etags`. On an API error
+    the generator stops early and sets `error` (and `error_status` for
+    HTTP errors).
+    """
+    started = time.perf_counter()
+    video_calls = 0
+    channel_calls = 0
+    pages, not_modified_pages, etags = 0, 0, []
+    subscribers_by_channel = {}
+    page_token = None
+    remaining = min(limit, CHART_LIMIT)
+
+    try:
+        # Lease a pooled client; one that hits an SSL error is discarded
+        with client_pool.client() as youtube:
+            while remaining > 0:
+                page_size = min(remaining, MAX_PAGE_SIZE)
+                key = page_etag_key(country, category, page_size, page_token)
+                cached = _recall(key)
+                request = youtube.videos().list(
+                    part="snippet,statistics",
+                    chart="mostPopular",
+                    regionCode=country,
+                    maxResults=page_size,
+                    videoCategoryId=category if category else None,
+                    pageToken=page_token,
                 )
-                channel_response = channel_request.execute()
-                if channel_response.get("items"):
-                    subscribers = int(channel_response["items"][0]["statistics"].get("subscriberCount", 0))
-            except Exception:
-                subscribers = 0  # fallback if API fails
-
-            videos.append({
-                "id": video_id,
-                "videoId": video_id,  # Add videoId for template compatibility
-                "title": snippet.get("title", "No title"),
-                "description": snippet.get("description", ""),
-                "channel": snippet.get("channelTitle", "Unknown"),
-                "thumbnail": snippet.get("thumbnails", {}).get("medium", {}).get("url", ""),
-                "views": int(stats.get("viewCount", 0)),
-                "likes": int(stats.get("likeCount", 0)),
-                "comments": int(stats.get("commentCount", 0)),
-                "link": f"https://www.youtube.com/watch?v={video_id}",
-                "channel_subscribers": subscribers,
-                "categoryId": snippet.get("categoryId", "0")
-            })
 
-        return videos
-        
+                video_calls += 1
+                pages += 1
+                response = _execute_conditional(request, cached)
+                if response is None:
+                    # Unchanged page: no parsing, no channel lookups
+                    not_modified_pages += 1
+                    etags.append(cached["etag"])
+                    page = cached["videos"].records()
+                    page_token = cached["next"]
+                else:
+                    items = response.get("items", [])
+
+                    # Resolve the new channels of this page in batched calls
+                    subscribers, calls = fetch_channel_subscribers(youtube, [
+                        channel_id for channel_id in (item.get("snippet", {}).get("channelId") for item in items)
+                        if channel_id not in subscribers_by_channel
+                    ])
+                    channel_calls += calls
+                    subscribers_by_channel.update(subscribers)
+
+                    # Compact dict-compatible records (see video_records)
+                    page = [VideoRecord.from_api_item(item, subscribers_by_channel) for item in items]
+                    page_token = response.get("nextPageToken")
+                    etags.append(response.get("etag"))
+                    _remember(key, response.get("etag"), videos=VideoBatch.from_videos(page), next=page_token)
+
+                remaining -= len(page)
+                yield from page
+                if not page_token or not page:
+                    break
+
     except Exception as e:
-        print(f"Error fetching trending videos: {e}")
-        # Return empty list on error instead of crashing
+        status = e.resp.status if isinstance(e, HttpError) else None
+        logger.warning("youtube trending fetch failed country=%s category=%s status=%s error=%s",
+                       country, category or "all", status, e)
+        instrumentation.count("youtube_api_errors_total", endpoint="videos", status=status or type(e).__name__)
+        if fetch_stats is not None:
+            fetch_stats["error"] = str(e)
+            if status is not None:
+                fetch_stats["error_status"] = status
+                fetch_stats["error_reason"] = api_error_reason(e)
+
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        api_calls = video_calls + channel_calls
+        if fetch_stats is not None:
+            fetch_stats.update({
+                "video_calls": video_calls,
+                "channel_calls": channel_calls,
+                "api_calls": api_calls,
+                "quota_units": api_calls,  # videos.list and channels.list cost 1 unit each
+                "pages": pages,
+                "not_modified_pages": not_modified_pages,
+                "etags": etags,
+                "elapsed_ms": round(elapsed_ms, 1),
+            })
+        instrumentation.count("youtube_api_calls_total", video_calls, endpoint="videos")
+        instrumentation.count("youtube_api_calls_total", channel_calls, endpoint="channels")
+        instrumentation.count("youtube_quota_units_total", api_calls)
+        _charge_quota(api_calls)
+        instrumentation.count("youtube_not_modified_total", not_modified_pages)
+        logger.info(
+            "fetch_trending_videos country=%s category=%s pages=%d api_calls=%d elapsed_ms=%.1f",
+            country, category, pages, api_calls, elapsed_ms,
+        )
+
+
+def _charge_quota(units):
+    """Count units against this API key's shared daily budget (quota.QuotaBudget)."""
+    if not units:
+        return
+    try:
+        QuotaBudget(YOUTUBE_API_KEY).charge(units)
+    except Exception:
+        logger.exception("quota charge failed units=%d", units)
+
+
+@instrumentation.instrumented("youtube")
+def fetch_trending_videos(country="US", category=None, max_results=20, fetch_stats=None):
+    """
+    Fetch trending videos from YouTube API with statistics:
+    views, likes, comments, thumbnails, links, categoryId, and channel subscribers.
+    Videos are VideoRecords, which read and write like the old dicts.
+    More than 50 videos (up to 200) are fetched page by page; see
+    iter_trending_videos to consume them as they arrive.
+
+    If a `fetch_stats` dict is passed it is filled with the number of API calls
+    made (`video_calls`, `channel_calls`, `api_calls`), the quota units
+    spent and the elapsed time in milliseconds. On an API error it also
+    gets `error_status` (e.g. 403, 429) and `error_reason` (e.g.
+    "quotaExceeded", "forbidden"; None if the response has none).
+
+    Pages are requested with If-None-Match on their last ETag. If the
+    whole chart is unchanged (304s) the cached videos are returned and
+    `not_modified` is set; otherwise `delta` lists the video IDs added,
+    removed, updated or edited since the last fetch (see
+    video_records.chart_delta).
+    """
+    stats = {} if fetch_stats is None else fetch_stats
+    videos = list(iter_trending_videos(country, category, max_results, fetch_stats=stats))
+    if "error" in stats:
+        # Return empty list on error instead of a partial chart
         return []
+
+    if stats["pages"] and stats["not_modified_pages"] == stats["pages"]:
+        stats["not_modified"] = True
+        return videos
+
+    chart_key = chart_etag_key(country, category, max_results)
+    previous = _recall(chart_key)
+    if previous is not None:
+        stats["delta"] = chart_delta(previous["videos"], videos)
+    _remember(chart_key, "/".join(etag or "" for etag in stats["etags"]), videos=VideoBatch.from_videos(videos))
+    return videos
@@ -56,8 +56,9 @@ INSTALLED_APPS = [
 
 # ---------------------- Middleware ----------------------
 MIDDLEWARE = [
+    'trends.middleware.InstrumentationMiddleware',  # first, so its total covers the whole request
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files efficiently
+    'trends.middleware.StaticFilesMiddleware',  # WhiteNoise static files, also async under ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -65,6 +66,7 @@ MIDDLEWARE = [
     # 'allauth.account.middleware.AccountMiddleware',  # TEMPORARILY DISABLED
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'trends.middleware.ProfilingMiddleware',  # last: profiles from the view on, not the middleware
 ]
 
 # ---------------------- URL & WSGI ----------------------
@@ -93,6 +95,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Concurrent fetches persist snapshots from several threads: take the write
+        # lock up front so writers wait (timeout) instead of deadlocking ("database is locked")
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
@@ -134,6 +139,106 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ---------------------- Environment API Keys ----------------------
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+# ---------------------- YouTube Client ----------------------
+# Max pooled service objects (one keep-alive connection each) per process
+YOUTUBE_CLIENT_POOL_SIZE = int(os.getenv("YOUTUBE_CLIENT_POOL_SIZE", "8"))
+YOUTUBE_HTTP_TIMEOUT = int(os.getenv("YOUTUBE_HTTP_TIMEOUT", "30"))
+# Optional local discovery document; defaults to the copy bundled with googleapiclient
+YOUTUBE_DISCOVERY_PATH = os.getenv("YOUTUBE_DISCOVERY_PATH") or None
+# Base URL of the Data API, e.g. the offline fake (manage.py fake_youtube):
+# http://127.0.0.1:8765/youtube/v3/ — unset means googleapis.com
+YOUTUBE_API_ENDPOINT = os.getenv("YOUTUBE_API_ENDPOINT") or None
+# Daily Data API quota units per API key (YouTube's default is 10,000)
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+# Cache alias the quota usage is counted in. Web workers and fetch_trends all
+# charge it, so in production it must be shared (Redis/Memcached/database
+# cache); the local-memory default only counts the current process's calls
+YOUTUBE_QUOTA_CACHE_ALIAS = os.getenv("YOUTUBE_QUOTA_CACHE_ALIAS", "default")
+# Send If-None-Match with each chart/channel request and reuse the cached
+# parsed response on 304; ETags are kept for YOUTUBE_ETAG_TTL seconds
+YOUTUBE_CONDITIONAL_REQUESTS = os.getenv("YOUTUBE_CONDITIONAL_REQUESTS", "True") == "True"
+YOUTUBE_ETAG_TTL = int(os.getenv("YOUTUBE_ETAG_TTL", "86400"))
+
+# ---------------------- Cache ----------------------
+# Local-memory by default; set CACHE_BACKEND/CACHE_LOCATION for Redis or Memcached in production
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", 'viralbrain'),
+    }
+}
+
+# Trending responses are fresh for TRENDS_CACHE_TTL seconds, then served
+# stale (while one background refresh runs) for up to TRENDS_CACHE_STALE_TTL
+TRENDS_CACHE_ALIAS = 'default'
+TRENDS_CACHE_TTL = int(os.getenv("TRENDS_CACHE_TTL", "300"))
+TRENDS_CACHE_STALE_TTL = int(os.getenv("TRENDS_CACHE_STALE_TTL", "3600"))
+TRENDS_CACHE_LOCK_TIMEOUT = int(os.getenv("TRENDS_CACHE_LOCK_TIMEOUT", "30"))
+# Save every live fetch as a TrendSnapshot (history for trend analysis)
+TRENDS_PERSIST_SNAPSHOTS = os.getenv("TRENDS_PERSIST_SNAPSHOTS", "True") == "True"
+# Top-N entries of each snapshot analysed at ingest time (matches the page size)
+TRENDS_ANALYSIS_MAX_RESULTS = int(os.getenv("TRENDS_ANALYSIS_MAX_RESULTS", "20"))
+# Serve pages only from snapshots written by `manage.py fetch_trends` (no live API calls)
+TRENDS_SERVE_FROM_DB = os.getenv("TRENDS_SERVE_FROM_DB", "False") == "True"
+# Memory budget (KiB) of each per-region heavy-hitter sketch behind the
+# global "trending everywhere" terms; larger = tighter count error bounds
+TRENDS_SKETCH_MEMORY_KB = int(os.getenv("TRENDS_SKETCH_MEMORY_KB", "256"))
+# Snapshots per region/category compared when detecting rising terms and videos
+TRENDS_RISING_HISTORY = int(os.getenv("TRENDS_RISING_HISTORY", "48"))
+
+# Multi-region fetches: shared pool size (global cap on concurrent YouTube
+# requests per process) and per-request timeout in seconds
+TRENDS_FETCH_CONCURRENCY = int(os.getenv("TRENDS_FETCH_CONCURRENCY", "8"))
+TRENDS_FETCH_TIMEOUT = int(os.getenv("TRENDS_FETCH_TIMEOUT", "15"))
+# Most regions /compare/?countries=... will fetch in one request
+TRENDS_COMPARE_MAX_REGIONS = int(os.getenv("TRENDS_COMPARE_MAX_REGIONS", "10"))
+# Serve home/compare from async views (for ASGI: uvicorn viralbrain.asgi:application);
+# their chart analysis runs on a pool of TRENDS_ANALYSIS_WORKERS threads
+TRENDS_ASYNC_VIEWS = os.getenv("TRENDS_ASYNC_VIEWS", "False") == "True"
+TRENDS_ANALYSIS_WORKERS = int(os.getenv("TRENDS_ANALYSIS_WORKERS", str(max(2, os.cpu_count() or 1))))
+
+# Sentiment memoization: in-process LRU size, plus an optional cache alias
+# (e.g. a Redis-backed one) shared by all workers
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "4096"))
+SENTIMENT_SHARED_CACHE = os.getenv("SENTIMENT_SHARED_CACHE") or None
+# Worker processes for sentiment batches too large to score in-process
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", str(os.cpu_count() or 1)))
+
+# Sentiment text preparation: strip URLs/timestamps/hashtag runs and keep at
+# most SENTIMENT_MAX_TOKENS description tokens ("head" or "sample" sentences).
+# SENTIMENT_TITLE_WEIGHT (0-1) scores the title separately and blends it in.
+SENTIMENT_PREPARE_TEXT = os.getenv("SENTIMENT_PREPARE_TEXT", "True") == "True"
+SENTIMENT_MAX_TOKENS = int(os.getenv("SENTIMENT_MAX_TOKENS", "128"))
+SENTIMENT_TEXT_MODE = os.getenv("SENTIMENT_TEXT_MODE", "sample")
+SENTIMENT_TITLE_WEIGHT = float(os.environ["SENTIMENT_TITLE_WEIGHT"]) if os.getenv("SENTIMENT_TITLE_WEIGHT") else None
+
+# Per-request stage timings (Server-Timing header, one structured log record
+# per request) and Prometheus-style histograms/counters at /metrics
+TRENDS_INSTRUMENTATION = os.getenv("TRENDS_INSTRUMENTATION", "False") == "True"
+# cProfile a sample of home/compare requests (rate 0-1, and/or any request
+# whose X-Trends-Profile header equals TRENDS_PROFILE_TOKEN); profiles go to
+# TRENDS_PROFILE_DIR, merged by `manage.py profile_report`
+TRENDS_PROFILE_SAMPLE_RATE = float(os.getenv("TRENDS_PROFILE_SAMPLE_RATE", "0"))
+TRENDS_PROFILE_TOKEN = os.getenv("TRENDS_PROFILE_TOKEN") or None
+TRENDS_PROFILE_VIEWS = ("trends:home", "trends:compare")
+TRENDS_PROFILE_DIR = Path(os.getenv("TRENDS_PROFILE_DIR", BASE_DIR / "profiles"))
+
+# ---------------------- Logging ----------------------
+# Surfaces the trends app's fetch timings / API call counts on the console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'trends': {
+            'handlers': ['console'],
+            'level': os.getenv("TRENDS_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
 # ---------------------- Allauth - TEMPORARILY DISABLED ----------------------
 # SITE_ID = int(os.getenv('DJANGO_SITE_ID', 1))
 # AUTHENTICATION_BACKENDS = (